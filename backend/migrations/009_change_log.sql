@@ -0,0 +1,135 @@
+-- 009 - Change log for delta snapshots (/assistant_snapshot?since=<token>)
+-- Every insert/update/delete on coins, trades, tips, accounts and the
+-- trade/tip bubbles + scoring tables appends one row here via triggers.
+-- Tokens are transaction ids (xid8): a delta returns every row written by a
+-- transaction >= the token, so writes still in flight when a token was issued
+-- are never skipped (they may be sent twice, which clients treat as upserts).
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS change_log (
+    seq BIGSERIAL PRIMARY KEY,
+    txid XID8 NOT NULL DEFAULT pg_current_xact_id(),
+    entity TEXT NOT NULL,          -- 'coin' | 'trade' | 'tip' | 'account'
+    entity_key TEXT NOT NULL,      -- ca | trade_id | tip_id | account_id
+    chain TEXT,
+    ca TEXT,
+    account_id INT,
+    op CHAR(1) NOT NULL,           -- 'I' | 'U' | 'D'
+    changed_ts TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_log_txid ON change_log (txid);
+
+CREATE OR REPLACE FUNCTION change_log_coins() RETURNS trigger AS $$
+DECLARE r RECORD;
+BEGIN
+  IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+  INSERT INTO change_log (entity, entity_key, chain, ca, op)
+  VALUES ('coin', r.ca, r.chain, r.ca, left(TG_OP, 1));
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION change_log_trades() RETURNS trigger AS $$
+DECLARE r RECORD;
+BEGIN
+  IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+  INSERT INTO change_log (entity, entity_key, chain, ca, op)
+  VALUES ('trade', r.trade_id, r.chain, r.ca, left(TG_OP, 1));
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION change_log_tips() RETURNS trigger AS $$
+DECLARE r RECORD;
+BEGIN
+  IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+  INSERT INTO change_log (entity, entity_key, chain, ca, account_id, op)
+  VALUES ('tip', r.tip_id::text, r.chain, r.ca, r.account_id, left(TG_OP, 1));
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION change_log_accounts() RETURNS trigger AS $$
+DECLARE r RECORD;
+BEGIN
+  IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+  INSERT INTO change_log (entity, entity_key, account_id, op)
+  VALUES ('account', r.account_id::text, r.account_id, left(TG_OP, 1));
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+-- bubbles/scoring rows belong to a trade or tip: log them as an update of the parent
+CREATE OR REPLACE FUNCTION change_log_trade_child() RETURNS trigger AS $$
+DECLARE r RECORD;
+BEGIN
+  IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+  INSERT INTO change_log (entity, entity_key, op)
+  VALUES ('trade', r.trade_id, 'U');
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION change_log_tip_child() RETURNS trigger AS $$
+DECLARE r RECORD;
+BEGIN
+  IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+  INSERT INTO change_log (entity, entity_key, op)
+  VALUES ('tip', r.tip_id::text, 'U');
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_change_log ON coins;
+CREATE TRIGGER trg_change_log AFTER INSERT OR UPDATE OR DELETE ON coins
+    FOR EACH ROW EXECUTE FUNCTION change_log_coins();
+
+DROP TRIGGER IF EXISTS trg_change_log ON trades;
+CREATE TRIGGER trg_change_log AFTER INSERT OR UPDATE OR DELETE ON trades
+    FOR EACH ROW EXECUTE FUNCTION change_log_trades();
+
+DROP TRIGGER IF EXISTS trg_change_log ON tips;
+CREATE TRIGGER trg_change_log AFTER INSERT OR UPDATE OR DELETE ON tips
+    FOR EACH ROW EXECUTE FUNCTION change_log_tips();
+
+DROP TRIGGER IF EXISTS trg_change_log ON trade_bubbles;
+CREATE TRIGGER trg_change_log AFTER INSERT OR UPDATE OR DELETE ON trade_bubbles
+    FOR EACH ROW EXECUTE FUNCTION change_log_trade_child();
+
+DROP TRIGGER IF EXISTS trg_change_log ON trade_bubbles_others;
+CREATE TRIGGER trg_change_log AFTER INSERT OR UPDATE OR DELETE ON trade_bubbles_others
+    FOR EACH ROW EXECUTE FUNCTION change_log_trade_child();
+
+DROP TRIGGER IF EXISTS trg_change_log ON trade_scoring;
+CREATE TRIGGER trg_change_log AFTER INSERT OR UPDATE OR DELETE ON trade_scoring
+    FOR EACH ROW EXECUTE FUNCTION change_log_trade_child();
+
+DROP TRIGGER IF EXISTS trg_change_log ON tip_bubbles;
+CREATE TRIGGER trg_change_log AFTER INSERT OR UPDATE OR DELETE ON tip_bubbles
+    FOR EACH ROW EXECUTE FUNCTION change_log_tip_child();
+
+DROP TRIGGER IF EXISTS trg_change_log ON tip_bubbles_others;
+CREATE TRIGGER trg_change_log AFTER INSERT OR UPDATE OR DELETE ON tip_bubbles_others
+    FOR EACH ROW EXECUTE FUNCTION change_log_tip_child();
+
+DROP TRIGGER IF EXISTS trg_change_log ON tip_scoring;
+CREATE TRIGGER trg_change_log AFTER INSERT OR UPDATE OR DELETE ON tip_scoring
+    FOR EACH ROW EXECUTE FUNCTION change_log_tip_child();
+
+DO $$
+DECLARE accounts_table TEXT;
+BEGIN
+  IF EXISTS (
+    SELECT 1
+    FROM information_schema.tables
+    WHERE table_schema = 'public' AND table_name = 'accounts'
+  ) THEN
+    accounts_table := 'accounts';
+  ELSE
+    accounts_table := 'social_accounts';
+  END IF;
+  EXECUTE format('DROP TRIGGER IF EXISTS trg_change_log ON %I', accounts_table);
+  EXECUTE format(
+    'CREATE TRIGGER trg_change_log AFTER INSERT OR UPDATE OR DELETE ON %I
+       FOR EACH ROW EXECUTE FUNCTION change_log_accounts()',
+    accounts_table
+  );
+END $$;
+
+COMMIT;
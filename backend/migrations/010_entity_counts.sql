@@ -0,0 +1,80 @@
+-- 010 - Trigger-maintained trade/tip counters per (chain, ca)
+-- /trades/paged and /tips/paged read their unfiltered totals from here
+-- instead of running COUNT(*) over the full history on every page.
+-- Per-chain and global totals are SUMs over the (small) per-coin rows.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS entity_counts (
+    entity TEXT NOT NULL,                 -- 'trade' | 'tip'
+    chain TEXT NOT NULL,
+    ca TEXT NOT NULL,
+    total_count BIGINT NOT NULL DEFAULT 0,
+    open_count BIGINT NOT NULL DEFAULT 0, -- trades with exit_ts IS NULL (always 0 for tips)
+    PRIMARY KEY (entity, chain, ca)
+);
+
+CREATE OR REPLACE FUNCTION entity_counts_add(
+    p_entity TEXT, p_chain TEXT, p_ca TEXT, p_total BIGINT, p_open BIGINT
+) RETURNS void AS $$
+BEGIN
+  INSERT INTO entity_counts AS e (entity, chain, ca, total_count, open_count)
+  VALUES (p_entity, p_chain, p_ca, p_total, p_open)
+  ON CONFLICT (entity, chain, ca) DO UPDATE
+    SET total_count = e.total_count + EXCLUDED.total_count,
+        open_count = e.open_count + EXCLUDED.open_count;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION entity_counts_trades() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'UPDATE'
+     AND OLD.chain = NEW.chain AND OLD.ca = NEW.ca
+     AND (OLD.exit_ts IS NULL) = (NEW.exit_ts IS NULL) THEN
+    RETURN NULL;
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM entity_counts_add('trade', OLD.chain, OLD.ca, -1, CASE WHEN OLD.exit_ts IS NULL THEN -1 ELSE 0 END);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM entity_counts_add('trade', NEW.chain, NEW.ca, 1, CASE WHEN NEW.exit_ts IS NULL THEN 1 ELSE 0 END);
+  END IF;
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION entity_counts_tips() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'UPDATE' AND OLD.chain = NEW.chain AND OLD.ca = NEW.ca THEN
+    RETURN NULL;
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM entity_counts_add('tip', OLD.chain, OLD.ca, -1, 0);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM entity_counts_add('tip', NEW.chain, NEW.ca, 1, 0);
+  END IF;
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_entity_counts ON trades;
+CREATE TRIGGER trg_entity_counts AFTER INSERT OR UPDATE OF chain, ca, exit_ts OR DELETE ON trades
+    FOR EACH ROW EXECUTE FUNCTION entity_counts_trades();
+
+DROP TRIGGER IF EXISTS trg_entity_counts ON tips;
+CREATE TRIGGER trg_entity_counts AFTER INSERT OR UPDATE OF chain, ca OR DELETE ON tips
+    FOR EACH ROW EXECUTE FUNCTION entity_counts_tips();
+
+-- CREATE TRIGGER holds SHARE ROW EXCLUSIVE on both tables until COMMIT, so no
+-- write can land between the backfill below and the triggers going live.
+DELETE FROM entity_counts;
+
+INSERT INTO entity_counts (entity, chain, ca, total_count, open_count)
+SELECT 'trade', chain, ca, COUNT(*), COUNT(*) FILTER (WHERE exit_ts IS NULL)
+FROM trades
+GROUP BY chain, ca;
+
+INSERT INTO entity_counts (entity, chain, ca, total_count, open_count)
+SELECT 'tip', chain, ca, COUNT(*), 0
+FROM tips
+GROUP BY chain, ca;
+
+COMMIT;
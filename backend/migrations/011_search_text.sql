@@ -0,0 +1,115 @@
+-- 011 - Indexed search for /trades/paged and /tips/paged (?q=)
+-- Every searchable field of a trade/tip (coin name, symbol, CA, id, and for
+-- tips the account handle/platform) is kept in one `search_text` column,
+-- maintained by triggers, so `q` becomes a single ILIKE on one table that a
+-- pg_trgm GIN index can serve. Fields are joined with newlines so a match
+-- never spans two of them.
+-- pg_trgm is optional: without it the column is still used, just unindexed.
+
+BEGIN;
+
+DO $$
+BEGIN
+  CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN OTHERS THEN
+  RAISE NOTICE 'pg_trgm is not available (%); search_text stays unindexed', SQLERRM;
+END $$;
+
+ALTER TABLE trades ADD COLUMN IF NOT EXISTS search_text TEXT;
+ALTER TABLE tips ADD COLUMN IF NOT EXISTS search_text TEXT;
+
+CREATE OR REPLACE FUNCTION trade_search_text(p_chain TEXT, p_ca TEXT, p_trade_id TEXT) RETURNS TEXT AS $$
+  SELECT concat_ws(E'\n', c.name, c.symbol, p_ca, p_trade_id)
+  FROM (SELECT 1) one
+  LEFT JOIN coins c ON c.chain = p_chain AND c.ca = p_ca;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION search_text_trades() RETURNS trigger AS $$
+BEGIN
+  NEW.search_text := trade_search_text(NEW.chain, NEW.ca, NEW.trade_id);
+  RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION search_text_tips() RETURNS trigger AS $$
+BEGIN
+  NEW.search_text := tip_search_text(NEW.chain, NEW.ca, NEW.tip_id, NEW.account_id);
+  RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+-- coin name/symbol and account handle/platform live on other tables: push changes down
+CREATE OR REPLACE FUNCTION search_text_coins() RETURNS trigger AS $$
+BEGIN
+  UPDATE trades SET search_text = trade_search_text(chain, ca, trade_id)
+  WHERE chain = NEW.chain AND ca = NEW.ca;
+  UPDATE tips SET search_text = tip_search_text(chain, ca, tip_id, account_id)
+  WHERE chain = NEW.chain AND ca = NEW.ca;
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION search_text_accounts() RETURNS trigger AS $$
+BEGIN
+  UPDATE tips SET search_text = tip_search_text(chain, ca, tip_id, account_id)
+  WHERE account_id = NEW.account_id;
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE accounts_table TEXT;
+BEGIN
+  IF EXISTS (
+    SELECT 1
+    FROM information_schema.tables
+    WHERE table_schema = 'public' AND table_name = 'accounts'
+  ) THEN
+    accounts_table := 'accounts';
+  ELSE
+    accounts_table := 'social_accounts';
+  END IF;
+
+  EXECUTE format($fn$
+    CREATE OR REPLACE FUNCTION tip_search_text(p_chain TEXT, p_ca TEXT, p_tip_id INT, p_account_id INT)
+    RETURNS TEXT AS $body$
+      SELECT concat_ws(E'\n', c.name, c.symbol, a.handle, a.platform, p_ca, p_tip_id::text)
+      FROM (SELECT 1) one
+      LEFT JOIN coins c ON c.chain = p_chain AND c.ca = p_ca
+      LEFT JOIN %I a ON a.account_id = p_account_id;
+    $body$ LANGUAGE sql STABLE;
+  $fn$, accounts_table);
+
+  EXECUTE format('DROP TRIGGER IF EXISTS trg_search_text ON %I', accounts_table);
+  EXECUTE format(
+    'CREATE TRIGGER trg_search_text AFTER UPDATE OF handle, platform ON %I
+       FOR EACH ROW EXECUTE FUNCTION search_text_accounts()',
+    accounts_table
+  );
+END $$;
+
+DROP TRIGGER IF EXISTS trg_search_text ON trades;
+CREATE TRIGGER trg_search_text BEFORE INSERT OR UPDATE OF chain, ca, trade_id ON trades
+    FOR EACH ROW EXECUTE FUNCTION search_text_trades();
+
+DROP TRIGGER IF EXISTS trg_search_text ON tips;
+CREATE TRIGGER trg_search_text BEFORE INSERT OR UPDATE OF chain, ca, tip_id, account_id ON tips
+    FOR EACH ROW EXECUTE FUNCTION search_text_tips();
+
+DROP TRIGGER IF EXISTS trg_search_text ON coins;
+CREATE TRIGGER trg_search_text AFTER UPDATE OF name, symbol ON coins
+    FOR EACH ROW EXECUTE FUNCTION search_text_coins();
+
+-- backfill without flooding change_log: no row changes for delta clients
+ALTER TABLE trades DISABLE TRIGGER trg_change_log;
+ALTER TABLE tips DISABLE TRIGGER trg_change_log;
+UPDATE trades SET search_text = trade_search_text(chain, ca, trade_id);
+UPDATE tips SET search_text = tip_search_text(chain, ca, tip_id, account_id);
+ALTER TABLE trades ENABLE TRIGGER trg_change_log;
+ALTER TABLE tips ENABLE TRIGGER trg_change_log;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+    CREATE INDEX IF NOT EXISTS idx_trades_search_trgm ON trades USING gin (search_text gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_tips_search_trgm ON tips USING gin (search_text gin_trgm_ops);
+  END IF;
+END $$;
+
+COMMIT;
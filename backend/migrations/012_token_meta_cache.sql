@@ -0,0 +1,19 @@
+-- 012 - Persistent tier behind the in-memory Dexscreener metadata cache
+-- One row per CA (lowercased). meta is the /dexscreener/token_meta payload,
+-- NULL when the token was not found on any chain. The row is fresh until
+-- fresh_until, may be served (and refreshed) until stale_until, and is
+-- ignored afterwards.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS token_meta_cache (
+    ca TEXT PRIMARY KEY,
+    meta JSONB,
+    fetched_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    fresh_until TIMESTAMPTZ NOT NULL,
+    stale_until TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_token_meta_cache_stale_until ON token_meta_cache (stale_until);
+
+COMMIT;
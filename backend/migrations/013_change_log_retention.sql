@@ -0,0 +1,35 @@
+-- 013 - Retention for change_log
+-- prune_change_log() deletes entries older than the given interval (the app
+-- calls it from a background task) and remembers the newest txid it
+-- removed. A delta whose `since` token is not above that txid may have lost
+-- rows, so /assistant_snapshot answers it with 410 and the client does a full
+-- resync instead.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS change_log_horizon (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    pruned_txid XID8 NOT NULL DEFAULT '0'
+);
+
+INSERT INTO change_log_horizon DEFAULT VALUES ON CONFLICT DO NOTHING;
+
+CREATE INDEX IF NOT EXISTS idx_change_log_changed_ts ON change_log (changed_ts);
+
+CREATE OR REPLACE FUNCTION prune_change_log(p_keep INTERVAL) RETURNS BIGINT AS $$
+DECLARE
+  n BIGINT;
+  top XID8;
+BEGIN
+  WITH gone AS (
+    DELETE FROM change_log WHERE changed_ts < now() - p_keep RETURNING txid
+  )
+  SELECT count(*), (SELECT txid FROM gone ORDER BY txid DESC LIMIT 1) INTO n, top
+  FROM gone;
+  IF top IS NOT NULL THEN
+    UPDATE change_log_horizon SET pruned_txid = greatest(pruned_txid, top);
+  END IF;
+  RETURN n;
+END $$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,132 @@
+"""Load-test /dexscreener/token_meta against the local fake Dexscreener.
+
+Usage (from backend/; no database needed):
+
+    python -m scripts.bench_dexscreener --callers 50 --requests 2000 --rate 200 --burst 50
+    python -m scripts.bench_dexscreener --latency-ms 120 --jitter-ms 80 --error-rate 0.05 --rate-limit-rate 0.02
+    python -m scripts.bench_dexscreener --unknown-rate 0.2 --rate 1000 --burst 1000
+
+N concurrent callers share a stream of lookups drawn from a skewed
+distribution over the seeded tokens (a few hot CAs, a long tail), plus an
+optional share of CAs the fake does not know. Reports latency percentiles,
+upstream calls and responses, and the cache/coalescing counters. The
+persistent cache tier and the coins lookup are disabled so every run starts
+cold and only exercises fan-out, retry and cache logic. Without --rate the
+production limiter (DEX_RATE_PER_SEC, 5/s) applies and a cold run with the
+default workload takes minutes.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from fastapi import HTTPException
+
+from scripts.fake_dexscreener import FakeDexscreener, seed_tokens
+from server.routers import dexscreener as dex
+
+
+async def _no_known_chains(cas):
+    return {}
+
+
+def _workload(cas: list[str], n: int, unknown_rate: float, skew: float, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(cas))]
+    picks = rng.choices(cas, weights=weights, k=n)
+    return [f"0x{rng.getrandbits(160):040x}" if rng.random() < unknown_rate else ca for ca in picks]
+
+
+async def _run(lookups: list[str], callers: int) -> tuple[list[float], dict[str, int]]:
+    queue = iter(lookups)
+    latencies: list[float] = []
+    outcomes: dict[str, int] = {}
+
+    async def caller():
+        for ca in queue:
+            t0 = time.perf_counter()
+            try:
+                await dex.token_meta(ca)
+                outcome = "200"
+            except HTTPException as exc:
+                outcome = str(exc.status_code)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    await asyncio.gather(*(caller() for _ in range(callers)))
+    return latencies, outcomes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--tokens", type=int, default=100, help="tokens per chain seeded into the fake")
+    parser.add_argument("--skew", type=float, default=1.0, help="zipf exponent of the CA popularity")
+    parser.add_argument("--unknown-rate", type=float, default=0.05)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=None, help="override DEX_RATE_PER_SEC")
+    parser.add_argument("--burst", type=int, default=None, help="override DEX_RATE_BURST")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    fake = FakeDexscreener(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    cas = seed_tokens(fake, args.tokens)
+    random.Random(args.seed).shuffle(cas)
+    lookups = _workload(cas, args.requests, args.unknown_rate, args.skew, args.seed)
+
+    dex.DEX_BASE = fake.url
+    dex.CACHE_STORE = False
+    dex._known_chains = _no_known_chains
+    if args.rate is not None:
+        dex.DEX_RATE_PER_SEC = args.rate
+    if args.burst is not None:
+        dex.DEX_RATE_BURST = args.burst
+
+    async def bench():
+        dex.open_client()
+        try:
+            t0 = time.perf_counter()
+            result = await _run(lookups, args.callers)
+            return result, time.perf_counter() - t0
+        finally:
+            await dex.close_client()
+
+    with fake:
+        (latencies, outcomes), elapsed = asyncio.run(bench())
+
+    q = statistics.quantiles(latencies, n=100)
+    cache = dex._cache.stats()
+    lookups_served = cache["hits"] + cache["stale_hits"] + cache["misses"]
+    limiter = next(iter(dex._limiters.values()), None)
+    open_breakers = [key for key, b in dex._breakers.items() if b.state != "closed"]
+
+    print(f"requests        {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s), callers={args.callers}")
+    print(f"outcomes        {dict(sorted(outcomes.items()))}")
+    print(f"latency_ms      p50={q[49]:.1f} p95={q[94]:.1f} p99={q[98]:.1f} max={max(latencies):.1f}")
+    print(f"upstream        calls={len(fake.requests)} responses={dict(sorted(fake.responses.items()))}")
+    print(
+        f"cache           hit_ratio={(cache['hits'] + cache['stale_hits']) / max(lookups_served, 1):.3f} "
+        f"negative_hits={dex._stats['negative_hits']} coalesced={dex._stats['coalesced']} size={cache['size']}"
+    )
+    if limiter is not None:
+        s = limiter.stats()
+        print(f"limiter         queued={s['queued']} queued_sec={s['queued_sec']} max_queued_sec={s['max_queued_sec']} blocks={s['blocks']}")
+    print(f"breakers_open   {open_breakers or '-'}")
+
+
+if __name__ == "__main__":
+    main()
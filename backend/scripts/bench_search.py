@@ -0,0 +1,219 @@
+"""Compare the old ILIKE-over-views search with the indexed search_text search.
+
+Usage (from backend/, with DATABASE_URL pointing at a seeded database that has
+migration 011 applied):
+
+    python -m scripts.bench_search --runs 20
+    python -m scripts.bench_search --scale 200000 --q "Bench 42" --q bench_caller7
+
+For each term it times what /trades/paged and /tips/paged run for `q` (first
+page + filtered count) both ways, checks they return the same rows, and
+reports whether the trigram index was used. `--scale N` first inserts N extra
+trades and N extra tips (and the accounts behind them) inside a transaction
+that is rolled back at the end. Without `--q`, the terms are a coin name,
+symbol, address, trade id and handle taken from the seeded rows (or from the
+existing data when not seeding), plus one that matches nothing.
+"""
+
+import argparse
+import hashlib
+import statistics
+import time
+
+import psycopg
+
+from server.db import settings
+
+NO_MATCH_TERM = "no-such-coin"
+BENCH_ACCOUNTS = 10
+
+QUERIES = {
+    "trades": {
+        "legacy": (
+            """
+            SELECT v.id
+            FROM v_trades_pnl v
+            LEFT JOIN coins c ON v.ca = c.ca AND v.chain = c.chain
+            WHERE (v.coin_name ILIKE %(q)s OR v.ca ILIKE %(q)s OR v.trade_id::text ILIKE %(q)s OR c.symbol ILIKE %(q)s)
+            ORDER BY v.entry_ts DESC, v.id DESC LIMIT 100;
+            """,
+            """
+            SELECT COUNT(*)
+            FROM trades t
+            JOIN coins c ON t.ca = c.ca AND t.chain = c.chain
+            WHERE (c.name ILIKE %(q)s OR t.ca ILIKE %(q)s OR t.trade_id::text ILIKE %(q)s OR c.symbol ILIKE %(q)s);
+            """,
+        ),
+        "indexed": (
+            """
+            SELECT v.id
+            FROM v_trades_pnl v
+            WHERE v.id IN (SELECT id FROM trades WHERE search_text ILIKE %(q)s)
+            ORDER BY v.entry_ts DESC, v.id DESC LIMIT 100;
+            """,
+            "SELECT COUNT(*) FROM trades t WHERE t.search_text ILIKE %(q)s;",
+        ),
+    },
+    "tips": {
+        "legacy": (
+            """
+            SELECT v.tip_id
+            FROM v_tip_gain_loss v
+            LEFT JOIN coins c ON v.ca = c.ca AND v.chain = c.chain
+            WHERE (v.coin_name ILIKE %(q)s OR v.handle ILIKE %(q)s OR v.platform ILIKE %(q)s
+                   OR v.ca ILIKE %(q)s OR v.tip_id::text ILIKE %(q)s OR c.symbol ILIKE %(q)s)
+            ORDER BY v.post_ts DESC, v.tip_id DESC LIMIT 100;
+            """,
+            """
+            SELECT COUNT(*)
+            FROM v_tip_gain_loss v
+            LEFT JOIN coins c ON v.ca = c.ca AND v.chain = c.chain
+            WHERE (v.coin_name ILIKE %(q)s OR v.handle ILIKE %(q)s OR v.platform ILIKE %(q)s
+                   OR v.ca ILIKE %(q)s OR v.tip_id::text ILIKE %(q)s OR c.symbol ILIKE %(q)s);
+            """,
+        ),
+        "indexed": (
+            """
+            SELECT v.tip_id
+            FROM v_tip_gain_loss v
+            WHERE v.tip_id IN (SELECT tip_id FROM tips WHERE search_text ILIKE %(q)s)
+            ORDER BY v.post_ts DESC, v.tip_id DESC LIMIT 100;
+            """,
+            "SELECT COUNT(*) FROM tips t WHERE t.search_text ILIKE %(q)s;",
+        ),
+    },
+}
+
+
+def _accounts_table(cur) -> str:
+    cur.execute(
+        "SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'accounts';"
+    )
+    return "accounts" if cur.fetchone() else "social_accounts"
+
+
+def _seed(cur, scale: int) -> list[str]:
+    """Insert the bench rows; returns search terms that hit them."""
+    coins = max(1, scale // 20)
+    cur.execute(
+        """
+        INSERT INTO coins (ca, name, symbol, chain, launch_ts, source_type)
+        SELECT 'bench' || md5(g::text), 'Bench ' || g, 'BN' || g, 'solana', now(), 'dex'
+        FROM generate_series(1, %s) g;
+        """,
+        (coins,),
+    )
+    cur.execute(
+        """
+        INSERT INTO trades (trade_id, ca, chain, entry_ts, entry_mcap_usd)
+        SELECT 'bench_' || g, 'bench' || md5((1 + g %% %s)::text), 'solana',
+               now() - (g || ' seconds')::interval, 1000 + g
+        FROM generate_series(1, %s) g;
+        """,
+        (coins, scale),
+    )
+    cur.execute(
+        f"""
+        INSERT INTO {_accounts_table(cur)} (platform, handle)
+        SELECT 'x', 'bench_caller' || g FROM generate_series(1, %s) g
+        RETURNING account_id;
+        """,
+        (BENCH_ACCOUNTS,),
+    )
+    account_ids = [row[0] for row in cur.fetchall()]
+    cur.execute(
+        """
+        INSERT INTO tips (account_id, ca, chain, post_ts, post_mcap_usd)
+        SELECT (%s::bigint[])[1 + g %% %s], 'bench' || md5((1 + g %% %s)::text), 'solana',
+               now() - (g || ' seconds')::interval, 2000 + g
+        FROM generate_series(1, %s) g;
+        """,
+        (account_ids, len(account_ids), coins, scale),
+    )
+    cur.execute("ANALYZE coins; ANALYZE trades; ANALYZE tips;")
+    return [
+        f"Bench {coins // 2 or 1}",
+        f"BN{coins // 3 or 1}",
+        "bench" + hashlib.md5(b"1").hexdigest()[:12],
+        f"bench_{scale // 2 or 1}",
+        f"bench_caller{BENCH_ACCOUNTS // 2}",
+    ]
+
+
+def _terms_from_data(cur) -> list[str]:
+    """A coin name, symbol, address, trade id and handle from the newest trade and tip."""
+    cur.execute(
+        """
+        SELECT c.name, c.symbol, t.ca, t.trade_id
+        FROM trades t JOIN coins c ON c.ca = t.ca AND c.chain = t.chain
+        ORDER BY t.id DESC LIMIT 1;
+        """
+    )
+    terms = list(cur.fetchone() or [])
+    cur.execute(
+        f"""
+        SELECT a.handle
+        FROM tips t JOIN {_accounts_table(cur)} a USING (account_id)
+        ORDER BY t.tip_id DESC LIMIT 1;
+        """
+    )
+    terms.extend(cur.fetchone() or [])
+    return [str(term) for term in terms if term]
+
+
+def _time(cur, sql: str, params: dict, runs: int) -> tuple[float, list]:
+    samples = []
+    rows: list = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), rows
+
+
+def _uses_trgm(cur, sql: str, params: dict) -> bool:
+    cur.execute("EXPLAIN " + sql, params)
+    return any("search_trgm" in line for (line,) in cur.fetchall())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--scale", type=int, default=0)
+    parser.add_argument("--q", action="append", default=None)
+    args = parser.parse_args()
+
+    failed = False
+    with psycopg.connect(settings.database_url) as conn:
+        with conn.cursor() as cur:
+            sample_terms = _seed(cur, args.scale) if args.scale else _terms_from_data(cur)
+            terms = args.q or sample_terms + [NO_MATCH_TERM]
+            print(f"{'endpoint':<7} {'q':<16} {'legacy_ms':>10} {'indexed_ms':>11} {'speedup':>8} {'rows':>6}  trgm")
+            for endpoint, variants in QUERIES.items():
+                for term in terms:
+                    params = {"q": f"%{term}%"}
+                    timings = {}
+                    results = {}
+                    for name, (page_sql, count_sql) in variants.items():
+                        page_ms, page_rows = _time(cur, page_sql, params, args.runs)
+                        count_ms, count_rows = _time(cur, count_sql, params, args.runs)
+                        timings[name] = page_ms + count_ms
+                        results[name] = (page_rows, count_rows)
+                    same = results["legacy"] == results["indexed"]
+                    failed |= not same
+                    uses_trgm = _uses_trgm(cur, variants["indexed"][1], params)
+                    speedup = timings["legacy"] / timings["indexed"] if timings["indexed"] else float("inf")
+                    print(
+                        f"{endpoint:<7} {term[:16]:<16} {timings['legacy']:>10.2f} {timings['indexed']:>11.2f} "
+                        f"{speedup:>7.1f}x {results['indexed'][1][0][0]:>6}  {'yes' if uses_trgm else 'no'}"
+                        + ("" if same else "  RESULTS DIFFER")
+                    )
+        conn.rollback()
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
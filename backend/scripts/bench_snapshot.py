@@ -0,0 +1,144 @@
+"""Compare the snapshot engines: sequential Python, pipelined Python and SQL (json_agg).
+
+Usage (from backend/, with DATABASE_URL pointing at a seeded database):
+
+    python -m scripts.bench_snapshot --runs 20 --limit 2000
+    python -m scripts.bench_snapshot --ca <contract address>
+
+For each engine it reports statements sent and network round trips per
+snapshot (a pipelined batch is one round trip), wall time and process
+CPU time (row building + JSON encoding on the Python side), and checks that
+all engines produce the same document: compared after re-encoding, so only
+whitespace may differ, not key order, strings or 21 vs 21.0.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from contextlib import asynccontextmanager
+
+import psycopg
+
+from server.db import settings
+from server.routers import snapshot
+
+
+class Counts:
+    statements = 0
+    round_trips = 0
+    in_pipeline = False
+
+
+class CountingConnection(psycopg.AsyncConnection):
+    @asynccontextmanager
+    async def pipeline(self):
+        Counts.in_pipeline = True
+        try:
+            async with super().pipeline() as p:
+                yield p
+        finally:
+            Counts.in_pipeline = False
+        # everything queued in the block is sent together and synced once on exit
+        Counts.round_trips += 1
+
+
+class CountingCursor(psycopg.AsyncCursor):
+    async def execute(self, *args, **kwargs):
+        Counts.statements += 1
+        if not Counts.in_pipeline:
+            Counts.round_trips += 1
+        return await super().execute(*args, **kwargs)
+
+
+def _canonical(body: str) -> str:
+    return json.dumps(json.loads(body), ensure_ascii=False, separators=(",", ":"))
+
+
+async def _sequential_engine(conn, ca, chain, limit) -> str:
+    if ca:
+        detail = {"ca": ca, "chain": chain}
+        async for name, rows in snapshot._coin_detail_sections(conn, ca, chain):
+            detail[name] = [row async for row in rows]
+        snap = {"coin_detail": detail}
+    else:
+        snap = {}
+        async for name, rows in snapshot._global_sections(conn, chain, limit):
+            snap[name] = [row async for row in rows]
+    return json.dumps(snap)
+
+
+async def _pipelined_engine(conn, ca, chain, limit) -> str:
+    snap, _ = await snapshot._pipelined_snapshot(conn, ca, chain, limit)
+    return json.dumps(snap)
+
+
+async def _sql_engine(conn, ca, chain, limit) -> str:
+    return await snapshot._sql_snapshot(conn, ca, chain, limit)
+
+
+async def _measure(conn, fn, args, runs: int) -> dict:
+    wall, cpu = [], []
+    body = ""
+    Counts.statements = Counts.round_trips = 0
+    for _ in range(runs):
+        w0, c0 = time.perf_counter(), time.process_time()
+        body = await fn(conn, *args)
+        cpu.append((time.process_time() - c0) * 1000)
+        wall.append((time.perf_counter() - w0) * 1000)
+        await conn.rollback()
+    return {
+        "statements": Counts.statements / runs,
+        "round_trips": Counts.round_trips / runs,
+        "wall_ms_p50": statistics.median(wall),
+        "cpu_ms_p50": statistics.median(cpu),
+        "bytes": len(body),
+        "body": body,
+    }
+
+
+async def _bench(args) -> dict:
+    async with await CountingConnection.connect(settings.database_url, cursor_factory=CountingCursor) as conn:
+        ca = args.ca.lower() if args.ca else None
+        chain = args.chain.lower() if args.chain else None
+        if ca and not chain:
+            async with conn.cursor() as cur:
+                chain = await snapshot._resolve_chain(cur, ca)
+        engine_args = (ca, chain, args.limit)
+
+        return {
+            "sequential": await _measure(conn, _sequential_engine, engine_args, args.runs),
+            "pipelined": await _measure(conn, _pipelined_engine, engine_args, args.runs),
+            "sql": await _measure(conn, _sql_engine, engine_args, args.runs),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--chain", default=None)
+    parser.add_argument("--ca", default=None)
+    args = parser.parse_args()
+
+    results = asyncio.run(_bench(args))
+
+    print(
+        f"{'engine':<11} {'statements':>11} {'round_trips':>12} {'wall_ms_p50':>12} {'cpu_ms_p50':>11} {'bytes':>10}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<11} {r['statements']:>11.1f} {r['round_trips']:>12.1f} {r['wall_ms_p50']:>12.2f} "
+            f"{r['cpu_ms_p50']:>11.2f} {r['bytes']:>10}"
+        )
+
+    docs = [_canonical(r["body"]) for r in results.values()]
+    same = all(doc == docs[0] for doc in docs[1:])
+    print("outputs match" if same else "OUTPUTS DIFFER")
+    if not same:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
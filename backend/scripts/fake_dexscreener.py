@@ -0,0 +1,211 @@
+"""Local stand-in for the Dexscreener endpoints the backend calls.
+
+Serves /token-pairs/v1/{chain}/{ca} and /tokens/v1/{chain}/{ca,ca,...} from an
+in-memory token table, on a background thread. Latency, 5xx errors and 429s
+(with Retry-After) can be injected. Used by the tests, scripts/bench_dexscreener.py
+and for running the backend offline:
+
+    python -m scripts.fake_dexscreener --port 8765 --tokens 200 --latency-ms 80 --error-rate 0.02
+    DEX_BASE=http://127.0.0.1:8765 uvicorn server.main:app
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_pair(chain: str, ca: str, token: dict, n: int = 0) -> dict:
+    return {
+        "chainId": chain,
+        "pairAddress": f"pair{n}_{ca[-12:]}",
+        "baseToken": {"address": ca, "name": token["name"], "symbol": token["symbol"]},
+        "quoteToken": {"address": "quote", "name": "Quote", "symbol": "Q"},
+        "priceUsd": str(token["mcap"] / 1e9),
+        "marketCap": token["mcap"],
+        "fdv": token["mcap"],
+        "liquidity": {"usd": token["mcap"] / (10 + n)},
+        "pairCreatedAt": token["created_ms"] + n * 60_000,
+    }
+
+
+class FakeDexscreener:
+    """In-process fake; the knobs are plain attributes and can change while running.
+
+    latency_ms + uniform jitter_ms delays every response; error_rate and
+    rate_limit_rate are the chances of a 503 and of a 429 carrying
+    `Retry-After: retry_after`; pairs_per_token pairs are returned per token.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: int = 1,
+        pairs_per_token: int = 1,
+        seed: int | None = None,
+    ):
+        self.tokens: dict[tuple[str, str], dict] = {}
+        self.requests: list[str] = []
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.pairs_per_token = pairs_per_token
+        self.responses: dict[int, int] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_token(self, chain: str, ca: str, mcap: float, name: str | None = None, symbol: str | None = None,
+                  created_ms: int = 1_700_000_000_000) -> None:
+        self.tokens[(chain, ca.lower())] = {
+            "name": name or f"Token {ca[-4:]}",
+            "symbol": symbol or ca[-4:].upper(),
+            "mcap": mcap,
+            "created_ms": created_ms,
+        }
+
+    def set_mcap(self, chain: str, ca: str, mcap: float) -> None:
+        self.tokens[(chain, ca.lower())]["mcap"] = mcap
+
+    def _pairs(self, chain: str, cas: list[str]) -> list[dict]:
+        found = []
+        for ca in cas:
+            token = self.tokens.get((chain, ca.lower()))
+            if token is not None:
+                found.extend(make_pair(chain, ca.lower(), token, n) for n in range(self.pairs_per_token))
+        return found
+
+    def _roll(self) -> tuple[float, str | None]:
+        with self._lock:
+            delay = (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return delay, "429"
+        if roll < self.rate_limit_rate + self.error_rate:
+            return delay, "503"
+        return delay, None
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests.append(self.path)
+                delay, failure = fake._roll()
+                if delay > 0:
+                    time.sleep(delay)
+                parts = self.path.split("?", 1)[0].strip("/").split("/")
+                if failure == "429":
+                    self._send(429, {"error": "rate_limited"}, {"Retry-After": str(fake.retry_after)})
+                elif failure == "503":
+                    self._send(503, {"error": "unavailable"})
+                elif len(parts) == 4 and parts[0] in ("token-pairs", "tokens") and parts[1] == "v1":
+                    self._send(200, fake._pairs(parts[2], parts[3].split(",")))
+                else:
+                    self._send(404, {"error": "not_found"})
+
+            def _send(self, status: int, payload, headers: dict | None = None) -> None:
+                with fake._lock:
+                    fake.responses[status] = fake.responses.get(status, 0) + 1
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeDexscreener":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeDexscreener":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def _b58encode(raw: bytes) -> str:
+    alphabet = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+    num = int.from_bytes(raw, "big")
+    out = ""
+    while num:
+        num, rem = divmod(num, 58)
+        out = alphabet[rem] + out
+    return "1" * (len(raw) - len(raw.lstrip(b"\0"))) + out
+
+
+def seed_tokens(fake: FakeDexscreener, n: int) -> list[str]:
+    """N base + N solana tokens with address formats the chain classifier accepts."""
+    cas = []
+    for i in range(n):
+        evm = f"0x{i + 1:040x}"
+        sol = _b58encode((i + 1).to_bytes(4, "big") * 8)
+        fake.add_token("base", evm, mcap=50_000 + i * 1_000)
+        fake.add_token("solana", sol, mcap=20_000 + i * 500)
+        cas.extend([evm, sol])
+    return cas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tokens", type=int, default=100, help="seed N tokens per chain (solana + base)")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--pairs-per-token", type=int, default=1)
+    args = parser.parse_args()
+
+    fake = FakeDexscreener(
+        args.host,
+        args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        pairs_per_token=args.pairs_per_token,
+    )
+    seed_tokens(fake, args.tokens)
+    print(f"fake dexscreener on {fake.url} with {len(fake.tokens)} tokens")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRUCache:
+    """Small thread-safe LRU map; the least recently used entry is evicted past `maxsize`."""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = max(1, maxsize)
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class TTLCache:
+    """Size-bounded LRU map whose entries go fresh -> stale -> expired.
+
+    A stale entry is still returned (flagged as such) so callers can serve it
+    while refreshing it in the background. Meant for a single asyncio event
+    loop: no method awaits, so reads and writes need no lock. The clock is
+    passed in by the caller.
+    """
+
+    FRESH = "fresh"
+    STALE = "stale"
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = max(1, maxsize)
+        # key -> (fresh_until, stale_until, value)
+        self._data: OrderedDict[Hashable, tuple[float, float, Any]] = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, now: float) -> tuple[Any, str] | None:
+        """(value, FRESH | STALE), or None when missing or past its stale window."""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        fresh_until, stale_until, value = item
+        if now >= stale_until:
+            self._data.pop(key, None)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        if now < fresh_until:
+            self.hits += 1
+            return value, self.FRESH
+        self.stale_hits += 1
+        return value, self.STALE
+
+    def set(self, key: Hashable, value: Any, now: float, ttl: float, stale_ttl: float = 0) -> None:
+        self._data[key] = (now + ttl, now + ttl + stale_ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class DataVersion:
+    """Process-wide counter bumped after every committed write.
+
+    Read endpoints key their caches and ETags on it. The epoch changes on every
+    process start so validators issued before a restart never match.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def current(self) -> int:
+        return self._value
+
+    def bump(self) -> int:
+        with self._lock:
+            self._value += 1
+            return self._value
+
+    def etag(self, version: int | None = None) -> str:
+        return f'W/"{self.epoch}-{self.current() if version is None else version}"'
+
+
+data_version = DataVersion()
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in if_none_match.split(","))
@@ -0,0 +1,68 @@
+"""Which chains a contract address can possibly live on, judged by its format.
+
+EVM chains share the `0x` + 40 hex digits format; Solana mints are base58
+encoded 32-byte public keys. The two never overlap, so a token lookup only has
+to ask the chains whose format matches. CAs are stored lowercased, which loses
+base58 case, so a lowercased mint is accepted on its character set and length
+alone; when the original casing is available it is fully decoded.
+"""
+
+import re
+
+EVM_CHAINS = frozenset(("ethereum", "bsc", "base", "arbitrum", "polygon", "avalanche", "fantom", "optimism"))
+SOLANA_CHAINS = frozenset(("solana",))
+
+_B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_B58_INDEX = {ch: i for i, ch in enumerate(_B58_ALPHABET)}
+_EVM_RE = re.compile(r"0x[0-9a-fA-F]{40}")
+_B58_RE = re.compile(r"[1-9A-HJ-NP-Za-km-z]{32,44}")
+# what a base58 string looks like after .lower(): 'L' -> 'l' is the only new character
+_B58_LOWER_RE = re.compile(r"[1-9a-z]{32,44}")
+
+
+def _b58_decoded_len(value: str) -> int:
+    num = 0
+    for ch in value:
+        num = num * 58 + _B58_INDEX[ch]
+    leading_zeros = len(value) - len(value.lstrip("1"))
+    return leading_zeros + (num.bit_length() + 7) // 8
+
+
+def is_evm_address(ca: str) -> bool:
+    # EIP-55 mixed-case checksums need keccak-256, which hashlib does not ship;
+    # the format check alone already separates EVM from Solana.
+    return _EVM_RE.fullmatch(ca) is not None
+
+
+def is_solana_address(ca: str) -> bool:
+    if ca == ca.lower():
+        return _B58_LOWER_RE.fullmatch(ca) is not None
+    return _B58_RE.fullmatch(ca) is not None and _b58_decoded_len(ca) == 32
+
+
+def chain_candidates(ca: str, chains: list[str]) -> list[str]:
+    """Subset of `chains` (order kept) whose address format matches `ca`.
+
+    Unrecognised formats get every chain back, so an address from a chain we
+    have no rule for is still looked up everywhere.
+    """
+    ca = ca.strip()
+    if is_evm_address(ca):
+        allowed = EVM_CHAINS
+    elif is_solana_address(ca):
+        allowed = SOLANA_CHAINS
+    else:
+        return list(chains)
+    return [chain for chain in chains if chain in allowed]
+
+
+async def known_chains(cur, cas: list[str]) -> dict[str, list[str]]:
+    """Chains each CA is already stored under in `coins` (CAs not stored are left out)."""
+    await cur.execute(
+        "SELECT ca, chain FROM coins WHERE ca = ANY(%s) ORDER BY ca, chain;",
+        ([ca.lower() for ca in cas],),
+    )
+    found: dict[str, list[str]] = {}
+    for ca, chain in await cur.fetchall():
+        found.setdefault(ca, []).append(chain)
+    return found
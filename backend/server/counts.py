@@ -0,0 +1,17 @@
+async def entity_counts(cur, entity: str, ca: str | None = None, chain: str | None = None) -> tuple[int, int]:
+    """(total, open) for `entity` ("trade" or "tip") from the trigger-maintained counters."""
+    where = ["entity = %s"]
+    params: list = [entity]
+    if ca:
+        where.append("ca = %s")
+        params.append(ca)
+    if chain:
+        where.append("chain = %s")
+        params.append(chain)
+    await cur.execute(
+        "SELECT COALESCE(SUM(total_count), 0), COALESCE(SUM(open_count), 0) "
+        "FROM entity_counts WHERE " + " AND ".join(where) + ";",
+        tuple(params),
+    )
+    total, open_ = await cur.fetchone()
+    return int(total), int(open_)
@@ -1,6 +1,12 @@
-from psycopg_pool import ConnectionPool
+import os
+from time import monotonic
+
+from psycopg_pool import AsyncConnectionPool, PoolTimeout, TooManyRequests
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from . import instrumentation
+from .metrics import Histogram
+
 
 class Settings(BaseSettings):
     database_url: str
@@ -9,13 +15,68 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
-pool = ConnectionPool(
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+DB_POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT_SEC", "30"))
+# requests queued for a connection beyond this are refused at once (503); 0 = unbounded
+DB_POOL_MAX_WAITING = int(os.getenv("DB_POOL_MAX_WAITING", "20"))
+DB_POOL_RETRY_AFTER_SEC = int(os.getenv("DB_POOL_RETRY_AFTER_SEC", "1"))
+
+
+class TimedPool(AsyncConnectionPool):
+    """AsyncConnectionPool that records how long each checkout waited and why it failed."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_ms = Histogram()
+        self.rejected = 0
+        self.timeouts = 0
+
+    async def getconn(self, timeout: float | None = None):
+        started = monotonic()
+        try:
+            conn = await super().getconn(timeout)
+        except TooManyRequests:
+            self.rejected += 1
+            raise
+        except PoolTimeout:
+            self.timeouts += 1
+            raise
+        waited_ms = (monotonic() - started) * 1000
+        self.wait_ms.observe(waited_ms)
+        instrumentation.record_pool_wait(waited_ms)
+        return conn
+
+
+async def _configure(conn) -> None:
+    # statements on pooled connections count towards the current request's stats
+    conn.cursor_factory = instrumentation.TimedCursor
+    conn.server_cursor_factory = instrumentation.TimedServerCursor
+
+
+# opened in the app's startup handler: an async pool needs a running event loop
+pool = TimedPool(
     conninfo=settings.database_url,
-    min_size=1,
-    max_size=5,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT_SEC,
+    max_waiting=DB_POOL_MAX_WAITING,
+    configure=_configure,
     open=False,
 )
 
 
 def get_conn():
-    return pool.connection()
\ No newline at end of file
+    return pool.connection()
+
+
+def pool_stats() -> dict:
+    """psycopg_pool's counters plus checkout wait times and refusals."""
+    return {
+        **pool.get_stats(),
+        "timeout_sec": DB_POOL_TIMEOUT_SEC,
+        "max_waiting": DB_POOL_MAX_WAITING,
+        "rejected": pool.rejected,
+        "timeouts": pool.timeouts,
+        "wait_ms": pool.wait_ms.snapshot(),
+    }
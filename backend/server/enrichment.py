@@ -0,0 +1,150 @@
+"""Batched loader for the per-trade / per-tip extras: cluster bubbles, "others"
+bubbles and the latest intuition_score.
+
+All three are fetched for a batch of ids in one UNION ALL statement, and a
+loader remembers what it has already fetched, so an id is only ever looked up
+once per request.
+"""
+
+from typing import Hashable, Iterable, NamedTuple
+
+from fastapi import HTTPException
+
+_KINDS = ("trade", "tip")
+INCLUDE_ALL = frozenset(("bubbles", "scoring"))
+
+_PART_CLUSTER = 1
+_PART_OTHER = 2
+_PART_SCORE = 3
+
+
+class Extras(NamedTuple):
+    clusters: list[dict]
+    others: list[dict]
+    intuition_score: int | None
+
+    def bubbles(self) -> dict | None:
+        """Listing shape: None when the trade/tip has no bubbles at all."""
+        if not (self.clusters or self.others):
+            return None
+        return {"clusters": self.clusters, "others": self.others}
+
+    def scoring(self) -> dict | None:
+        if self.intuition_score is None:
+            return None
+        return {"intuition_score": self.intuition_score}
+
+
+EMPTY_EXTRAS = Extras([], [], None)
+
+
+def parse_include(raw: str | None) -> frozenset[str]:
+    """`include=` query value -> set of extras to load.
+
+    Omitted means everything (the historical behaviour); an empty value means
+    none, so the listing costs a single query.
+    """
+    if raw is None:
+        return INCLUDE_ALL
+    include = frozenset(part.strip().lower() for part in raw.split(",") if part.strip())
+    unknown = include - INCLUDE_ALL
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Invalid include: {', '.join(sorted(unknown))}")
+    return include
+
+
+def extras_query(kind: str, ids: list, include: frozenset[str] = INCLUDE_ALL) -> tuple[str, dict]:
+    """One statement returning (part, key, rank, value) rows for every id."""
+    if kind not in _KINDS:
+        raise ValueError(f"unknown extras kind: {kind}")
+    if not include:
+        raise ValueError("nothing to include")
+    key = f"{kind}_id"
+    branches = []
+    if "bubbles" in include:
+        branches.append(
+            f"""
+            SELECT {_PART_CLUSTER} AS part, {key} AS key, cluster_rank AS rank, pct::float8 AS value
+            FROM {kind}_bubbles
+            WHERE {key} = ANY(%(ids)s)
+            UNION ALL
+            SELECT {_PART_OTHER}, {key}, other_rank, pct
+            FROM {kind}_bubbles_others
+            WHERE {key} = ANY(%(ids)s)
+            """
+        )
+    if "scoring" in include:
+        branches.append(
+            f"""
+            (
+              SELECT DISTINCT ON ({key}) {_PART_SCORE} AS part, {key} AS key, 0 AS rank,
+                intuition_score::float8 AS value
+              FROM {kind}_scoring
+              WHERE {key} = ANY(%(ids)s)
+              ORDER BY {key} ASC, scored_ts DESC
+            )
+            """
+        )
+    sql = f"""
+        SELECT part, key, rank, value
+        FROM ({" UNION ALL ".join(branches)}) extras
+        ORDER BY key, part, rank;
+    """
+    return sql, {"ids": ids}
+
+
+def collect_extras(rows: Iterable[tuple]) -> dict[Hashable, Extras]:
+    """Group extras_query() rows by id; ids without any extras are left out."""
+    clusters_by: dict = {}
+    others_by: dict = {}
+    scoring_by: dict = {}
+    for part, key, rank, value in rows:
+        if part == _PART_CLUSTER:
+            clusters_by.setdefault(key, []).append({"rank": rank, "pct": float(value)})
+        elif part == _PART_OTHER:
+            others_by.setdefault(key, []).append({"rank": rank, "pct": float(value)})
+        else:
+            scoring_by[key] = int(value)
+    keys = clusters_by.keys() | others_by.keys() | scoring_by.keys()
+    return {
+        key: Extras(clusters_by.get(key, []), others_by.get(key, []), scoring_by.get(key))
+        for key in keys
+    }
+
+
+class EnrichmentLoader:
+    """Request-scoped cache in front of extras_query().
+
+    `load()` fetches only the ids it has not seen yet (one round trip per call,
+    none when `include` is empty), and `prime()` lets callers that already ran
+    extras_query() themselves, e.g. inside a pipeline, hand the rows over.
+    """
+
+    def __init__(self, cur=None, include: frozenset[str] = INCLUDE_ALL):
+        self.cur = cur
+        self.include = include
+        self._seen: dict[str, dict[Hashable, Extras]] = {kind: {} for kind in _KINDS}
+        self.round_trips = 0
+
+    def missing(self, kind: str, ids: Iterable) -> list:
+        seen = self._seen[kind]
+        return list(dict.fromkeys(i for i in ids if i not in seen))
+
+    def prime(self, kind: str, ids: Iterable, rows: Iterable[tuple]) -> None:
+        seen = self._seen[kind]
+        found = collect_extras(rows)
+        for key in ids:
+            seen[key] = found.get(key, EMPTY_EXTRAS)
+
+    async def load(self, kind: str, ids: Iterable) -> dict[Hashable, Extras]:
+        ids = list(ids)
+        if not self.include:
+            return {key: EMPTY_EXTRAS for key in ids}
+        missing = self.missing(kind, ids)
+        if missing:
+            sql, params = extras_query(kind, missing, self.include)
+            await self.cur.execute(sql, params)
+            self.round_trips += 1
+            self.prime(kind, missing, await self.cur.fetchall())
+        seen = self._seen[kind]
+        return {key: seen[key] for key in ids}
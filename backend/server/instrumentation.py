@@ -0,0 +1,130 @@
+"""Per-request database accounting.
+
+The request middleware opens a RequestStats for every request in a context
+variable. The pool adds checkout waits to it, the cursor classes below add each
+statement's count and duration, and TimedJSONResponse adds the time spent
+encoding the body. Work outside a request (the background pollers) is not
+recorded in the stats, but their slow statements still reach the slow query
+log (see slow_queries.py).
+"""
+
+import os
+from contextvars import ContextVar, Token
+from time import perf_counter
+
+import psycopg
+from fastapi.responses import JSONResponse
+
+from . import slow_queries
+
+# more statements than this in one request logs a warning; 0 disables it
+REQUEST_QUERY_BUDGET = int(os.getenv("REQUEST_QUERY_BUDGET", "25"))
+
+
+class RequestStats:
+    __slots__ = ("request_id", "path", "queries", "sql_ms", "pool_wait_ms", "render_ms")
+
+    def __init__(self, request_id: str | None = None, path: str | None = None):
+        self.request_id = request_id
+        self.path = path
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.pool_wait_ms = 0.0
+        self.render_ms = 0.0
+
+    def app_ms(self, total_ms: float) -> float:
+        """Time not spent waiting on the pool, in SQL or encoding JSON: row building and the like."""
+        return max(total_ms - self.pool_wait_ms - self.sql_ms - self.render_ms, 0.0)
+
+    def server_timing(self, total_ms: float) -> str:
+        return ", ".join(
+            [
+                f"pool;dur={self.pool_wait_ms:.2f}",
+                f'db;dur={self.sql_ms:.2f};desc="{self.queries} queries"',
+                f"app;dur={self.app_ms(total_ms):.2f}",
+                f"render;dur={self.render_ms:.2f}",
+                f"total;dur={total_ms:.2f}",
+            ]
+        )
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def begin(request_id: str | None = None, path: str | None = None) -> tuple[RequestStats, Token]:
+    stats = RequestStats(request_id, path)
+    return stats, _current.set(stats)
+
+
+def end(token: Token) -> None:
+    _current.reset(token)
+
+
+def current() -> RequestStats | None:
+    return _current.get()
+
+
+def record_pool_wait(ms: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.pool_wait_ms += ms
+
+
+async def _timed(coro, count: bool, query=None, params=None):
+    stats = _current.get()
+    watch_slow = query is not None and slow_queries.enabled()
+    if stats is None and not watch_slow:
+        return await coro
+    started = perf_counter()
+    try:
+        return await coro
+    finally:
+        elapsed_ms = (perf_counter() - started) * 1000
+        if stats is not None:
+            stats.sql_ms += elapsed_ms
+            if count:
+                stats.queries += 1
+        if watch_slow and elapsed_ms >= slow_queries.SLOW_QUERY_MS:
+            slow_queries.record(
+                query,
+                params,
+                elapsed_ms,
+                stats.request_id if stats else None,
+                stats.path if stats else None,
+            )
+
+
+class TimedCursor(psycopg.AsyncCursor):
+    async def execute(self, query, params=None, **kwargs):
+        return await _timed(super().execute(query, params, **kwargs), count=True, query=query, params=params)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        return await _timed(super().executemany(query, params_seq, **kwargs), count=True)
+
+
+class TimedServerCursor(psycopg.AsyncServerCursor):
+    """Named cursors do their work in FETCH round trips, so those are timed too."""
+
+    async def execute(self, query, params=None, **kwargs):
+        return await _timed(super().execute(query, params, **kwargs), count=True)
+
+    async def fetchone(self):
+        return await _timed(super().fetchone(), count=False)
+
+    async def fetchmany(self, size=0):
+        return await _timed(super().fetchmany(size), count=False)
+
+    async def fetchall(self):
+        return await _timed(super().fetchall(), count=False)
+
+
+class TimedJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        stats = _current.get()
+        if stats is None:
+            return super().render(content)
+        started = perf_counter()
+        try:
+            return super().render(content)
+        finally:
+            stats.render_ms += (perf_counter() - started) * 1000
@@ -1,33 +1,42 @@
 import os
 import time
 import uuid
+import asyncio
 import logging
-import threading
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Header, HTTPException
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
+from psycopg_pool import PoolTimeout, TooManyRequests
 
-from .db import pool
+from . import instrumentation, market, metrics, slow_queries, tip_tracker
+from .auth import require_admin
+from .cache import data_version
+from .db import DB_POOL_RETRY_AFTER_SEC, pool, pool_stats
 from .routers.coins import router as coins_router
 from .routers.trades import router as trades_router
 from .routers.tips import router as tips_router
 from .routers.bubbles import router as bubbles_router
 from .routers.scoring import router as scoring_router
 from .routers.snapshot import router as snapshot_router
+from .routers import dexscreener
 from .routers.dexscreener import router as dexscreener_router
 from .routers.wizard import router as wizard_router
 from .routers.context import router as context_router
 from .routers.auth import router as auth_router
+from .routers.metrics import router as metrics_router
 
-app = FastAPI(title="Memecoin Trade Tracker API")
+app = FastAPI(title="Memecoin Trade Tracker API", default_response_class=instrumentation.TimedJSONResponse)
 logger = logging.getLogger("app")
 
 VERCEL_FRONTEND_URL = os.getenv("VERCEL_FRONTEND_URL")
 WARMUP_KEY = os.getenv("WARMUP_KEY")
 ACCOUNTS_MV_REFRESH_SECONDS = os.getenv("ACCOUNTS_MV_REFRESH_SECONDS", "600")
 ACCOUNTS_MV_REFRESH_LOCK_KEY = 941773
+# change_log rows older than this are pruned every CHANGE_LOG_PRUNE_SECONDS; 0 keeps them forever
+CHANGE_LOG_RETENTION_HOURS = float(os.getenv("CHANGE_LOG_RETENTION_HOURS", "72"))
+CHANGE_LOG_PRUNE_SECONDS = max(1, int(os.getenv("CHANGE_LOG_PRUNE_SECONDS", "600")))
 
 allow_origins = [
     "http://localhost:3000",
@@ -44,6 +53,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Snapshot-Token", "Retry-After", "Server-Timing"],
 )
 
 def _parse_refresh_interval() -> int:
@@ -53,64 +63,155 @@ def _parse_refresh_interval() -> int:
         return 600
 
 
-def _refresh_accounts_summary() -> dict:
-    with pool.connection() as conn:
+_REFRESH_OUTCOMES = {200: "ok", 409: "locked", 404: "missing"}
+
+
+async def _refresh_accounts_summary() -> dict:
+    started = time.monotonic()
+    outcome = "error"
+    try:
+        result = await _run_accounts_summary_refresh()
+        outcome = _REFRESH_OUTCOMES.get(result.get("status"), "error")
+        return result
+    finally:
+        metrics.observe_refresh("mv_accounts_summary", outcome, time.monotonic() - started, time.time())
+
+
+async def _run_accounts_summary_refresh() -> dict:
+    async with pool.connection() as conn:
         old_autocommit = conn.autocommit
-        conn.autocommit = True
+        await conn.set_autocommit(True)
         try:
-            with conn.cursor() as cur:
-                cur.execute("SELECT pg_try_advisory_lock(%s);", (ACCOUNTS_MV_REFRESH_LOCK_KEY,))
-                lock_acquired = cur.fetchone()[0]
+            async with conn.cursor() as cur:
+                await cur.execute("SELECT pg_try_advisory_lock(%s);", (ACCOUNTS_MV_REFRESH_LOCK_KEY,))
+                lock_acquired = (await cur.fetchone())[0]
                 if not lock_acquired:
                     return {"ok": False, "detail": "refresh_in_progress", "status": 409}
                 try:
-                    cur.execute(
+                    await cur.execute(
                         """
                         SELECT 1
                         FROM pg_matviews
                         WHERE schemaname = 'public' AND matviewname = 'mv_accounts_summary';
                         """
                     )
-                    if cur.fetchone() is None:
+                    if await cur.fetchone() is None:
                         return {
                             "ok": False,
                             "detail": "mv_accounts_summary not found",
                             "status": 404,
                         }
-                    cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_accounts_summary;")
+                    await cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_accounts_summary;")
+                    data_version.bump()
                     return {"ok": True, "detail": "refreshed", "status": 200}
                 finally:
-                    cur.execute("SELECT pg_advisory_unlock(%s);", (ACCOUNTS_MV_REFRESH_LOCK_KEY,))
+                    await cur.execute("SELECT pg_advisory_unlock(%s);", (ACCOUNTS_MV_REFRESH_LOCK_KEY,))
         finally:
-            conn.autocommit = old_autocommit
+            await conn.set_autocommit(old_autocommit)
+
+
+async def _prune_change_log() -> int:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT prune_change_log(%s * interval '1 hour');", (CHANGE_LOG_RETENTION_HOURS,)
+            )
+            return (await cur.fetchone())[0]
 
 
-def _refresh_loop(stop_event: threading.Event, interval_seconds: int) -> None:
-    if interval_seconds <= 0:
-        return
-    while not stop_event.wait(interval_seconds):
+async def _refresh_loop(interval_seconds: int) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
         try:
-            _refresh_accounts_summary()
+            await _refresh_accounts_summary()
         except Exception:
             logger.exception("accounts_summary_refresh_failed")
 
 
-@app.middleware("http")
-async def request_logging(request: Request, call_next):
-    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
-    request.state.request_id = request_id
-    start = time.monotonic()
-    response = await call_next(request)
+async def _prune_loop(interval_seconds: int) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            pruned = await _prune_change_log()
+            if pruned:
+                logger.info("change_log pruned rows=%s", pruned)
+        except Exception:
+            logger.exception("change_log_prune_failed")
+
+
+def _observe_request(request: Request, status: int, start: float, stats: instrumentation.RequestStats) -> None:
+    route = request.scope.get("route")
+    metrics.observe_request(
+        request.method,
+        getattr(route, "path", "unmatched"),
+        status,
+        time.monotonic() - start,
+        stats.queries,
+        stats.sql_ms / 1000,
+    )
+
+
+def _finish_request(request: Request, status: int, start: float, stats: instrumentation.RequestStats) -> float:
+    """Record metrics, the access log line and the query budget check; returns the duration in ms."""
+    _observe_request(request, status, start, stats)
     duration_ms = (time.monotonic() - start) * 1000
-    response.headers["x-request-id"] = request_id
     logger.info(
-        "request method=%s path=%s status=%s duration_ms=%.2f request_id=%s",
+        "request method=%s path=%s status=%s duration_ms=%.2f queries=%s db_ms=%.2f pool_wait_ms=%.2f "
+        "render_ms=%.2f request_id=%s",
         request.method,
         request.url.path,
-        response.status_code,
+        status,
         duration_ms,
-        request_id,
+        stats.queries,
+        stats.sql_ms,
+        stats.pool_wait_ms,
+        stats.render_ms,
+        stats.request_id,
     )
+    budget = instrumentation.REQUEST_QUERY_BUDGET
+    if budget and stats.queries > budget:
+        logger.warning(
+            "query budget exceeded method=%s path=%s queries=%s budget=%s request_id=%s",
+            request.method,
+            request.url.path,
+            stats.queries,
+            budget,
+            stats.request_id,
+        )
+    return duration_ms
+
+
+async def _finish_after_body(body, request: Request, status: int, start: float, stats: instrumentation.RequestStats):
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        _finish_request(request, status, start, stats)
+
+
+@app.middleware("http")
+async def request_logging(request: Request, call_next):
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    request.state.request_id = request_id
+    stats, token = instrumentation.begin(request_id, request.url.path)
+    start = time.monotonic()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        _observe_request(request, 500, start, stats)
+        raise
+    finally:
+        instrumentation.end(token)
+    response.headers["x-request-id"] = request_id
+    streamed = "content-length" not in response.headers and response.status_code not in (204, 304)
+    if streamed:
+        # call_next returns once the headers are out; a StreamingResponse (the
+        # NDJSON snapshot) runs its queries while the body is sent. Its stats are
+        # recorded when the body is done, and it gets no Server-Timing header.
+        response.body_iterator = _finish_after_body(response.body_iterator, request, response.status_code, start, stats)
+        return response
+    duration_ms = _finish_request(request, response.status_code, start, stats)
+    response.headers["Server-Timing"] = stats.server_timing(duration_ms)
     return response
 
 
@@ -123,7 +224,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     request_id = getattr(request.state, "request_id", None)
     payload = _error_payload("http_error", exc.detail, request_id)
     payload["detail"] = exc.detail
-    response = JSONResponse(status_code=exc.status_code, content=payload)
+    response = JSONResponse(status_code=exc.status_code, content=payload, headers=exc.headers)
     if request_id:
         response.headers["x-request-id"] = request_id
     return response
@@ -140,6 +241,28 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     return response
 
 
+async def pool_exhausted_handler(request: Request, exc: Exception):
+    # the wait queue is full (TooManyRequests) or the checkout timed out: shed the request
+    request_id = getattr(request.state, "request_id", None)
+    logger.warning(
+        "db pool exhausted method=%s path=%s error=%s request_id=%s",
+        request.method,
+        request.url.path,
+        type(exc).__name__,
+        request_id,
+    )
+    payload = _error_payload("db_busy", "database busy, retry later", request_id)
+    response = JSONResponse(status_code=503, content=payload)
+    response.headers["Retry-After"] = str(DB_POOL_RETRY_AFTER_SEC)
+    if request_id:
+        response.headers["x-request-id"] = request_id
+    return response
+
+
+app.add_exception_handler(TooManyRequests, pool_exhausted_handler)
+app.add_exception_handler(PoolTimeout, pool_exhausted_handler)
+
+
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
     request_id = getattr(request.state, "request_id", None)
@@ -156,64 +279,74 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
     return response
 
 @app.get("/warmup")
-def warmup(x_warmup_key: str | None = Header(default=None)):
+async def warmup(x_warmup_key: str | None = Header(default=None)):
     # basit koruma
     if WARMUP_KEY and x_warmup_key != WARMUP_KEY:
         raise HTTPException(status_code=401, detail="unauthorized")
 
     # Render + Neon uyansın diye DB ping
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT 1;")
-            one = cur.fetchone()[0]
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT 1;")
+            one = (await cur.fetchone())[0]
 
     return {"ok": True, "db_select_1": one}
 
 @app.post("/admin/refresh-accounts-summary")
-def refresh_accounts_summary(x_refresh_key: str | None = Header(default=None)):
+async def refresh_accounts_summary(x_refresh_key: str | None = Header(default=None)):
     if WARMUP_KEY and x_refresh_key != WARMUP_KEY:
         raise HTTPException(status_code=401, detail="unauthorized")
-    result = _refresh_accounts_summary()
+    result = await _refresh_accounts_summary()
     if not result.get("ok"):
         status = result.get("status", 500)
         raise HTTPException(status_code=status, detail=result.get("detail"))
     return {"ok": True, "detail": result.get("detail")}
 
 @app.on_event("startup")
-def startup():
-    pool.open()
+async def startup():
+    await pool.open()
+    dexscreener.open_client()
     refresh_interval = _parse_refresh_interval()
     if refresh_interval > 0:
-        stop_event = threading.Event()
-        refresh_thread = threading.Thread(
-            target=_refresh_loop,
-            args=(stop_event, refresh_interval),
-            daemon=True,
-        )
-        app.state.refresh_stop = stop_event
-        app.state.refresh_thread = refresh_thread
-        refresh_thread.start()
+        app.state.refresh_task = asyncio.create_task(_refresh_loop(refresh_interval))
+    if CHANGE_LOG_RETENTION_HOURS > 0:
+        app.state.prune_task = asyncio.create_task(_prune_loop(CHANGE_LOG_PRUNE_SECONDS))
+
+@app.on_event("startup")
+async def start_dexscreener():
+    await dexscreener.start_background()
+    market.start()
+    tip_tracker.start()
+
+@app.on_event("shutdown")
+async def stop_dexscreener():
+    # before the pool closes: queued token_meta_cache writes are flushed here
+    await market.stop()
+    await tip_tracker.stop()
+    await dexscreener.stop_background()
+    await dexscreener.close_client()
+    await slow_queries.close()
 
 @app.on_event("shutdown")
-def shutdown():
-    stop_event = getattr(app.state, "refresh_stop", None)
-    refresh_thread = getattr(app.state, "refresh_thread", None)
-    if stop_event:
-        stop_event.set()
-    if refresh_thread:
-        refresh_thread.join(timeout=5)
-    pool.close()
+async def shutdown():
+    # wait for a refresh or prune that is mid-statement before the pool closes
+    tasks = [getattr(app.state, name, None) for name in ("refresh_task", "prune_task")]
+    tasks = [task for task in tasks if task]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await pool.close()
 
 @app.get("/health")
-def health():
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT 1;")
-            one = cur.fetchone()[0]
+async def health():
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT 1;")
+            one = (await cur.fetchone())[0]
             row = None
             try:
-                cur.execute("SELECT id, active_ca, active_chain, updated_ts FROM context WHERE id = 1;")
-                row = cur.fetchone()
+                await cur.execute("SELECT id, active_ca, active_chain, updated_ts FROM context WHERE id = 1;")
+                row = await cur.fetchone()
             except Exception:
                 row = None
 
@@ -232,6 +365,19 @@ def health():
         ),
     }
 
+@app.get("/db/pool_stats", dependencies=[Depends(require_admin)])
+async def db_pool_stats():
+    return pool_stats()
+
+@app.get("/admin/slow_queries", dependencies=[Depends(require_admin)])
+async def list_slow_queries(limit: int = Query(default=50, ge=1, le=1000)):
+    return {"stats": slow_queries.stats(), "items": slow_queries.entries(limit)}
+
+@app.delete("/admin/slow_queries", dependencies=[Depends(require_admin)])
+async def clear_slow_queries():
+    slow_queries.clear()
+    return {"ok": True}
+
 app.include_router(coins_router)
 app.include_router(trades_router)
 app.include_router(tips_router)
@@ -242,3 +388,4 @@ app.include_router(dexscreener_router)
 app.include_router(wizard_router)
 app.include_router(context_router)
 app.include_router(auth_router)
+app.include_router(metrics_router)
@@ -0,0 +1,155 @@
+"""Background market-cap poller for coins with open trades.
+
+Every MARKET_POLL_SEC the set of (chain, ca) with open trades is read from the
+DB and their current market caps are fetched from Dexscreener, 30 addresses
+per tokens/v1 call. Results live in an in-memory table; request handlers only
+ever read that table (`quote()` / `unrealized()`), never the network.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from time import monotonic
+from typing import Any, NamedTuple
+
+from .routers import dexscreener as dex
+
+logger = logging.getLogger("app")
+
+MARKET_POLL_SEC = float(os.getenv("MARKET_POLL_SEC", "30"))  # 0 disables the poller
+# quotes older than this are treated as missing rather than shown as "live"
+MARKET_MAX_AGE_SEC = float(os.getenv("MARKET_MAX_AGE_SEC", "180"))
+
+
+class Quote(NamedTuple):
+    mcap_usd: float
+    price_usd: float | None
+    fetched_at: datetime
+    fetched_mono: float
+
+
+_quotes: dict[tuple[str, str], Quote] = {}
+_task: asyncio.Task | None = None
+_stats = {"polls": 0, "poll_failures": 0, "calls": 0, "quoted": 0, "last_poll_ms": 0.0}
+
+
+def _float(value: Any) -> float | None:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 else None
+
+
+def quote_from_pairs(ca_l: str, pairs: list[dict[str, Any]]) -> tuple[float, float | None] | None:
+    """(mcap, price) from the most liquid pair that has `ca_l` as base token."""
+    best = None
+    best_liquidity = -1.0
+    for p in pairs:
+        base = p.get("baseToken") or {}
+        if str(base.get("address", "")).lower() != ca_l:
+            continue
+        mcap = _float(p.get("marketCap")) or _float(p.get("fdv"))
+        if mcap is None:
+            continue
+        liquidity = _float((p.get("liquidity") or {}).get("usd")) or 0.0
+        if liquidity > best_liquidity:
+            best, best_liquidity = (mcap, _float(p.get("priceUsd"))), liquidity
+    return best
+
+
+def quote(chain: str | None, ca: str) -> Quote | None:
+    item = _quotes.get((chain or "", ca))
+    if item is None or monotonic() - item.fetched_mono > MARKET_MAX_AGE_SEC:
+        return None
+    return item
+
+
+def unrealized(chain: str | None, ca: str, entry_mcap_usd: float, size_usd: float | None) -> dict[str, Any]:
+    """Live fields for an open trade; empty without a recent quote."""
+    item = quote(chain, ca)
+    if item is None or not entry_mcap_usd:
+        return {}
+    pct = (item.mcap_usd - entry_mcap_usd) / entry_mcap_usd * 100
+    return {
+        "current_mcap_usd": item.mcap_usd,
+        "current_mcap_ts": item.fetched_at,
+        "unrealized_pnl_pct": pct,
+        "unrealized_pnl_usd": pct / 100 * size_usd if size_usd and size_usd > 0 else None,
+    }
+
+
+async def _open_positions(cur) -> list[tuple[str, str]]:
+    await cur.execute("SELECT DISTINCT chain, ca FROM trades WHERE exit_ts IS NULL;")
+    return await cur.fetchall()
+
+
+async def fetch_quotes(positions: list[tuple[str, str]]) -> dict[tuple[str, str], tuple[float, float | None]]:
+    """{(chain, ca): (mcap, price)} for `positions`, 30 addresses per tokens/v1 call."""
+    by_chain: dict[str, list[str]] = {}
+    for chain, ca in dict.fromkeys(positions):
+        by_chain.setdefault(chain, []).append(ca)
+    jobs = [
+        (chain, cas[i:i + dex.TOKENS_BATCH_SIZE])
+        for chain, cas in by_chain.items()
+        for i in range(0, len(cas), dex.TOKENS_BATCH_SIZE)
+    ]
+    client = dex.get_client()
+    results = await asyncio.gather(*(dex.check_tokens(client, chain, chunk) for chain, chunk in jobs))
+    _stats["calls"] += len(jobs)
+
+    quotes = {}
+    for (chain, chunk), res in zip(jobs, results):
+        grouped = dex.pairs_by_token(res.get("pairs") or [], chunk)
+        for ca in chunk:
+            found = quote_from_pairs(ca, grouped.get(ca, []))
+            if found is not None:
+                quotes[(chain, ca)] = found
+    return quotes
+
+
+async def poll_once() -> int:
+    """Refresh quotes for every open (chain, ca); returns how many were quoted."""
+    positions = await dex.run_db(_open_positions)
+    fetched = await fetch_quotes(positions)
+    now_wall = datetime.now(timezone.utc)
+    now = monotonic()
+    for key, (mcap, price) in fetched.items():
+        _quotes[key] = Quote(mcap, price, now_wall, now)
+
+    # closed positions drop out of the table
+    open_keys = set(positions)
+    for key in [k for k in _quotes if k not in open_keys]:
+        del _quotes[key]
+    return len(fetched)
+
+
+async def _poll_loop() -> None:
+    while True:
+        started = monotonic()
+        try:
+            _stats["quoted"] = await poll_once()
+        except Exception:
+            _stats["poll_failures"] += 1
+            logger.warning("market poll failed", exc_info=True)
+        _stats["polls"] += 1
+        _stats["last_poll_ms"] = round((monotonic() - started) * 1000, 2)
+        await asyncio.sleep(MARKET_POLL_SEC)
+
+
+def start() -> None:
+    global _task
+    if MARKET_POLL_SEC > 0 and _task is None:
+        _task = asyncio.create_task(_poll_loop())
+
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
+
+
+def stats() -> dict[str, Any]:
+    return {**_stats, "quotes": len(_quotes), "poll_sec": MARKET_POLL_SEC, "max_age_sec": MARKET_MAX_AGE_SEC}
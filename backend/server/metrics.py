@@ -0,0 +1,179 @@
+"""In-process metric primitives.
+
+Everything here is updated from the event loop only, so there are no locks;
+values are plain counters read by the stats endpoints and rendered for
+Prometheus by `Exposition` (GET /metrics).
+"""
+
+from bisect import bisect_left
+from typing import Any
+
+# Upper bounds in milliseconds; anything slower lands in the implicit +Inf bucket.
+DEFAULT_MS_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    """Fixed-bucket histogram; `snapshot()` reports cumulative counts (value <= bound)."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_MS_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """[(upper bound, observations <= bound)], ending with (inf, count)."""
+        out = []
+        running = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self._counts):
+            running += n
+            out.append((bound, running))
+        return out
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "buckets": {("+Inf" if bound == float("inf") else f"{bound:g}"): n for bound, n in self.cumulative()},
+            "count": self.count,
+            "sum": round(self.sum, 3),
+        }
+
+
+# Upper bounds in seconds for request/upstream/refresh durations.
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Exposition:
+    """Builder for the Prometheus text exposition format (0.0.4)."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._lines: list[str] = []
+
+    def _header(self, name: str, kind: str, help_text: str) -> None:
+        help_text = help_text.replace("\\", "\\\\").replace("\n", "\\n")
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def add(self, name: str, kind: str, help_text: str, samples) -> None:
+        """`samples`: iterable of (labels dict, value)."""
+        self._header(name, kind, help_text)
+        for labels, value in samples:
+            self._lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def histogram(self, name: str, help_text: str, series, scale: float = 1.0) -> None:
+        """`series`: iterable of (labels dict, Histogram); `scale` converts units (ms -> s)."""
+        self._header(name, "histogram", help_text)
+        for labels, hist in series:
+            for bound, n in hist.cumulative():
+                le = "+Inf" if bound == float("inf") else f"{bound * scale:g}"
+                self._lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {n}")
+            self._lines.append(f"{name}_sum{_labels(labels)} {_number(hist.sum * scale)}")
+            self._lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+
+    def text(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+
+# Request metrics are keyed by route template, not raw path, so the label
+# set stays bounded no matter which ids are requested.
+_requests: dict[tuple[str, str, str], int] = {}
+_request_seconds: dict[tuple[str, str], Histogram] = {}
+_db_queries: dict[tuple[str, str], int] = {}
+_db_seconds: dict[tuple[str, str], float] = {}
+_refreshes: dict[tuple[str, str], int] = {}
+_refresh_seconds: dict[str, Histogram] = {}
+_refresh_last_success: dict[str, float] = {}
+
+
+def observe_request(method: str, route: str, status: int, seconds: float, queries: int, sql_seconds: float) -> None:
+    key = (method, route)
+    status_key = (method, route, str(status))
+    _requests[status_key] = _requests.get(status_key, 0) + 1
+    hist = _request_seconds.get(key)
+    if hist is None:
+        hist = _request_seconds[key] = Histogram(SECONDS_BUCKETS)
+    hist.observe(seconds)
+    _db_queries[key] = _db_queries.get(key, 0) + queries
+    _db_seconds[key] = _db_seconds.get(key, 0.0) + sql_seconds
+
+
+def observe_refresh(view: str, outcome: str, seconds: float, finished_at: float) -> None:
+    """One materialized view refresh; `finished_at` is a unix timestamp."""
+    key = (view, outcome)
+    _refreshes[key] = _refreshes.get(key, 0) + 1
+    hist = _refresh_seconds.get(view)
+    if hist is None:
+        hist = _refresh_seconds[view] = Histogram(SECONDS_BUCKETS)
+    hist.observe(seconds)
+    if outcome == "ok":
+        _refresh_last_success[view] = finished_at
+
+
+def write_request_metrics(out: Exposition) -> None:
+    out.add(
+        "http_requests_total",
+        "counter",
+        "HTTP requests by method, route template and status code.",
+        [({"method": m, "route": r, "status": s}, n) for (m, r, s), n in sorted(_requests.items())],
+    )
+    out.histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by method and route template.",
+        [({"method": m, "route": r}, h) for (m, r), h in sorted(_request_seconds.items())],
+    )
+    out.add(
+        "http_request_db_queries_total",
+        "counter",
+        "SQL statements issued while serving requests.",
+        [({"method": m, "route": r}, n) for (m, r), n in sorted(_db_queries.items())],
+    )
+    out.add(
+        "http_request_db_seconds_total",
+        "counter",
+        "Time spent executing SQL while serving requests.",
+        [({"method": m, "route": r}, s) for (m, r), s in sorted(_db_seconds.items())],
+    )
+
+
+def write_refresh_metrics(out: Exposition) -> None:
+    out.add(
+        "matview_refreshes_total",
+        "counter",
+        "Materialized view refreshes by outcome (ok, locked, missing, error).",
+        [({"view": v, "outcome": o}, n) for (v, o), n in sorted(_refreshes.items())],
+    )
+    out.histogram(
+        "matview_refresh_duration_seconds",
+        "Materialized view refresh duration.",
+        [({"view": v}, h) for v, h in sorted(_refresh_seconds.items())],
+    )
+    out.add(
+        "matview_refresh_last_success_timestamp_seconds",
+        "gauge",
+        "Unix time of the last successful refresh.",
+        [({"view": v}, ts) for v, ts in sorted(_refresh_last_success.items())],
+    )
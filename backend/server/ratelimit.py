@@ -0,0 +1,138 @@
+"""Outbound throttling for upstream APIs: a token bucket per host and a
+circuit breaker per endpoint.
+
+Both are meant for a single asyncio event loop and never await while updating
+their state, so they need no lock.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import monotonic
+
+
+class TokenBucket:
+    """`rate` requests/second with bursts of up to `burst`.
+
+    Callers reserve a slot synchronously (the bucket may go into debt) and then
+    sleep until it comes up, so waiters are served in arrival order.
+    `block_for()` pauses everyone, e.g. for a Retry-After.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(rate, 0.001)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = monotonic()
+        self._blocked_until = 0.0
+        self.acquired = 0
+        self.queued = 0
+        self.queued_sec = 0.0
+        self.max_queued_sec = 0.0
+        self.blocks = 0
+
+    def _reserve(self, now: float) -> float:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        debt = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        return max(debt, self._blocked_until - now, 0.0)
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns the seconds spent queued."""
+        start = monotonic()
+        delay = self._reserve(start)
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._blocked_until - monotonic()
+        waited = monotonic() - start
+        self.acquired += 1
+        if waited > 0.001:
+            self.queued += 1
+            self.queued_sec += waited
+            self.max_queued_sec = max(self.max_queued_sec, waited)
+        return waited
+
+    def block_for(self, seconds: float) -> None:
+        until = monotonic() + seconds
+        if until > self._blocked_until:
+            self._blocked_until = until
+            self.blocks += 1
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "acquired": self.acquired,
+            "queued": self.queued,
+            "queued_sec": round(self.queued_sec, 3),
+            "max_queued_sec": round(self.max_queued_sec, 3),
+            "blocks": self.blocks,
+            "blocked_for_sec": round(max(self._blocked_until - monotonic(), 0.0), 3),
+        }
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and fails fast for
+    `reset_after` seconds; then lets a single probe through (half-open), whose
+    outcome closes or re-opens it."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and monotonic() - self._opened_at >= self.reset_after:
+            self.state = self.HALF_OPEN
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+            self.state = self.OPEN
+            self._opened_at = monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Parse a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from ..cache import data_version
 from ..db import pool
 from ..schemas.coins import CoinCreate, CoinOut
 from ..auth import require_admin
@@ -7,12 +8,12 @@ router = APIRouter(prefix="/coins", tags=["coins"])
 
 
 @router.post("", response_model=CoinOut, dependencies=[Depends(require_admin)])
-def add_coin(payload: CoinCreate):
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+async def add_coin(payload: CoinCreate):
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             ca = payload.ca.lower()
             try:
-                cur.execute(
+                await cur.execute(
                     """
                     INSERT INTO coins (ca, name, symbol, chain, launch_ts, source_type)
                     VALUES (%s, %s, %s, %s, %s, %s)
@@ -27,10 +28,11 @@ def add_coin(payload: CoinCreate):
                         payload.source_type,
                     ),
                 )
-                row = cur.fetchone()
-                conn.commit()
+                row = await cur.fetchone()
+                await conn.commit()
+                data_version.bump()
             except Exception as e:
-                conn.rollback()
+                await conn.rollback()
                 if "coins_ca_key" in str(e) or "coins_pkey" in str(e) or "uq_coins_chain_ca" in str(e):
                     raise HTTPException(status_code=409, detail="Coin already exists")
                 raise
@@ -47,12 +49,12 @@ def add_coin(payload: CoinCreate):
 
 
 @router.get("/summary")
-def coins_summary(chain: str | None = None):
+async def coins_summary(chain: str | None = None):
     """One-row-per-coin summary for the UI (counts + latest activity)."""
     if chain:
         chain = chain.lower()
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             sql = """
                 SELECT
                   c.ca, c.name, c.symbol, c.launch_ts, c.chain, c.source_type, c.created_ts,
@@ -85,8 +87,8 @@ def coins_summary(chain: str | None = None):
                 sql += " WHERE c.chain = %s"
                 params.append(chain)
             sql += " ORDER BY last_activity_ts DESC NULLS LAST, c.created_ts DESC;"
-            cur.execute(sql, tuple(params))
-            rows = cur.fetchall()
+            await cur.execute(sql, tuple(params))
+            rows = await cur.fetchall()
 
     return [
         {
@@ -108,14 +110,14 @@ def coins_summary(chain: str | None = None):
 
 @router.get("/{ca}", response_model=CoinOut)
 @router.get("/{ca}/detail", response_model=CoinOut) # ADDED THIS LINE
-def get_coin(ca: str, chain: str | None = None):
+async def get_coin(ca: str, chain: str | None = None):
     ca = ca.lower()
     if chain:
         chain = chain.lower()
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             if chain:
-                cur.execute(
+                await cur.execute(
                     """
                     SELECT ca, name, symbol, chain, launch_ts, source_type, created_ts
                     FROM coins
@@ -123,11 +125,11 @@ def get_coin(ca: str, chain: str | None = None):
                     """,
                     (ca, chain),
                 )
-                row = cur.fetchone()
+                row = await cur.fetchone()
                 if row is None:
                     raise HTTPException(status_code=404, detail="Coin not found")
             else:
-                cur.execute(
+                await cur.execute(
                     """
                     SELECT ca, name, symbol, chain, launch_ts, source_type, created_ts
                     FROM coins
@@ -136,7 +138,7 @@ def get_coin(ca: str, chain: str | None = None):
                     """,
                     (ca,),
                 )
-                rows = cur.fetchall()
+                rows = await cur.fetchall()
                 if not rows:
                     raise HTTPException(status_code=404, detail="Coin not found")
                 if len(rows) > 1:
@@ -155,7 +157,7 @@ def get_coin(ca: str, chain: str | None = None):
 
 
 @router.get("", response_model=list[CoinOut])
-def list_coins(
+async def list_coins(
     limit: int = Query(default=200, ge=1, le=2000),
     ca: str | None = Query(default=None, min_length=3),
     chain: str | None = Query(default=None, min_length=2),
@@ -164,8 +166,8 @@ def list_coins(
         ca = ca.lower()
     if chain:
         chain = chain.lower()
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             if ca:
                 sql = """
                     SELECT ca, name, symbol, chain, launch_ts, source_type, created_ts
@@ -177,7 +179,7 @@ def list_coins(
                     sql += " AND chain = %s"
                     params.append(chain)
                 sql += ";"
-                cur.execute(sql, tuple(params))
+                await cur.execute(sql, tuple(params))
             else:
                 sql = """
                     SELECT ca, name, symbol, chain, launch_ts, source_type, created_ts
@@ -189,8 +191,8 @@ def list_coins(
                     params.append(chain)
                 sql += " ORDER BY created_ts DESC LIMIT %s;"
                 params.append(limit)
-                cur.execute(sql, tuple(params))
-            rows = cur.fetchall()
+                await cur.execute(sql, tuple(params))
+            rows = await cur.fetchall()
 
     return [
         {
@@ -207,21 +209,21 @@ def list_coins(
 
 
 @router.delete("/{ca}", dependencies=[Depends(require_admin)])
-def delete_coin(ca: str, chain: str | None = None):
+async def delete_coin(ca: str, chain: str | None = None):
     """Delete a coin and related data (FK cascades handle trades/tips and bubbles/scoring)."""
     ca = ca.lower()
     if chain:
         chain = chain.lower()
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             # Check if coin exists
             if chain:
-                cur.execute("SELECT 1 FROM coins WHERE ca = %s AND chain = %s;", (ca, chain))
-                if cur.fetchone() is None:
+                await cur.execute("SELECT 1 FROM coins WHERE ca = %s AND chain = %s;", (ca, chain))
+                if await cur.fetchone() is None:
                     raise HTTPException(status_code=404, detail="Coin not found")
             else:
-                cur.execute("SELECT chain FROM coins WHERE ca = %s LIMIT 2;", (ca,))
-                rows = cur.fetchall()
+                await cur.execute("SELECT chain FROM coins WHERE ca = %s LIMIT 2;", (ca,))
+                rows = await cur.fetchall()
                 if not rows:
                     raise HTTPException(status_code=404, detail="Coin not found")
                 if len(rows) > 1:
@@ -229,15 +231,17 @@ def delete_coin(ca: str, chain: str | None = None):
                 chain = rows[0][0]
 
             # Delete account_coin_metrics for this coin (if present)
-            cur.execute(
+            await cur.execute(
                 "DELETE FROM account_coin_metrics WHERE ca = %s AND chain = %s;",
                 (ca, chain),
             )
 
             # Delete the coin; FK cascades clean related rows
-            cur.execute("DELETE FROM coins WHERE ca = %s AND chain = %s;", (ca, chain))
+            await cur.execute("DELETE FROM coins WHERE ca = %s AND chain = %s;", (ca, chain))
             
-            conn.commit()
+            await conn.commit()
+            
+            data_version.bump()
     
     return {
         "ok": True,
@@ -1,16 +1,36 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import datetime, timezone
+import importlib.util
+import logging
+import os
+from datetime import datetime, timedelta, timezone
 from time import monotonic
 from typing import Any
 
 import httpx
 from fastapi import APIRouter, HTTPException, Query
 
+from .. import token_meta_store
+from ..cache import TTLCache
+from ..chains import chain_candidates, known_chains
+from ..metrics import SECONDS_BUCKETS, Histogram
+from ..ratelimit import CircuitBreaker, TokenBucket, retry_after_seconds
+from ..schemas.dexscreener import TokenMetaBatchIn
+
 router = APIRouter(prefix="/dexscreener", tags=["dexscreener"])
+logger = logging.getLogger("app")
 
-DEX_BASE = "https://api.dexscreener.com"
+DEX_BASE = os.getenv("DEX_BASE", "https://api.dexscreener.com")
+DEX_TIMEOUT_SEC = 10
+DEX_CONNECT_TIMEOUT_SEC = 5
+DEX_MAX_CONNECTIONS = int(os.getenv("DEX_MAX_CONNECTIONS", "20"))
+DEX_MAX_KEEPALIVE = int(os.getenv("DEX_MAX_KEEPALIVE", "10"))
+DEX_KEEPALIVE_EXPIRY_SEC = 60
+# HTTP/2 multiplexes the per-chain fan-out over a single connection; it needs
+# the optional `h2` package and can be turned off with DEX_HTTP2=0.
+DEX_HTTP2 = os.getenv("DEX_HTTP2", "1") != "0" and importlib.util.find_spec("h2") is not None
+DEX_HEADERS = {"Accept": "application/json", "User-Agent": "memedesk/1.0"}
 
 SUPPORTED_CHAINS = [
     "solana",
@@ -24,53 +44,271 @@ SUPPORTED_CHAINS = [
     "optimism",
 ]
 
+TOKENS_BATCH_SIZE = 30  # addresses per tokens/v1 call (Dexscreener's limit)
+
 CACHE_TTL_SEC = 300
+# after the TTL an entry is still served for this long while it is refreshed in the background
+CACHE_STALE_SEC = int(os.getenv("DEX_CACHE_STALE_SEC", "3600"))
+# "not found on any chain" is remembered briefly so unknown CAs don't re-scan every chain
+CACHE_NEGATIVE_TTL_SEC = int(os.getenv("DEX_CACHE_NEGATIVE_TTL_SEC", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("DEX_CACHE_MAX_ENTRIES", "4096"))
+# second tier in Postgres (token_meta_cache): read on memory misses, written behind in batches
+CACHE_STORE = os.getenv("DEX_CACHE_STORE", "1") != "0"
+CACHE_FLUSH_SEC = float(os.getenv("DEX_CACHE_FLUSH_SEC", "5"))
+CACHE_PREWARM_LIMIT = int(os.getenv("DEX_CACHE_PREWARM", "500"))  # tracked coins loaded at startup; 0 = off
 MAX_RETRIES = 3
 RETRY_BACKOFF_SEC = 0.3
 RETRY_STATUS = {429, 500, 502, 503, 504}
+RETRY_AFTER_MAX_SEC = 30  # longer Retry-After values fail the call instead of holding it
+
+# Dexscreener allows 300 req/min on the pair/token endpoints
+DEX_RATE_PER_SEC = float(os.getenv("DEX_RATE_PER_SEC", "5"))
+DEX_RATE_BURST = int(os.getenv("DEX_RATE_BURST", "10"))
+BREAKER_FAILURES = int(os.getenv("DEX_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SEC = float(os.getenv("DEX_BREAKER_RESET_SEC", "30"))
+
+_cache = TTLCache(maxsize=CACHE_MAX_ENTRIES)
+_NOT_FOUND = object()
+_refreshing: set[str] = set()
+_background: set[asyncio.Task] = set()
+_inflight: dict[str, asyncio.Task] = {}
+_write_queue: dict[str, token_meta_store.StoredMeta] = {}
+_flusher: asyncio.Task | None = None
+_stats = {
+    "negative_hits": 0,
+    "refreshes": 0,
+    "refresh_failures": 0,
+    "coalesced": 0,
+    "store_hits": 0,
+    "store_writes": 0,
+    "store_write_failures": 0,
+}
+
+_client: httpx.AsyncClient | None = None
+_limiters: dict[str, TokenBucket] = {}
+_breakers: dict[str, CircuitBreaker] = {}
+# every upstream attempt, by (endpoint, HTTP status or "error")
+_upstream_calls: dict[tuple[str, str], int] = {}
+_upstream_seconds: dict[str, Histogram] = {}
+
+
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=DEX_BASE,
+        headers=DEX_HEADERS,
+        http2=DEX_HTTP2,
+        timeout=httpx.Timeout(DEX_TIMEOUT_SEC, connect=DEX_CONNECT_TIMEOUT_SEC),
+        limits=httpx.Limits(
+            max_connections=DEX_MAX_CONNECTIONS,
+            max_keepalive_connections=DEX_MAX_KEEPALIVE,
+            keepalive_expiry=DEX_KEEPALIVE_EXPIRY_SEC,
+        ),
+    )
+
+
+def open_client() -> None:
+    """Create the shared Dexscreener client (app startup)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _new_client()
+
 
-_cache: dict[str, tuple[float, dict[str, Any]]] = {}
-_cache_lock = asyncio.Lock()
+async def close_client() -> None:
+    """Close the shared client and its pooled connections (app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
 
 
-def _cache_get(key: str) -> dict[str, Any] | None:
-    item = _cache.get(key)
-    if not item:
+def get_client() -> httpx.AsyncClient:
+    """The shared client; opened on first use when running outside the app lifecycle."""
+    if _client is None or _client.is_closed:
+        open_client()
+    return _client
+
+
+async def _cache_get_async(key: str) -> dict[str, Any] | None:
+    """Fresh, positive cache entry for `key`, if any."""
+    hit = _cache.get(key, monotonic())
+    if hit is None:
         return None
-    expires_at, value = item
-    if expires_at <= monotonic():
-        _cache.pop(key, None)
+    value, state = hit
+    if state != TTLCache.FRESH or value is _NOT_FOUND:
         return None
     return value
 
 
-async def _cache_get_async(key: str) -> dict[str, Any] | None:
-    async with _cache_lock:
-        return _cache_get(key)
+async def _cache_set_async(key: str, value: dict[str, Any]) -> None:
+    _cache.set(key, value, monotonic(), CACHE_TTL_SEC, CACHE_STALE_SEC)
+    _queue_write(key, value, CACHE_TTL_SEC, CACHE_STALE_SEC)
 
 
-async def _cache_set_async(key: str, value: dict[str, Any]) -> None:
-    async with _cache_lock:
-        _cache[key] = (monotonic() + CACHE_TTL_SEC, value)
+def _cache_set_not_found(key: str) -> None:
+    _cache.set(key, _NOT_FOUND, monotonic(), CACHE_NEGATIVE_TTL_SEC)
+    _queue_write(key, None, CACHE_NEGATIVE_TTL_SEC, 0)
+
+
+def _queue_write(key: str, meta: dict[str, Any] | None, ttl: float, stale_ttl: float) -> None:
+    if CACHE_STORE:
+        fresh_until = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        _write_queue[key] = (key, meta, fresh_until, fresh_until + timedelta(seconds=stale_ttl))
+
+
+def _remember(rows: list[token_meta_store.StoredMeta]) -> None:
+    """Put persisted entries into the memory cache with their remaining lifetimes."""
+    now_wall = datetime.now(timezone.utc)
+    now = monotonic()
+    for ca_l, meta, fresh_until, stale_until in rows:
+        ttl = (fresh_until - now_wall).total_seconds()
+        stale_ttl = (stale_until - fresh_until).total_seconds()
+        _cache.set(ca_l, _NOT_FOUND if meta is None else meta, now, ttl, stale_ttl)
+
+
+async def run_db(work):
+    """Await `work(cur)` on a pooled connection."""
+    from ..db import pool  # imported lazily: the DB is optional for this router
+
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            return await work(cur)
+
+
+async def _load_from_store(cas: list[str]) -> int:
+    """Read-through: copy servable persisted entries for `cas` into memory."""
+    if not CACHE_STORE or not cas:
+        return 0
+    try:
+        rows = await run_db(lambda cur: token_meta_store.load(cur, cas))
+    except Exception:
+        return 0
+    _remember(rows)
+    _stats["store_hits"] += len(rows)
+    return len(rows)
+
+
+async def _flush_writes() -> None:
+    if not _write_queue:
+        return
+    rows = list(_write_queue.values())
+    _write_queue.clear()
+    try:
+        await run_db(lambda cur: token_meta_store.save(cur, rows))
+    except Exception:
+        _stats["store_write_failures"] += 1
+        logger.warning("token_meta_cache write failed rows=%s", len(rows), exc_info=True)
+        return
+    _stats["store_writes"] += len(rows)
+
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(CACHE_FLUSH_SEC)
+        await _flush_writes()
+
+
+async def _prewarm(limit: int) -> None:
+    """Load persisted metadata for tracked coins, then look up the ones without any."""
+    try:
+        stored, missing = await run_db(lambda cur: token_meta_store.load_tracked(cur, limit))
+    except Exception:
+        logger.warning("token_meta_cache prewarm failed", exc_info=True)
+        return
+    _remember(stored)
+    if missing:
+        await _fetch_meta_batch({ca_l: ca_l for ca_l in missing})
+    logger.info("token_meta_cache prewarmed stored=%s fetched=%s", len(stored), len(missing))
+
+
+async def start_background() -> None:
+    """Start the write-behind flusher and the optional prewarm (app startup)."""
+    global _flusher
+    if not CACHE_STORE or _flusher is not None:
+        return
+    _flusher = asyncio.create_task(_flush_loop())
+    if CACHE_PREWARM_LIMIT > 0:
+        _spawn(_prewarm(CACHE_PREWARM_LIMIT))
+
+
+async def stop_background() -> None:
+    """Stop the flusher and persist what is still queued (app shutdown)."""
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        _flusher = None
+    for task in list(_background):
+        task.cancel()
+    await _flush_writes()
 
 
 def _ms_to_dt_utc(ms: int) -> datetime:
     return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
 
-async def check_chain(client: httpx.AsyncClient, chain: str, ca_l: str) -> dict[str, Any]:
-    """Check a single chain for a token address."""
-    url = f"{DEX_BASE}/token-pairs/v1/{chain}/{ca_l}"
-    headers = {"Accept": "application/json", "User-Agent": "memedesk/1.0"}
+def _limiter(client: httpx.AsyncClient) -> TokenBucket:
+    host = client.base_url.host
+    bucket = _limiters.get(host)
+    if bucket is None:
+        bucket = _limiters[host] = TokenBucket(DEX_RATE_PER_SEC, DEX_RATE_BURST)
+    return bucket
+
+
+def _breaker(key: str) -> CircuitBreaker:
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = _breakers[key] = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET_SEC)
+    return breaker
+
+
+def _record_upstream(endpoint: str, outcome: str, seconds: float) -> None:
+    key = (endpoint, outcome)
+    _upstream_calls[key] = _upstream_calls.get(key, 0) + 1
+    hist = _upstream_seconds.get(endpoint)
+    if hist is None:
+        hist = _upstream_seconds[endpoint] = Histogram(SECONDS_BUCKETS)
+    hist.observe(seconds)
+
+
+async def _get_pairs(client: httpx.AsyncClient, chain: str, url: str) -> dict[str, Any]:
+    """GET a Dexscreener pair list with retries: {"status": "ok" | "not_found" | "error", ...}.
+
+    Every attempt waits for the host's token bucket; 429/503 Retry-After pauses
+    the whole bucket. Network errors and 5xx count against the circuit breaker
+    of this (endpoint, chain), which fails fast while open.
+    """
+    endpoint = url.split("/")[1]
+    breaker = _breaker(f"{endpoint}/{chain}")
+    if not breaker.allow():
+        return {"status": "error", "chain": chain, "error": "circuit_open"}
+    probe = breaker.state == CircuitBreaker.HALF_OPEN
+    try:
+        return await _fetch_pairs(client, breaker, endpoint, chain, url)
+    except BaseException:
+        # a half-open probe that never finished (cancelled, most likely) counts as
+        # a failure; left half-open, the breaker would reject every later call
+        if probe and breaker.state == CircuitBreaker.HALF_OPEN:
+            breaker.record_failure()
+        raise
+
+
+async def _fetch_pairs(
+    client: httpx.AsyncClient, breaker: CircuitBreaker, endpoint: str, chain: str, url: str
+) -> dict[str, Any]:
+    limiter = _limiter(client)
     last_error: str | None = None
     for attempt in range(MAX_RETRIES):
+        backoff = RETRY_BACKOFF_SEC * (2 ** attempt)
+        await limiter.acquire()
         resp = None
+        started = monotonic()
         try:
-            resp = await client.get(url, headers=headers)
+            resp = await client.get(url)
         except Exception:
             last_error = "request_failed"
             resp = None
+        _record_upstream(endpoint, str(resp.status_code) if resp is not None else "error", monotonic() - started)
 
         if resp is not None and resp.status_code == 200:
+            breaker.record_success()
             try:
                 data = resp.json()
             except Exception:
@@ -81,6 +319,11 @@ async def check_chain(client: httpx.AsyncClient, chain: str, ca_l: str) -> dict[
                     return {"status": "ok", "chain": chain, "pairs": valid_pairs}
             return {"status": "not_found", "chain": chain}
 
+        if resp is None or resp.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
         if resp is not None:
             if resp.status_code == 404:
                 return {"status": "not_found", "chain": chain}
@@ -91,52 +334,105 @@ async def check_chain(client: httpx.AsyncClient, chain: str, ca_l: str) -> dict[
                     "error": f"http_{resp.status_code}",
                 }
             last_error = f"http_{resp.status_code}"
+            retry_after = retry_after_seconds(resp.headers.get("Retry-After"))
+            if retry_after is not None:
+                if retry_after > RETRY_AFTER_MAX_SEC:
+                    limiter.block_for(RETRY_AFTER_MAX_SEC)
+                    break
+                limiter.block_for(retry_after)
+                backoff = 0  # the bucket itself now waits out Retry-After
 
-        if attempt < MAX_RETRIES - 1:
-            await asyncio.sleep(RETRY_BACKOFF_SEC * (2 ** attempt))
+        if breaker.state == CircuitBreaker.OPEN:
+            break
+        if attempt < MAX_RETRIES - 1 and backoff:
+            await asyncio.sleep(backoff)
     return {"status": "error", "chain": chain, "error": last_error or "unknown"}
 
 
-@router.get("/token_meta")
-async def token_meta(ca: str = Query(min_length=3)):
-    """
-    CA adresiyle tüm ağları PARALEL tarar,
-    Dexscreener'dan metadata döner.
-    """
-    ca_l = ca.lower()
-    cached = await _cache_get_async(ca_l)
-    if cached:
-        return cached
+async def check_chain(client: httpx.AsyncClient, chain: str, ca_l: str) -> dict[str, Any]:
+    """Check a single chain for a token address."""
+    return await _get_pairs(client, chain, f"/token-pairs/v1/{chain}/{ca_l}")
 
-    
-    # Tüm ağlara aynı anda istek atalım (Concurrency)
-    async with httpx.AsyncClient(timeout=10) as client:
-        tasks = [check_chain(client, chain, ca_l) for chain in SUPPORTED_CHAINS]
-        results = await asyncio.gather(*tasks)
 
-    # Sonuçlardan dolu olanı bulalım
-    found_chain = None
-    found_data = None
+async def check_tokens(client: httpx.AsyncClient, chain: str, cas: list[str]) -> dict[str, Any]:
+    """Pairs for up to TOKENS_BATCH_SIZE addresses on one chain in a single call."""
+    return await _get_pairs(client, chain, f"/tokens/v1/{chain}/{','.join(cas)}")
 
-    for res in results:
-        if res.get("status") == "ok":
-            found_chain = res.get("chain")
-            found_data = res.get("pairs")
-            break  # first match
-    if not found_data or not found_chain:
-        errors = [r for r in results if r.get("status") == "error"]
-        if errors:
-            raise HTTPException(
-                status_code=502,
-                detail={
-                    "message": "dexscreener_unavailable",
-                    "errors": errors,
-                },
-            )
-        raise HTTPException(
-            status_code=404,
-            detail="Token herhangi bir desteklenen agda bulunamadi.",
-        )
+
+def pairs_by_token(pairs: list[dict[str, Any]], cas: list[str]) -> dict[str, list[dict[str, Any]]]:
+    """Split a tokens/v1 response per requested address (as base or quote token)."""
+    wanted = set(cas)
+    grouped: dict[str, list[dict[str, Any]]] = {}
+    for p in pairs:
+        for side in ("baseToken", "quoteToken"):
+            token = p.get(side)
+            address = str(token.get("address", "")).lower() if isinstance(token, dict) else ""
+            if address in wanted:
+                grouped.setdefault(address, []).append(p)
+                break
+    return grouped
+
+
+async def _known_chains(cas: list[str]) -> dict[str, list[str]]:
+    """Chains these CAs are already stored under; empty when the DB is unavailable."""
+    try:
+        return await run_db(lambda cur: known_chains(cur, cas))
+    except Exception:
+        return {}
+
+
+async def _scan_chains(client: httpx.AsyncClient, chains: list[str], ca_l: str) -> list[dict[str, Any]]:
+    return list(await asyncio.gather(*(check_chain(client, chain, ca_l) for chain in chains)))
+
+
+def _raise_not_found():
+    raise HTTPException(
+        status_code=404,
+        detail="Token herhangi bir desteklenen agda bulunamadi.",
+    )
+
+
+async def _fetch_meta_shared(ca: str, ca_l: str) -> dict[str, Any]:
+    """_fetch_meta() with single-flight: concurrent callers for one CA share a lookup."""
+    task = _inflight.get(ca_l)
+    if task is None:
+        task = asyncio.create_task(_fetch_meta(ca, ca_l))
+        _inflight[ca_l] = task
+        task.add_done_callback(lambda _: _inflight.pop(ca_l, None))
+    else:
+        _stats["coalesced"] += 1
+    # shielded: a caller that disconnects must not cancel the lookup for the others
+    return await asyncio.shield(task)
+
+
+async def _refresh(ca: str, ca_l: str) -> None:
+    _stats["refreshes"] += 1
+    try:
+        await _fetch_meta_shared(ca, ca_l)
+    except HTTPException as exc:
+        if exc.status_code != 404:
+            _stats["refresh_failures"] += 1
+    except Exception:
+        _stats["refresh_failures"] += 1
+    finally:
+        _refreshing.discard(ca_l)
+
+
+def _schedule_refresh(ca: str, ca_l: str) -> None:
+    """Refresh a stale entry in the background; at most one refresh per CA at a time."""
+    if ca_l in _refreshing:
+        return
+    _refreshing.add(ca_l)
+    _spawn(_refresh(ca, ca_l))
+
+
+def _spawn(coro) -> None:
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+def _meta_from_pairs(ca_l: str, found_chain: str, found_data: list[dict[str, Any]]) -> dict[str, Any]:
     # En uygun çifti seçelim
     chosen = None
     for p in found_data:
@@ -160,12 +456,214 @@ async def token_meta(ca: str = Query(min_length=3)):
 
     launch_ts = _ms_to_dt_utc(min(created_list)).isoformat() if created_list else None
 
-    result = {
+    return {
         "name": name,
         "symbol": symbol,
         "launch_ts": launch_ts,
         "pairs_found": len(found_data),
         "chain": found_chain,
     }
+
+
+async def _fetch_meta(ca: str, ca_l: str) -> dict[str, Any]:
+    """Look the CA up on Dexscreener and cache the outcome (errors are not cached)."""
+    # Adres formatına uyan ağlar; DB'de kayıtlı ağ varsa önce o sorgulanır
+    candidates = chain_candidates(ca, SUPPORTED_CHAINS)
+    known = [chain for chain in (await _known_chains([ca_l])).get(ca_l, []) if chain in candidates]
+
+    # Aday ağlara aynı anda istek atalım (Concurrency)
+    client = get_client()
+    results = await _scan_chains(client, known, ca_l) if known else []
+    if not any(r.get("status") == "ok" for r in results):
+        rest = [chain for chain in candidates if chain not in known]
+        results += await _scan_chains(client, rest, ca_l)
+
+    # Sonuçlardan dolu olanı bulalım
+    found_chain = None
+    found_data = None
+
+    for res in results:
+        if res.get("status") == "ok":
+            found_chain = res.get("chain")
+            found_data = res.get("pairs")
+            break  # first match
+    if not found_data or not found_chain:
+        errors = [r for r in results if r.get("status") == "error"]
+        if errors:
+            raise HTTPException(
+                status_code=502,
+                detail={
+                    "message": "dexscreener_unavailable",
+                    "errors": errors,
+                },
+            )
+        _cache_set_not_found(ca_l)
+        _raise_not_found()
+    result = _meta_from_pairs(ca_l, found_chain, found_data)
     await _cache_set_async(ca_l, result)
-    return result
\ No newline at end of file
+    return result
+
+
+@router.get("/token_meta")
+async def token_meta(ca: str = Query(min_length=3)):
+    """
+    CA adresiyle tüm ağları PARALEL tarar,
+    Dexscreener'dan metadata döner.
+    """
+    ca_l = ca.lower()
+    hit = _cache.get(ca_l, monotonic())
+    if hit is None and await _load_from_store([ca_l]):
+        hit = _cache.get(ca_l, monotonic())
+    if hit is not None:
+        value, state = hit
+        if state == TTLCache.STALE:
+            _schedule_refresh(ca, ca_l)
+        if value is _NOT_FOUND:
+            _stats["negative_hits"] += 1
+            _raise_not_found()
+        return value
+    return await _fetch_meta_shared(ca, ca_l)
+
+
+async def _fetch_meta_batch(pending: dict[str, str]) -> tuple[dict[str, dict[str, Any]], list[str], list[dict[str, Any]]]:
+    """Batch version of _fetch_meta() for {ca_l: ca}: (metas, not_found, errors).
+
+    CAs are grouped per candidate chain and sent TOKENS_BATCH_SIZE at a time;
+    chains already stored in `coins` are asked first, the rest of the
+    candidates only for CAs still unresolved.
+    """
+    known = await _known_chains(list(pending))
+    candidates = {ca_l: chain_candidates(ca, SUPPORTED_CHAINS) for ca_l, ca in pending.items()}
+    first = {ca_l: [c for c in known.get(ca_l, []) if c in chains] for ca_l, chains in candidates.items()}
+    rest = {ca_l: [c for c in chains if c not in first[ca_l]] for ca_l, chains in candidates.items()}
+
+    client = get_client()
+    found: dict[str, tuple[str, list[dict[str, Any]]]] = {}
+    failed: set[str] = set()
+    errors: list[dict[str, Any]] = []
+    for round_chains in (first, rest):
+        by_chain: dict[str, list[str]] = {}
+        for ca_l, chains in round_chains.items():
+            if ca_l not in found:
+                for chain in chains:
+                    by_chain.setdefault(chain, []).append(ca_l)
+        jobs = [
+            (chain, cas[i:i + TOKENS_BATCH_SIZE])
+            for chain, cas in by_chain.items()
+            for i in range(0, len(cas), TOKENS_BATCH_SIZE)
+        ]
+        if not jobs:
+            continue
+        results = await asyncio.gather(*(check_tokens(client, chain, chunk) for chain, chunk in jobs))
+        for (chain, chunk), res in zip(jobs, results):
+            if res.get("status") == "error":
+                failed.update(chunk)
+                errors.append({**res, "cas": chunk})
+                continue
+            grouped = pairs_by_token(res.get("pairs") or [], chunk)
+            for ca_l in chunk:
+                if ca_l not in found and grouped.get(ca_l):
+                    found[ca_l] = (chain, grouped[ca_l])
+
+    metas = {}
+    for ca_l, (chain, pairs) in found.items():
+        metas[ca_l] = _meta_from_pairs(ca_l, chain, pairs)
+        await _cache_set_async(ca_l, metas[ca_l])
+    not_found = [ca_l for ca_l in pending if ca_l not in found and ca_l not in failed]
+    for ca_l in not_found:
+        _cache_set_not_found(ca_l)
+    return metas, not_found, errors
+
+
+@router.post("/token_meta/batch")
+async def token_meta_batch(payload: TokenMetaBatchIn):
+    """token_meta for many CAs with ~1 upstream call per (chain, 30 CAs)."""
+    results: dict[str, dict[str, Any]] = {}
+    not_found: list[str] = []
+    pending: dict[str, str] = {}
+    shared: dict[str, asyncio.Task] = {}
+
+    def take(ca: str, ca_l: str, hit: tuple[Any, str]) -> None:
+        value, state = hit
+        if state == TTLCache.STALE:
+            _schedule_refresh(ca, ca_l)
+        if value is _NOT_FOUND:
+            _stats["negative_hits"] += 1
+            not_found.append(ca_l)
+        else:
+            results[ca_l] = value
+
+    now = monotonic()
+    for ca in payload.cas:
+        ca = ca.strip()
+        ca_l = ca.lower()
+        if len(ca_l) < 3 or ca_l in results or ca_l in pending or ca_l in shared or ca_l in not_found:
+            continue
+        hit = _cache.get(ca_l, now)
+        if hit is not None:
+            take(ca, ca_l, hit)
+        elif ca_l in _inflight:
+            _stats["coalesced"] += 1
+            shared[ca_l] = _inflight[ca_l]
+        else:
+            pending[ca_l] = ca
+
+    if pending and await _load_from_store(list(pending)):
+        now = monotonic()
+        for ca_l, ca in list(pending.items()):
+            hit = _cache.get(ca_l, now)
+            if hit is not None:
+                del pending[ca_l]
+                take(ca, ca_l, hit)
+
+    errors: list[dict[str, Any]] = []
+    if pending:
+        metas, missing, errors = await _fetch_meta_batch(pending)
+        results.update(metas)
+        not_found.extend(missing)
+    if shared:
+        outcomes = await asyncio.gather(*(asyncio.shield(t) for t in shared.values()), return_exceptions=True)
+        for ca_l, outcome in zip(shared, outcomes):
+            if isinstance(outcome, dict):
+                results[ca_l] = outcome
+            elif isinstance(outcome, HTTPException) and outcome.status_code == 404:
+                not_found.append(ca_l)
+            else:
+                errors.append({"status": "error", "error": "lookup_failed", "cas": [ca_l]})
+    return {"results": results, "not_found": not_found, "errors": errors}
+
+
+@router.get("/cache_stats")
+async def cache_stats():
+    return {
+        **_cache.stats(),
+        **_stats,
+        "refreshing": len(_refreshing),
+        "inflight": len(_inflight),
+        "write_queue": len(_write_queue),
+    }
+
+
+def metrics_snapshot() -> dict[str, Any]:
+    """Counters for /metrics. The histograms are live objects: read them on the event loop."""
+    return {
+        "upstream_calls": dict(_upstream_calls),
+        "upstream_seconds": dict(_upstream_seconds),
+        "cache": _cache.stats(),
+        "counters": dict(_stats),
+        "limiters": {host: bucket.stats() for host, bucket in _limiters.items()},
+        "breakers": {key: breaker.stats() for key, breaker in _breakers.items()},
+    }
+
+
+@router.get("/upstream_stats")
+async def upstream_stats():
+    from .. import market, tip_tracker  # both import this module
+
+    return {
+        "market": market.stats(),
+        "tip_tracker": tip_tracker.stats(),
+        "limiters": {host: bucket.stats() for host, bucket in _limiters.items()},
+        "breakers": {key: breaker.stats() for key, breaker in _breakers.items()},
+        "calls": {f"{endpoint} {outcome}": n for (endpoint, outcome), n in sorted(_upstream_calls.items())},
+    }
@@ -0,0 +1,121 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from .. import market, metrics, slow_queries, tip_tracker
+from ..db import pool, pool_stats
+from . import dexscreener as dex
+from . import snapshot
+
+router = APIRouter(tags=["metrics"])
+
+# psycopg_pool get_stats() key -> (metric name, help)
+_POOL_GAUGES = {
+    "pool_min": ("min_size", "Configured minimum pool size."),
+    "pool_max": ("max_size", "Configured maximum pool size."),
+    "pool_size": ("size", "Connections currently managed by the pool."),
+    "pool_available": ("available", "Idle connections ready to be handed out."),
+    "requests_waiting": ("waiting", "Requests queued for a connection right now."),
+}
+_POOL_COUNTERS = {
+    "requests_num": ("requests", "Connection checkouts requested."),
+    "requests_queued": ("requests_queued", "Checkouts that had to wait for a connection."),
+    "requests_errors": ("requests_errors", "Checkouts that failed (timeout or queue full)."),
+    "connections_num": ("connections", "Connection attempts to the server."),
+    "connections_errors": ("connection_errors", "Failed connection attempts."),
+    "connections_lost": ("connections_lost", "Connections found broken and discarded."),
+    "returns_bad": ("returns_bad", "Connections returned in a bad state."),
+}
+_POOL_MS_COUNTERS = {
+    "requests_wait_ms": ("requests_wait_seconds", "Total time checkouts spent queued."),
+    "usage_ms": ("usage_seconds", "Total time connections were checked out."),
+    "connections_ms": ("connect_seconds", "Total time spent establishing connections."),
+}
+
+
+def _write_pool(out: metrics.Exposition) -> None:
+    stats = pool_stats()
+    for key, (name, help_text) in _POOL_GAUGES.items():
+        out.add(f"db_pool_{name}", "gauge", help_text, [({}, stats.get(key, 0))])
+    for key, (name, help_text) in _POOL_COUNTERS.items():
+        out.add(f"db_pool_{name}_total", "counter", help_text, [({}, stats.get(key, 0))])
+    for key, (name, help_text) in _POOL_MS_COUNTERS.items():
+        out.add(f"db_pool_{name}_total", "counter", help_text, [({}, stats.get(key, 0) / 1000)])
+    out.add("db_pool_rejected_total", "counter", "Checkouts refused: wait queue full.", [({}, stats["rejected"])])
+    out.add("db_pool_timeouts_total", "counter", "Checkouts that timed out.", [({}, stats["timeouts"])])
+    out.histogram("db_pool_wait_seconds", "Time a successful checkout waited.", [({}, pool.wait_ms)], scale=0.001)
+
+
+def _write_dexscreener(out: metrics.Exposition) -> None:
+    stats = dex.metrics_snapshot()
+    out.add(
+        "dexscreener_upstream_requests_total",
+        "counter",
+        "Upstream Dexscreener attempts by endpoint and HTTP status (error = no response).",
+        [({"endpoint": e, "status": s}, n) for (e, s), n in sorted(stats["upstream_calls"].items())],
+    )
+    out.histogram(
+        "dexscreener_upstream_duration_seconds",
+        "Upstream Dexscreener request latency.",
+        [({"endpoint": e}, h) for e, h in sorted(stats["upstream_seconds"].items())],
+    )
+
+    cache = stats["cache"]
+    out.add("dexscreener_cache_entries", "gauge", "Token metadata entries in memory.", [({}, cache["size"])])
+    for key in ("hits", "stale_hits", "misses", "evictions", "expirations"):
+        label = key.replace("_", " ")
+        out.add(f"dexscreener_cache_{key}_total", "counter", f"Token metadata cache {label}.", [({}, cache[key])])
+    for key, value in stats["counters"].items():
+        out.add(f"dexscreener_{key}_total", "counter", f"Token metadata {key.replace('_', ' ')}.", [({}, value)])
+
+    limiters = sorted(stats["limiters"].items())
+    for attr, name, help_text in (
+        ("acquired", "acquired", "Rate limiter tokens handed out."),
+        ("queued", "queued", "Calls that waited for a rate limiter token."),
+        ("queued_sec", "queued_seconds", "Time spent waiting for rate limiter tokens."),
+        ("blocks", "blocks", "Retry-After pauses applied to the host."),
+    ):
+        samples = [({"host": host}, bucket[attr]) for host, bucket in limiters]
+        out.add(f"dexscreener_limiter_{name}_total", "counter", help_text, samples)
+
+    breakers = sorted(stats["breakers"].items())
+    out.add(
+        "dexscreener_breaker_open",
+        "gauge",
+        "1 while the circuit breaker is not closed.",
+        [({"key": key}, breaker["state"] != "closed") for key, breaker in breakers],
+    )
+    out.add(
+        "dexscreener_breaker_opened_total",
+        "counter",
+        "Times the circuit breaker opened.",
+        [({"key": key}, breaker["opened"]) for key, breaker in breakers],
+    )
+
+
+def _write_background(out: metrics.Exposition) -> None:
+    m = market.stats()
+    out.add("market_polls_total", "counter", "Open-position mcap polls.", [({}, m["polls"])])
+    out.add("market_poll_failures_total", "counter", "Failed open-position mcap polls.", [({}, m["poll_failures"])])
+    out.add("market_quotes", "gauge", "Open positions with a live quote.", [({}, m["quotes"])])
+    t = tip_tracker.stats()
+    out.add("tip_tracker_runs_total", "counter", "Tip peak/trough tracking runs.", [({}, t["runs"])])
+    out.add("tip_tracker_failures_total", "counter", "Tip tracking runs that failed.", [({}, t["failures"])])
+    out.add("tip_tracker_tips_updated_total", "counter", "Tips whose peak or trough moved.", [({}, t["tips_updated"])])
+
+    snap = snapshot.metrics_snapshot()["cache"]
+    out.add("snapshot_cache_hits_total", "counter", "Assistant snapshot cache hits.", [({}, snap["hits"])])
+    out.add("snapshot_cache_misses_total", "counter", "Assistant snapshot cache misses.", [({}, snap["misses"])])
+    slow = slow_queries.stats()
+    out.add("db_slow_queries_total", "counter", "Statements slower than SLOW_QUERY_MS.", [({}, slow["recorded"])])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    # async: the counters are mutated on the event loop, so they are read there too
+    out = metrics.Exposition()
+    metrics.write_request_metrics(out)
+    _write_pool(out)
+    metrics.write_refresh_metrics(out)
+    _write_dexscreener(out)
+    _write_background(out)
+    return Response(content=out.text(), media_type=metrics.Exposition.CONTENT_TYPE)
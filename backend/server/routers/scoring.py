@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from ..cache import data_version
 from ..db import pool
 from ..schemas.scoring import ScoreCreate, ScoreOut
 from ..auth import require_admin
@@ -7,24 +8,24 @@ router = APIRouter(prefix="/scoring", tags=["scoring"])
 
 
 @router.post("", response_model=dict, dependencies=[Depends(require_admin)])
-def add_score(payload: ScoreCreate):
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+async def add_score(payload: ScoreCreate):
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             ca = payload.ca.lower()
             chain = payload.chain.lower() if payload.chain else None
             if chain:
-                cur.execute("SELECT 1 FROM coins WHERE ca = %s AND chain = %s;", (ca, chain))
-                if cur.fetchone() is None:
+                await cur.execute("SELECT 1 FROM coins WHERE ca = %s AND chain = %s;", (ca, chain))
+                if await cur.fetchone() is None:
                     raise HTTPException(status_code=404, detail="Coin not found")
             else:
-                cur.execute("SELECT chain FROM coins WHERE ca = %s LIMIT 2;", (ca,))
-                rows = cur.fetchall()
+                await cur.execute("SELECT chain FROM coins WHERE ca = %s LIMIT 2;", (ca,))
+                rows = await cur.fetchall()
                 if not rows:
                     raise HTTPException(status_code=404, detail="Coin not found")
                 if len(rows) > 1:
                     raise HTTPException(status_code=409, detail="Multiple chains found for this CA")
                 chain = rows[0][0]
-            cur.execute(
+            await cur.execute(
                 """
                 INSERT INTO scoring (ca, chain, intuition_score)
                 VALUES (%s, %s, %s)
@@ -32,8 +33,9 @@ def add_score(payload: ScoreCreate):
                 """,
                 (ca, chain, payload.intuition_score),
             )
-            row = cur.fetchone()
-            conn.commit()
+            row = await cur.fetchone()
+            await conn.commit()
+            data_version.bump()
 
     return {
         "ok": True,
@@ -48,7 +50,7 @@ def add_score(payload: ScoreCreate):
 
 
 @router.get("", response_model=list[ScoreOut])
-def list_scores(
+async def list_scores(
     limit: int = Query(default=200, ge=1, le=1000),
     ca: str | None = None,
     chain: str | None = None,
@@ -57,8 +59,8 @@ def list_scores(
         ca = ca.lower()
     if chain:
         chain = chain.lower()
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             params = []
             sql = """
                 SELECT id, ca, chain, scored_ts, intuition_score
@@ -75,8 +77,8 @@ def list_scores(
                 sql += " WHERE " + " AND ".join(where)
             sql += " ORDER BY scored_ts DESC LIMIT %s;"
             params.append(limit)
-            cur.execute(sql, tuple(params))
-            rows = cur.fetchall()
+            await cur.execute(sql, tuple(params))
+            rows = await cur.fetchall()
 
     return [
         {
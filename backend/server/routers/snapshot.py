@@ -1,513 +1,906 @@
-from fastapi import APIRouter, HTTPException, Query
-from ..db import pool
+import asyncio
+import json
+import os
+from contextlib import aclosing, asynccontextmanager
+from typing import AsyncIterator, Callable, Literal
+
+import psycopg
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from ..cache import LRUCache, data_version, etag_matches
+from ..db import DB_POOL_RETRY_AFTER_SEC, pool
+from ..enrichment import EMPTY_EXTRAS, EnrichmentLoader, collect_extras, extras_query
+from .. import snapshot_sql
 
 
 router = APIRouter(tags=["snapshot"])
 
-
-def _accounts_table(cur) -> str:
-    cur.execute(
-        "SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'accounts';"
+# Rows pulled per round trip when a section is streamed from a server-side cursor.
+STREAM_BATCH_SIZE = 500
+
+SNAPSHOT_CACHE_SIZE = int(os.getenv("SNAPSHOT_CACHE_SIZE", "16"))
+_snapshot_cache = LRUCache(maxsize=SNAPSHOT_CACHE_SIZE)
+
+# Each snapshot build holds one pool connection; cap how many run at once.
+SNAPSHOT_MAX_CONCURRENCY = int(os.getenv("SNAPSHOT_MAX_CONCURRENCY", "2"))
+SNAPSHOT_SLOT_TIMEOUT_SEC = 15
+_snapshot_slots = asyncio.BoundedSemaphore(SNAPSHOT_MAX_CONCURRENCY)
+
+# Document order of the global view, and the order a byte-budgeted snapshot
+# fills it in (most useful to the reader first; whatever no longer fits is dropped).
+SNAPSHOT_SECTIONS = ("coins", "trades_recent", "accounts", "tips_recent")
+SNAPSHOT_BUDGET_PRIORITY = ("trades_recent", "tips_recent", "accounts", "coins")
+# Budgeted snapshots pull small batches so little is fetched past the cut-off.
+BUDGET_BATCH_SIZE = 50
+# Rough size of one LLM token in JSON text; used to turn max_tokens into bytes.
+BYTES_PER_TOKEN = 4
+# Held back from the budget for the closing brackets and the "budget" summary.
+_BUDGET_RESERVE = 256
+
+
+_ACCOUNTS_TABLE_SQL = (
+    "SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'accounts';"
+)
+_HAS_MATVIEW_SQL = "SELECT 1 FROM pg_matviews WHERE schemaname = 'public' AND matviewname = %s;"
+_TOKEN_SQL = "SELECT pg_snapshot_xmin(pg_current_snapshot())::text;"
+
+
+async def _accounts_table(cur) -> str:
+    await cur.execute(_ACCOUNTS_TABLE_SQL)
+    return "accounts" if await cur.fetchone() else "social_accounts"
+
+
+async def _has_matview(cur, name: str) -> bool:
+    await cur.execute(_HAS_MATVIEW_SQL, (name,))
+    return await cur.fetchone() is not None
+
+
+async def _resolve_chain(cur, ca: str) -> str:
+    await cur.execute("SELECT chain FROM coins WHERE ca = %s LIMIT 2;", (ca,))
+    rows = await cur.fetchall()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Coin not found")
+    if len(rows) > 1:
+        raise HTTPException(status_code=409, detail="Multiple chains found for this CA")
+    return rows[0][0]
+
+
+# -------- Section queries --------
+def _coin_trades_query(ca: str, chain: str) -> tuple[str, tuple]:
+    sql = """
+        SELECT
+          id, trade_id, ca, coin_name,
+          entry_ts, entry_mcap_usd, size_usd,
+          exit_ts, exit_mcap_usd, exit_reason,
+          pnl_pct, pnl_usd
+        FROM v_trades_pnl
+        WHERE ca = %s AND chain = %s
+        ORDER BY entry_ts DESC;
+    """
+    return sql, (ca, chain)
+
+
+def _coin_tips_query(ca: str, chain: str) -> tuple[str, tuple]:
+    sql = """
+        SELECT
+          tip_id, ca, coin_name, account_id, platform, handle,
+          post_ts, post_mcap_usd, peak_mcap_usd, trough_mcap_usd, rug_flag,
+          gain_pct, drop_pct, effect_pct
+        FROM v_tip_gain_loss
+        WHERE ca = %s AND chain = %s
+        ORDER BY post_ts DESC;
+    """
+    return sql, (ca, chain)
+
+
+def _coins_query(chain: str | None, keys: set[tuple[str, str]] | None = None) -> tuple[str, tuple]:
+    sql = """
+        SELECT
+          c.ca, c.name, c.symbol, c.launch_ts, c.chain, c.source_type, c.created_ts,
+          COALESCE(t.trades_total, 0) AS trades_total,
+          COALESCE(t.trades_open, 0) AS trades_open,
+          COALESCE(x.tips_total, 0) AS tips_total
+        FROM coins c
+        LEFT JOIN LATERAL (
+          SELECT
+            COUNT(*) AS trades_total,
+            COUNT(*) FILTER (WHERE exit_ts IS NULL) AS trades_open
+          FROM trades
+          WHERE trades.ca = c.ca AND trades.chain = c.chain
+        ) t ON true
+        LEFT JOIN LATERAL (
+          SELECT
+            COUNT(*) AS tips_total
+          FROM tips
+          WHERE tips.ca = c.ca AND tips.chain = c.chain
+        ) x ON true
+    """
+    where = []
+    params = []
+    if chain:
+        where.append("c.chain = %s")
+        params.append(chain)
+    if keys is not None:
+        where.append("(c.chain, c.ca) IN (SELECT * FROM unnest(%s::text[], %s::text[]))")
+        params.append([k[0] for k in keys])
+        params.append([k[1] for k in keys])
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY c.created_ts DESC;"
+    return sql, tuple(params)
+
+
+def _trades_recent_query(chain: str | None, limit: int) -> tuple[str, tuple]:
+    sql = """
+        SELECT
+          id, trade_id, ca, chain, coin_name,
+          entry_ts, entry_mcap_usd, size_usd,
+          exit_ts, exit_mcap_usd, exit_reason,
+          pnl_pct, pnl_usd
+        FROM v_trades_pnl
+    """
+    params = []
+    if chain:
+        sql += " WHERE chain = %s"
+        params.append(chain)
+    sql += " ORDER BY entry_ts DESC LIMIT %s;"
+    params.append(limit)
+    return sql, tuple(params)
+
+
+async def _accounts_query(cur, chain: str | None, account_ids: set[int] | None = None) -> tuple[str, tuple]:
+    # the matview lags behind writes, so deltas always aggregate live rows
+    use_matview = not chain and account_ids is None and await _has_matview(cur, "mv_accounts_summary")
+    accounts_table = "accounts" if use_matview else await _accounts_table(cur)
+    return _accounts_sql(chain, account_ids, use_matview, accounts_table)
+
+
+def _accounts_sql(
+    chain: str | None,
+    account_ids: set[int] | None,
+    use_matview: bool,
+    accounts_table: str,
+) -> tuple[str, tuple]:
+    if use_matview:
+        sql = """
+            SELECT
+              account_id,
+              platform,
+              handle,
+              tips_total,
+              win_rate_50p,
+              rug_rate,
+              avg_effect_pct
+            FROM mv_accounts_summary
+            ORDER BY tips_total DESC, avg_effect_pct DESC NULLS LAST;
+        """
+        return sql, ()
+
+    sql = f"""
+        SELECT
+          a.account_id,
+          a.platform,
+          a.handle,
+          COUNT(t.tip_id) AS tips_total,
+          CASE
+            WHEN COUNT(t.tip_id) > 0
+            THEN SUM(CASE WHEN v.effect_pct >= 50 THEN 1 ELSE 0 END)::FLOAT / COUNT(t.tip_id)
+            ELSE NULL
+          END AS win_rate_50p,
+          CASE
+            WHEN COUNT(t.tip_id) > 0
+            THEN SUM(CASE WHEN v.rug_flag = 1 THEN 1 ELSE 0 END)::FLOAT / COUNT(t.tip_id)
+            ELSE NULL
+          END AS rug_rate,
+          AVG(v.effect_pct) AS avg_effect_pct
+        FROM {accounts_table} a
+        LEFT JOIN tips t ON a.account_id = t.account_id
+        LEFT JOIN v_tip_gain_loss v ON t.tip_id = v.tip_id
+    """
+    where = []
+    params = []
+    if chain:
+        where.append("t.chain = %s")
+        params.append(chain)
+    if account_ids is not None:
+        where.append("a.account_id = ANY(%s)")
+        params.append(list(account_ids))
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " GROUP BY a.account_id, a.platform, a.handle"
+    sql += " ORDER BY tips_total DESC, avg_effect_pct DESC NULLS LAST;"
+    return sql, tuple(params)
+
+
+def _tips_recent_query(chain: str | None, limit: int) -> tuple[str, tuple]:
+    sql = """
+        SELECT
+          tip_id, ca, chain, coin_name, account_id, platform, handle,
+          post_ts, post_mcap_usd, peak_mcap_usd, trough_mcap_usd, rug_flag,
+          gain_pct, drop_pct, effect_pct
+        FROM v_tip_gain_loss
+    """
+    params = []
+    if chain:
+        sql += " WHERE chain = %s"
+        params.append(chain)
+    sql += " ORDER BY post_ts DESC LIMIT %s;"
+    params.append(limit)
+    return sql, tuple(params)
+
+
+def _trades_by_id_query(trade_ids: list[str]) -> tuple[str, tuple]:
+    sql = """
+        SELECT
+          id, trade_id, ca, chain, coin_name,
+          entry_ts, entry_mcap_usd, size_usd,
+          exit_ts, exit_mcap_usd, exit_reason,
+          pnl_pct, pnl_usd
+        FROM v_trades_pnl
+        WHERE trade_id = ANY(%s)
+        ORDER BY entry_ts DESC;
+    """
+    return sql, (trade_ids,)
+
+
+def _tips_by_id_query(tip_ids: list[int]) -> tuple[str, tuple]:
+    sql = """
+        SELECT
+          tip_id, ca, chain, coin_name, account_id, platform, handle,
+          post_ts, post_mcap_usd, peak_mcap_usd, trough_mcap_usd, rug_flag,
+          gain_pct, drop_pct, effect_pct
+        FROM v_tip_gain_loss
+        WHERE tip_id = ANY(%s)
+        ORDER BY post_ts DESC;
+    """
+    return sql, (tip_ids,)
+
+
+# -------- Bubbles + scoring for a batch of rows --------
+async def _enrich_trades(loader: EnrichmentLoader, rows: list) -> dict:
+    return await loader.load("trade", [r[1] for r in rows])
+
+
+async def _enrich_tips(loader: EnrichmentLoader, rows: list) -> dict:
+    return await loader.load("tip", [r[0] for r in rows])
+
+
+# -------- Row -> dict --------
+def _extras_for(key, extras: dict) -> dict:
+    x = extras.get(key, EMPTY_EXTRAS)
+    return {
+        "bubbles": {"clusters": x.clusters, "others": x.others},
+        "scoring": {"intuition_score": x.intuition_score},
+    }
+
+
+def _coin_trade_out(r, extras, chain: str) -> dict:
+    return {
+        "id": r[0],
+        "trade_id": r[1],
+        "chain": chain,
+        "entry_ts": r[4].isoformat() if r[4] else None,
+        "entry_mcap_usd": float(r[5]) if r[5] is not None else None,
+        "size_usd": float(r[6]) if r[6] is not None else None,
+        "exit_ts": r[7].isoformat() if r[7] else None,
+        "exit_mcap_usd": float(r[8]) if r[8] is not None else None,
+        "exit_reason": r[9],
+        "pnl_pct": float(r[10]) if r[10] is not None else None,
+        "pnl_usd": float(r[11]) if r[11] is not None else None,
+        **_extras_for(r[1], extras),
+    }
+
+
+def _coin_tip_out(r, extras, chain: str) -> dict:
+    return {
+        "tip_id": r[0],
+        "chain": chain,
+        "account_id": r[3],
+        "platform": r[4],
+        "handle": r[5],
+        "post_ts": r[6].isoformat() if r[6] else None,
+        "post_mcap_usd": float(r[7]) if r[7] is not None else None,
+        "peak_mcap_usd": float(r[8]) if r[8] is not None else None,
+        "trough_mcap_usd": float(r[9]) if r[9] is not None else None,
+        "rug_flag": r[10],
+        "gain_pct": float(r[11]) if r[11] is not None else None,
+        "drop_pct": float(r[12]) if r[12] is not None else None,
+        "effect_pct": float(r[13]) if r[13] is not None else None,
+        **_extras_for(r[0], extras),
+    }
+
+
+def _coin_out(r, extras=None) -> dict:
+    return {
+        "ca": r[0],
+        "name": r[1],
+        "symbol": r[2],
+        "launch_ts": r[3].isoformat() if r[3] else None,
+        "chain": r[4],
+        "source_type": r[5],
+        "created_ts": r[6].isoformat() if r[6] else None,
+        "trades_total": int(r[7]),
+        "trades_open": int(r[8]),
+        "tips_total": int(r[9]),
+    }
+
+
+def _trade_out(r, extras) -> dict:
+    return {
+        "id": r[0],
+        "trade_id": r[1],
+        "ca": r[2],
+        "chain": r[3],
+        "coin_name": r[4],
+        "entry_ts": r[5].isoformat() if r[5] else None,
+        "entry_mcap_usd": float(r[6]) if r[6] is not None else None,
+        "size_usd": float(r[7]) if r[7] is not None else None,
+        "exit_ts": r[8].isoformat() if r[8] else None,
+        "exit_mcap_usd": float(r[9]) if r[9] is not None else None,
+        "exit_reason": r[10],
+        "pnl_pct": float(r[11]) if r[11] is not None else None,
+        "pnl_usd": float(r[12]) if r[12] is not None else None,
+        **_extras_for(r[1], extras),
+    }
+
+
+def _account_out(r, extras=None) -> dict:
+    return {
+        "account_id": r[0],
+        "platform": r[1],
+        "handle": r[2],
+        "tips_total": int(r[3]) if r[3] else 0,
+        "win_rate_50p": float(r[4]) if r[4] is not None else None,
+        "rug_rate": float(r[5]) if r[5] is not None else None,
+        "avg_effect_pct": float(r[6]) if r[6] is not None else None,
+    }
+
+
+def _tip_out(r, extras) -> dict:
+    return {
+        "tip_id": r[0],
+        "ca": r[1],
+        "chain": r[2],
+        "coin_name": r[3],
+        "account_id": r[4],
+        "platform": r[5],
+        "handle": r[6],
+        "post_ts": r[7].isoformat() if r[7] else None,
+        "post_mcap_usd": float(r[8]) if r[8] is not None else None,
+        "peak_mcap_usd": float(r[9]) if r[9] is not None else None,
+        "trough_mcap_usd": float(r[10]) if r[10] is not None else None,
+        "rug_flag": r[11],
+        "gain_pct": float(r[12]) if r[12] is not None else None,
+        "drop_pct": float(r[13]) if r[13] is not None else None,
+        "effect_pct": float(r[14]) if r[14] is not None else None,
+        **_extras_for(r[0], extras),
+    }
+
+
+# -------- Section iteration --------
+async def _iter_section(
+    conn,
+    name: str,
+    query: tuple[str, tuple],
+    convert: Callable,
+    enrich: Callable | None = None,
+    stream: bool = False,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> AsyncIterator[dict]:
+    """Yield a section's rows as dicts.
+
+    With `stream=True` rows come from a server-side cursor in batches of
+    `batch_size`, and bubbles/scoring are fetched per batch, so only one
+    batch is ever held in memory. Closing the iterator closes the cursor.
+    """
+    sql, params = query
+    if stream:
+        src = conn.cursor(name=f"snapshot_{name}")
+    else:
+        src = conn.cursor()
+    async with src, conn.cursor() as cur:
+        loader = EnrichmentLoader(cur)
+        await src.execute(sql, params)
+        while True:
+            rows = await (src.fetchmany(batch_size) if stream else src.fetchall())
+            if not rows:
+                break
+            extras = await enrich(loader, rows) if enrich else None
+            for r in rows:
+                yield convert(r, extras)
+            if not stream:
+                break
+
+
+async def _coin_detail_sections(
+    conn, ca: str, chain: str, stream: bool = False, batch_size: int = STREAM_BATCH_SIZE
+):
+    yield "trades", _iter_section(
+        conn,
+        "trades",
+        _coin_trades_query(ca, chain),
+        lambda r, extras: _coin_trade_out(r, extras, chain),
+        _enrich_trades,
+        stream,
+        batch_size,
+    )
+    yield "tips", _iter_section(
+        conn,
+        "tips",
+        _coin_tips_query(ca, chain),
+        lambda r, extras: _coin_tip_out(r, extras, chain),
+        _enrich_tips,
+        stream,
+        batch_size,
     )
-    return "accounts" if cur.fetchone() else "social_accounts"
 
 
-def _has_matview(cur, name: str) -> bool:
-    cur.execute(
-        "SELECT 1 FROM pg_matviews WHERE schemaname = 'public' AND matviewname = %s;",
-        (name,),
+async def _global_sections(
+    conn,
+    chain: str | None,
+    limit: int,
+    stream: bool = False,
+    order: tuple[str, ...] = SNAPSHOT_SECTIONS,
+    batch_size: int = STREAM_BATCH_SIZE,
+):
+    def section(name, query, convert, enrich=None):
+        return _iter_section(conn, name, query, convert, enrich, stream, batch_size)
+
+    async def accounts():
+        async with conn.cursor() as cur:
+            query = await _accounts_query(cur, chain)
+        async with aclosing(section("accounts", query, _account_out)) as rows:
+            async for row in rows:
+                yield row
+
+    # sections are built lazily so ones never reached are never queried
+    builders = {
+        "coins": lambda: section("coins", _coins_query(chain), _coin_out),
+        "trades_recent": lambda: section(
+            "trades_recent", _trades_recent_query(chain, limit), _trade_out, _enrich_trades
+        ),
+        "accounts": accounts,
+        "tips_recent": lambda: section("tips_recent", _tips_recent_query(chain, limit), _tip_out, _enrich_tips),
+    }
+    for name in order:
+        yield name, builders[name]()
+
+
+def _ndjson_line(section: str, data: dict) -> bytes:
+    return (json.dumps({"section": section, "data": data}, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+async def _snapshot_token(cur) -> str:
+    """Delta token for data read after this call: the oldest transaction still in flight."""
+    await cur.execute(_TOKEN_SQL)
+    return (await cur.fetchone())[0]
+
+
+async def _delta_snapshot(conn, since: str) -> dict:
+    """Rows touched by any transaction >= `since`, read from change_log."""
+    async with conn.cursor() as cur:
+        token = await _snapshot_token(cur)
+        await cur.execute(
+            """
+            SELECT entity, entity_key, chain, ca, account_id
+            FROM change_log
+            WHERE txid >= %s::xid8;
+            """,
+            (since,),
+        )
+        changes = await cur.fetchall()
+        # checked after reading the log, so a prune that raced that read is caught here
+        await cur.execute("SELECT pruned_txid >= %s::xid8 FROM change_log_horizon;", (since,))
+        expired = await cur.fetchone()
+        if expired and expired[0]:
+            raise HTTPException(status_code=410, detail="since token expired, full resync required")
+
+        trade_ids: set[str] = set()
+        tip_ids: set[int] = set()
+        coin_keys: set[tuple[str, str]] = set()
+        account_ids: set[int] = set()
+        for entity, key, chain, ca, account_id in changes:
+            if entity == "trade":
+                trade_ids.add(key)
+            elif entity == "tip":
+                tip_ids.add(int(key))
+            # trade/tip changes move the per-coin counts and per-account stats too
+            if chain and ca:
+                coin_keys.add((chain, ca))
+            if account_id is not None:
+                account_ids.add(account_id)
+
+        accounts_query = await _accounts_query(cur, None, account_ids) if account_ids else None
+
+    delta: dict = {"since": since, "token": token}
+    delta["coins"] = (
+        [row async for row in _iter_section(conn, "coins", _coins_query(None, coin_keys), _coin_out)]
+        if coin_keys
+        else []
+    )
+    delta["trades"] = (
+        [
+            row
+            async for row in _iter_section(
+                conn, "trades", _trades_by_id_query(list(trade_ids)), _trade_out, _enrich_trades
+            )
+        ]
+        if trade_ids
+        else []
+    )
+    delta["accounts"] = (
+        [row async for row in _iter_section(conn, "accounts", accounts_query, _account_out)]
+        if accounts_query
+        else []
+    )
+    delta["tips"] = (
+        [
+            row
+            async for row in _iter_section(conn, "tips", _tips_by_id_query(list(tip_ids)), _tip_out, _enrich_tips)
+        ]
+        if tip_ids
+        else []
     )
-    return cur.fetchone() is not None
+
+    found_coins = {(c["chain"], c["ca"]) for c in delta["coins"]}
+    found_accounts = {a["account_id"] for a in delta["accounts"]}
+    delta["deleted"] = {
+        "coins": [{"ca": ca, "chain": chain} for chain, ca in sorted(coin_keys - found_coins)],
+        "trades": sorted(trade_ids - {t["trade_id"] for t in delta["trades"]}),
+        "tips": sorted(tip_ids - {t["tip_id"] for t in delta["tips"]}),
+        "accounts": sorted(account_ids - found_accounts),
+    }
+    return delta
+
+
+async def _stream_snapshot(
+    lease: "_SlotLease", ca: str | None, chain: str | None, limit: int
+) -> AsyncIterator[bytes]:
+    try:
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                yield _ndjson_line("token", {"token": await _snapshot_token(cur)})
+            if ca:
+                yield _ndjson_line("coin_detail", {"ca": ca, "chain": chain})
+                sections = _coin_detail_sections(conn, ca, chain, stream=True)
+            else:
+                sections = _global_sections(conn, chain, limit, stream=True)
+            async for name, rows in sections:
+                async with aclosing(rows):
+                    async for row in rows:
+                        yield _ndjson_line(name, row)
+    finally:
+        lease.release()
+
+
+async def _sql_snapshot(conn, ca: str | None, chain: str | None, limit: int) -> str:
+    """Build the snapshot body with the json_agg engine (one statement per section)."""
+    async with conn.cursor() as cur:
+        if ca:
+            detail = snapshot_sql.join_object(
+                [
+                    ("ca", json.dumps(ca)),
+                    ("chain", json.dumps(chain)),
+                    ("trades", await snapshot_sql.fetch_section(cur, snapshot_sql.coin_trades_query(ca, chain))),
+                    ("tips", await snapshot_sql.fetch_section(cur, snapshot_sql.coin_tips_query(ca, chain))),
+                ]
+            )
+            return snapshot_sql.join_object([("coin_detail", detail)])
+
+        use_matview = not chain and await _has_matview(cur, "mv_accounts_summary")
+        accounts_table = "accounts" if use_matview else await _accounts_table(cur)
+        return snapshot_sql.join_object(
+            [
+                ("coins", await snapshot_sql.fetch_section(cur, snapshot_sql.coins_query(chain))),
+                (
+                    "trades_recent",
+                    await snapshot_sql.fetch_section(cur, snapshot_sql.trades_recent_query(chain, limit)),
+                ),
+                (
+                    "accounts",
+                    await snapshot_sql.fetch_section(
+                        cur, snapshot_sql.accounts_query(chain, use_matview, accounts_table)
+                    ),
+                ),
+                (
+                    "tips_recent",
+                    await snapshot_sql.fetch_section(cur, snapshot_sql.tips_recent_query(chain, limit)),
+                ),
+            ]
+        )
+
+
+async def _run_pipelined(conn, queries: list[tuple[str, tuple]]) -> list[list]:
+    """Execute independent queries in one round trip (pipeline mode) and return their rows."""
+    cursors = [conn.cursor() for _ in queries]
+    try:
+        if psycopg.AsyncPipeline.is_supported():
+            async with conn.pipeline():
+                for cur, (sql, params) in zip(cursors, queries):
+                    await cur.execute(sql, params)
+        else:
+            for cur, (sql, params) in zip(cursors, queries):
+                await cur.execute(sql, params)
+        return [await cur.fetchall() for cur in cursors]
+    finally:
+        for cur in cursors:
+            await cur.close()
+
+
+async def _pipelined_extras(conn, head: list[tuple[str, tuple]], batches: list[tuple[str, list]]):
+    """Run `head` plus the extras query of every (kind, ids) batch in one pipeline."""
+    queries = list(head)
+    for kind, ids in batches:
+        if ids:
+            queries.append(extras_query(kind, ids))
+    results = await _run_pipelined(conn, queries) if queries else []
+    head_results = results[: len(head)]
+    rest = iter(results[len(head) :])
+    extras = [collect_extras(next(rest)) if ids else {} for _, ids in batches]
+    return head_results, extras
+
+
+async def _pipelined_snapshot(conn, ca: str | None, chain: str | None, limit: int) -> tuple[dict, str]:
+    """Build the snapshot in two pipelined round trips: base rows, then enrichment.
+
+    Everything runs on the caller's single connection, so one snapshot never
+    holds more than one pool slot.
+    """
+    if ca:
+        token_rows, trade_rows, tip_rows = await _run_pipelined(
+            conn,
+            [(_TOKEN_SQL, ()), _coin_trades_query(ca, chain), _coin_tips_query(ca, chain)],
+        )
+        _, (trade_extras, tip_extras) = await _pipelined_extras(
+            conn, [], [("trade", [r[1] for r in trade_rows]), ("tip", [r[0] for r in tip_rows])]
+        )
+        detail = {
+            "ca": ca,
+            "chain": chain,
+            "trades": [_coin_trade_out(r, trade_extras, chain) for r in trade_rows],
+            "tips": [_coin_tip_out(r, tip_extras, chain) for r in tip_rows],
+        }
+        return {"coin_detail": detail}, token_rows[0][0]
+
+    token_rows, matview_rows, table_rows, coin_rows, trade_rows, tip_rows = await _run_pipelined(
+        conn,
+        [
+            (_TOKEN_SQL, ()),
+            (_HAS_MATVIEW_SQL, ("mv_accounts_summary",)),
+            (_ACCOUNTS_TABLE_SQL, ()),
+            _coins_query(chain),
+            _trades_recent_query(chain, limit),
+            _tips_recent_query(chain, limit),
+        ],
+    )
+    use_matview = not chain and bool(matview_rows)
+    accounts_table = "accounts" if table_rows else "social_accounts"
+    (account_rows,), (trade_extras, tip_extras) = await _pipelined_extras(
+        conn,
+        [_accounts_sql(chain, None, use_matview, accounts_table)],
+        [("trade", [r[1] for r in trade_rows]), ("tip", [r[0] for r in tip_rows])],
+    )
+    snap = {
+        "coins": [_coin_out(r) for r in coin_rows],
+        "trades_recent": [_trade_out(r, trade_extras) for r in trade_rows],
+        "accounts": [_account_out(r) for r in account_rows],
+        "tips_recent": [_tip_out(r, tip_extras) for r in tip_rows],
+    }
+    return snap, token_rows[0][0]
+
+
+async def _budgeted_snapshot(conn, ca: str | None, chain: str | None, limit: int, max_bytes: int) -> bytes:
+    """Fill sections in priority order until the body would exceed `max_bytes`.
+
+    Rows are pulled from server-side cursors in small batches and encoded one
+    at a time. The first row that does not fit closes its cursor, and the
+    sections after it are never queried. A trailing `budget` object reports
+    what was kept and what was cut.
+    """
+    if ca:
+        order = ("trades", "tips")
+        sections = _coin_detail_sections(conn, ca, chain, stream=True, batch_size=BUDGET_BATCH_SIZE)
+        head = b'{"coin_detail":' + _json_bytes({"ca": ca, "chain": chain})[:-1]
+    else:
+        order = SNAPSHOT_BUDGET_PRIORITY
+        sections = _global_sections(
+            conn, chain, limit, stream=True, order=order, batch_size=BUDGET_BATCH_SIZE
+        )
+        head = b"{"
+
+    remaining = max_bytes - _BUDGET_RESERVE - len(head)
+    parts: list[bytes] = []
+    rows_kept: dict[str, int] = {}
+    truncated = None
+    async for name, rows in sections:
+        key = _json_bytes(name)
+        remaining -= len(key) + 4  # "name":[] plus a separating comma
+        encoded = []
+        try:
+            async for row in rows:
+                data = _json_bytes(row)
+                if len(data) + 1 > remaining:
+                    truncated = name
+                    break
+                encoded.append(data)
+                remaining -= len(data) + 1
+        finally:
+            await rows.aclose()
+        parts.append(key + b":[" + b",".join(encoded) + b"]")
+        rows_kept[name] = len(encoded)
+        if truncated:
+            break
+
+    budget = {
+        "max_bytes": max_bytes,
+        "truncated": truncated,
+        "omitted": [name for name in order if name not in rows_kept],
+        "rows": rows_kept,
+    }
+    if ca:
+        body = head + b"," + b",".join(parts) + b"}"
+    else:
+        body = head + b",".join(parts)
+    return body + b',"budget":' + _json_bytes(budget) + b"}"
+
+
+async def _acquire_slot() -> bool:
+    try:
+        await asyncio.wait_for(_snapshot_slots.acquire(), SNAPSHOT_SLOT_TIMEOUT_SEC)
+    except TimeoutError:
+        return False
+    return True
+
+
+class _SlotLease:
+    """A held snapshot slot; released once, by whichever of its holders finishes first."""
+
+    def __init__(self):
+        self._held = True
+
+    def release(self) -> None:
+        if self._held:
+            self._held = False
+            _snapshot_slots.release()
+
+
+async def _lease_slot() -> _SlotLease:
+    """Bound concurrent snapshot builds so they cannot drain the shared pool."""
+    if not await _acquire_slot():
+        raise HTTPException(
+            status_code=503, detail="snapshot_busy", headers={"Retry-After": str(DB_POOL_RETRY_AFTER_SEC)}
+        )
+    return _SlotLease()
+
+
+@asynccontextmanager
+async def _snapshot_slot():
+    lease = await _lease_slot()
+    try:
+        yield
+    finally:
+        lease.release()
+
+
+def metrics_snapshot() -> dict:
+    """Counters for /metrics."""
+    return {"cache": _snapshot_cache.stats()}
+
+
+def _json_bytes(snap: dict) -> bytes:
+    return json.dumps(snap, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
 
 
 @router.get("/assistant_snapshot")
-def assistant_snapshot(
+async def assistant_snapshot(
     ca: str | None = Query(default=None, min_length=3),
     chain: str | None = None,
     limit: int = Query(default=200, ge=1, le=2000),
+    format: Literal["json", "ndjson"] = "json",
+    engine: Literal["python", "sql"] = "python",
+    since: str | None = Query(default=None, pattern=r"^\d+$"),
+    max_bytes: int | None = Query(default=None, ge=1024),
+    max_tokens: int | None = Query(default=None, ge=256),
+    if_none_match: str | None = Header(default=None),
 ):
     """Returns a JSON bundle that you can copy-paste to ChatGPT.
 
     - If `ca` is omitted: returns a global view (coins summary + recent trades/tips + accounts).
     - If `ca` is provided: returns ONLY coin_detail for that coin (all trades/tips with their own bubbles + scoring).
+    - With `format=ndjson` the same rows are streamed one per line as
+      `{"section": ..., "data": ...}` straight from server-side cursors.
+    - With `engine=sql` every section is rendered to JSON by Postgres and
+      passed through as-is (same content as the default engine).
+
+    Responses carry an ETag derived from the data version; a matching
+    `If-None-Match` gets a 304 and JSON bodies are served from an in-memory
+    LRU until the next write.
+
+    Full snapshots also return a delta token (`X-Snapshot-Token` header, or the
+    first NDJSON line). `since=<token>` returns only the coins, trades, tips and
+    account stats changed after it, the ids deleted since, and the next token.
+    Changes are kept for CHANGE_LOG_RETENTION_HOURS; an older token gets a 410
+    and the client has to fetch a full snapshot again.
+
+    `max_bytes` / `max_tokens` (about BYTES_PER_TOKEN bytes each) cap the JSON
+    body. Sections are filled in priority order (trades, tips, accounts, coins)
+    and rows stop being fetched once the budget is spent; a `budget` object
+    says which section was cut and which were left out.
     """
 
-    snap: dict = {}
-
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
-            if chain:
-                chain = chain.lower()
-            # If CA is provided, return ONLY coin_detail
-            if ca:
-                ca = ca.lower()
-                if not chain:
-                    cur.execute("SELECT chain FROM coins WHERE ca = %s LIMIT 2;", (ca,))
-                    rows = cur.fetchall()
-                    if not rows:
-                        raise HTTPException(status_code=404, detail="Coin not found")
-                    if len(rows) > 1:
-                        raise HTTPException(status_code=409, detail="Multiple chains found for this CA")
-                    chain = rows[0][0]
-
-                # coin trades with their own bubbles and scoring
-                cur.execute(
-                    """
-                    SELECT
-                      id, trade_id, ca, coin_name,
-                      entry_ts, entry_mcap_usd, size_usd,
-                      exit_ts, exit_mcap_usd, exit_reason,
-                      pnl_pct, pnl_usd
-                    FROM v_trades_pnl
-                    WHERE ca = %s AND chain = %s
-                    ORDER BY entry_ts DESC;
-                    """,
-                    (ca, chain),
-                )
-                coin_trades_raw = cur.fetchall()
-                coin_trades = []
-                trade_ids = [r[1] for r in coin_trades_raw]
-                clusters_by_trade: dict[str, list[dict]] = {}
-                others_by_trade: dict[str, list[dict]] = {}
-                scoring_by_trade: dict[str, int] = {}
-
-                if trade_ids:
-                    cur.execute(
-                        """
-                        SELECT trade_id, cluster_rank, pct
-                        FROM trade_bubbles
-                        WHERE trade_id = ANY(%s)
-                        ORDER BY trade_id ASC, cluster_rank ASC;
-                        """,
-                        (trade_ids,),
-                    )
-                    for trade_id, rank, pct in cur.fetchall():
-                        clusters_by_trade.setdefault(trade_id, []).append(
-                            {"rank": rank, "pct": float(pct)}
-                        )
-
-                    cur.execute(
-                        """
-                        SELECT trade_id, other_rank, pct
-                        FROM trade_bubbles_others
-                        WHERE trade_id = ANY(%s)
-                        ORDER BY trade_id ASC, other_rank ASC;
-                        """,
-                        (trade_ids,),
-                    )
-                    for trade_id, rank, pct in cur.fetchall():
-                        others_by_trade.setdefault(trade_id, []).append(
-                            {"rank": rank, "pct": float(pct)}
-                        )
-
-                    cur.execute(
-                        """
-                        SELECT DISTINCT ON (trade_id) trade_id, intuition_score
-                        FROM trade_scoring
-                        WHERE trade_id = ANY(%s)
-                        ORDER BY trade_id ASC, scored_ts DESC;
-                        """,
-                        (trade_ids,),
-                    )
-                    for trade_id, score in cur.fetchall():
-                        scoring_by_trade[trade_id] = score
-
-                for r in coin_trades_raw:
-                    trade_id = r[1]
-                    clusters = clusters_by_trade.get(trade_id, [])
-                    others = others_by_trade.get(trade_id, [])
-                    intuition_score = scoring_by_trade.get(trade_id)
-
-                    coin_trades.append({
-                        "id": r[0],
-                        "trade_id": r[1],
-                        "chain": chain,
-                        "entry_ts": r[4].isoformat() if r[4] else None,
-                        "entry_mcap_usd": float(r[5]) if r[5] is not None else None,
-                        "size_usd": float(r[6]) if r[6] is not None else None,
-                        "exit_ts": r[7].isoformat() if r[7] else None,
-                        "exit_mcap_usd": float(r[8]) if r[8] is not None else None,
-                        "exit_reason": r[9],
-                        "pnl_pct": float(r[10]) if r[10] is not None else None,
-                        "pnl_usd": float(r[11]) if r[11] is not None else None,
-                        "bubbles": {"clusters": clusters, "others": others},
-                        "scoring": {"intuition_score": intuition_score},
-                    })
-
-                # coin tips with their own bubbles and scoring
-                cur.execute(
-                    """
-                    SELECT
-                      tip_id, ca, coin_name, account_id, platform, handle,
-                      post_ts, post_mcap_usd, peak_mcap_usd, trough_mcap_usd, rug_flag,
-                      gain_pct, drop_pct, effect_pct
-                    FROM v_tip_gain_loss
-                    WHERE ca = %s AND chain = %s
-                    ORDER BY post_ts DESC;
-                    """,
-                    (ca, chain),
-                )
-                coin_tips_raw = cur.fetchall()
-                coin_tips = []
-                tip_ids = [r[0] for r in coin_tips_raw]
-                clusters_by_tip: dict[int, list[dict]] = {}
-                others_by_tip: dict[int, list[dict]] = {}
-                scoring_by_tip: dict[int, int] = {}
-
-                if tip_ids:
-                    cur.execute(
-                        """
-                        SELECT tip_id, cluster_rank, pct
-                        FROM tip_bubbles
-                        WHERE tip_id = ANY(%s)
-                        ORDER BY tip_id ASC, cluster_rank ASC;
-                        """,
-                        (tip_ids,),
-                    )
-                    for tip_id, rank, pct in cur.fetchall():
-                        clusters_by_tip.setdefault(tip_id, []).append(
-                            {"rank": rank, "pct": float(pct)}
-                        )
-
-                    cur.execute(
-                        """
-                        SELECT tip_id, other_rank, pct
-                        FROM tip_bubbles_others
-                        WHERE tip_id = ANY(%s)
-                        ORDER BY tip_id ASC, other_rank ASC;
-                        """,
-                        (tip_ids,),
-                    )
-                    for tip_id, rank, pct in cur.fetchall():
-                        others_by_tip.setdefault(tip_id, []).append(
-                            {"rank": rank, "pct": float(pct)}
-                        )
-
-                    cur.execute(
-                        """
-                        SELECT DISTINCT ON (tip_id) tip_id, intuition_score
-                        FROM tip_scoring
-                        WHERE tip_id = ANY(%s)
-                        ORDER BY tip_id ASC, scored_ts DESC;
-                        """,
-                        (tip_ids,),
-                    )
-                    for tip_id, score in cur.fetchall():
-                        scoring_by_tip[tip_id] = score
-
-                for r in coin_tips_raw:
-                    tip_id = r[0]
-                    clusters = clusters_by_tip.get(tip_id, [])
-                    others = others_by_tip.get(tip_id, [])
-                    intuition_score = scoring_by_tip.get(tip_id)
-
-                    coin_tips.append({
-                        "tip_id": r[0],
-                        "chain": chain,
-                        "account_id": r[3],
-                        "platform": r[4],
-                        "handle": r[5],
-                        "post_ts": r[6].isoformat() if r[6] else None,
-                        "post_mcap_usd": float(r[7]) if r[7] is not None else None,
-                        "peak_mcap_usd": float(r[8]) if r[8] is not None else None,
-                        "trough_mcap_usd": float(r[9]) if r[9] is not None else None,
-                        "rug_flag": r[10],
-                        "gain_pct": float(r[11]) if r[11] is not None else None,
-                        "drop_pct": float(r[12]) if r[12] is not None else None,
-                        "effect_pct": float(r[13]) if r[13] is not None else None,
-                        "bubbles": {"clusters": clusters, "others": others},
-                        "scoring": {"intuition_score": intuition_score},
-                    })
-
-                snap["coin_detail"] = {
-                    "ca": ca,
-                    "chain": chain,
-                    "trades": coin_trades,
-                    "tips": coin_tips,
-                }
-                return snap
-
-            # If CA is NOT provided, return GLOBAL view (no coin_detail)
-            # --- Coins summary ---
-            sql = """
-                SELECT
-                  c.ca, c.name, c.symbol, c.launch_ts, c.chain, c.source_type, c.created_ts,
-                  COALESCE(t.trades_total, 0) AS trades_total,
-                  COALESCE(t.trades_open, 0) AS trades_open,
-                  COALESCE(x.tips_total, 0) AS tips_total
-                FROM coins c
-                LEFT JOIN LATERAL (
-                  SELECT
-                    COUNT(*) AS trades_total,
-                    COUNT(*) FILTER (WHERE exit_ts IS NULL) AS trades_open
-                  FROM trades
-                  WHERE trades.ca = c.ca AND trades.chain = c.chain
-                ) t ON true
-                LEFT JOIN LATERAL (
-                  SELECT
-                    COUNT(*) AS tips_total
-                  FROM tips
-                  WHERE tips.ca = c.ca AND tips.chain = c.chain
-                ) x ON true
-            """
-            params = []
-            if chain:
-                sql += " WHERE c.chain = %s"
-                params.append(chain)
-            sql += " ORDER BY c.created_ts DESC;"
-            cur.execute(sql, tuple(params))
-            coins = cur.fetchall()
-            snap["coins"] = [
-                {
-                    "ca": r[0],
-                    "name": r[1],
-                    "symbol": r[2],
-                    "launch_ts": r[3].isoformat() if r[3] else None,
-                    "chain": r[4],
-                    "source_type": r[5],
-                    "created_ts": r[6].isoformat() if r[6] else None,
-                    "trades_total": int(r[7]),
-                    "trades_open": int(r[8]),
-                    "tips_total": int(r[9]),
-                }
-                for r in coins
-            ]
-
-            # --- Recent trades (global) with their own bubbles and scoring ---
-            sql = """
-                SELECT
-                  id, trade_id, ca, chain, coin_name,
-                  entry_ts, entry_mcap_usd, size_usd,
-                  exit_ts, exit_mcap_usd, exit_reason,
-                  pnl_pct, pnl_usd
-                FROM v_trades_pnl
-            """
-            params = []
-            if chain:
-                sql += " WHERE chain = %s"
-                params.append(chain)
-            sql += " ORDER BY entry_ts DESC LIMIT %s;"
-            params.append(limit)
-            cur.execute(sql, tuple(params))
-            trades = cur.fetchall()
-            snap["trades_recent"] = []
-            trade_ids = [r[1] for r in trades]
-            clusters_by_trade: dict[str, list[dict]] = {}
-            others_by_trade: dict[str, list[dict]] = {}
-            scoring_by_trade: dict[str, int] = {}
-
-            if trade_ids:
-                cur.execute(
-                    """
-                    SELECT trade_id, cluster_rank, pct
-                    FROM trade_bubbles
-                    WHERE trade_id = ANY(%s)
-                    ORDER BY trade_id ASC, cluster_rank ASC;
-                    """,
-                    (trade_ids,),
-                )
-                for trade_id, rank, pct in cur.fetchall():
-                    clusters_by_trade.setdefault(trade_id, []).append(
-                        {"rank": rank, "pct": float(pct)}
-                    )
-
-                cur.execute(
-                    """
-                    SELECT trade_id, other_rank, pct
-                    FROM trade_bubbles_others
-                    WHERE trade_id = ANY(%s)
-                    ORDER BY trade_id ASC, other_rank ASC;
-                    """,
-                    (trade_ids,),
-                )
-                for trade_id, rank, pct in cur.fetchall():
-                    others_by_trade.setdefault(trade_id, []).append(
-                        {"rank": rank, "pct": float(pct)}
-                    )
-
-                cur.execute(
-                    """
-                    SELECT DISTINCT ON (trade_id) trade_id, intuition_score
-                    FROM trade_scoring
-                    WHERE trade_id = ANY(%s)
-                    ORDER BY trade_id ASC, scored_ts DESC;
-                    """,
-                    (trade_ids,),
-                )
-                for trade_id, score in cur.fetchall():
-                    scoring_by_trade[trade_id] = score
-
-            for r in trades:
-                trade_id = r[1]
-                clusters = clusters_by_trade.get(trade_id, [])
-                others = others_by_trade.get(trade_id, [])
-                intuition_score = scoring_by_trade.get(trade_id)
-
-                snap["trades_recent"].append({
-                    "id": r[0],
-                    "trade_id": r[1],
-                    "ca": r[2],
-                    "chain": r[3],
-                    "coin_name": r[4],
-                    "entry_ts": r[5].isoformat() if r[5] else None,
-                    "entry_mcap_usd": float(r[6]) if r[6] is not None else None,
-                    "size_usd": float(r[7]) if r[7] is not None else None,
-                    "exit_ts": r[8].isoformat() if r[8] else None,
-                    "exit_mcap_usd": float(r[9]) if r[9] is not None else None,
-                    "exit_reason": r[10],
-                    "pnl_pct": float(r[11]) if r[11] is not None else None,
-                    "pnl_usd": float(r[12]) if r[12] is not None else None,
-                    "bubbles": {"clusters": clusters, "others": others},
-                    "scoring": {"intuition_score": intuition_score},
-                })
-
-            # --- Accounts summary (global) ---
-            if not chain and _has_matview(cur, "mv_accounts_summary"):
-                cur.execute(
-                    """
-                    SELECT
-                      account_id,
-                      platform,
-                      handle,
-                      tips_total,
-                      win_rate_50p,
-                      rug_rate,
-                      avg_effect_pct
-                    FROM mv_accounts_summary
-                    ORDER BY tips_total DESC, avg_effect_pct DESC NULLS LAST;
-                    """
-                )
-            else:
-                accounts_table = _accounts_table(cur)
-                sql = f"""
-                    SELECT
-                      a.account_id,
-                      a.platform,
-                      a.handle,
-                      COUNT(t.tip_id) AS tips_total,
-                      CASE
-                        WHEN COUNT(t.tip_id) > 0
-                        THEN SUM(CASE WHEN v.effect_pct >= 50 THEN 1 ELSE 0 END)::FLOAT / COUNT(t.tip_id)
-                        ELSE NULL
-                      END AS win_rate_50p,
-                      CASE
-                        WHEN COUNT(t.tip_id) > 0
-                        THEN SUM(CASE WHEN v.rug_flag = 1 THEN 1 ELSE 0 END)::FLOAT / COUNT(t.tip_id)
-                        ELSE NULL
-                      END AS rug_rate,
-                      AVG(v.effect_pct) AS avg_effect_pct
-                    FROM {accounts_table} a
-                    LEFT JOIN tips t ON a.account_id = t.account_id
-                    LEFT JOIN v_tip_gain_loss v ON t.tip_id = v.tip_id
-                """
-                params = []
-                if chain:
-                    sql += " WHERE t.chain = %s"
-                    params.append(chain)
-                sql += " GROUP BY a.account_id, a.platform, a.handle"
-                sql += " ORDER BY tips_total DESC, avg_effect_pct DESC NULLS LAST;"
-                cur.execute(sql, tuple(params))
-            accs = cur.fetchall()
-            snap["accounts"] = [
-                {
-                    "account_id": r[0],
-                    "platform": r[1],
-                    "handle": r[2],
-                    "tips_total": int(r[3]) if r[3] else 0,
-                    "win_rate_50p": float(r[4]) if r[4] is not None else None,
-                    "rug_rate": float(r[5]) if r[5] is not None else None,
-                    "avg_effect_pct": float(r[6]) if r[6] is not None else None,
-                }
-                for r in accs
-            ]
-
-            # --- Recent tips (global) with their own bubbles and scoring ---
-            sql = """
-                SELECT
-                  tip_id, ca, chain, coin_name, account_id, platform, handle,
-                  post_ts, post_mcap_usd, peak_mcap_usd, trough_mcap_usd, rug_flag,
-                  gain_pct, drop_pct, effect_pct
-                FROM v_tip_gain_loss
-            """
-            params = []
-            if chain:
-                sql += " WHERE chain = %s"
-                params.append(chain)
-            sql += " ORDER BY post_ts DESC LIMIT %s;"
-            params.append(limit)
-            cur.execute(sql, tuple(params))
-            tips = cur.fetchall()
-            snap["tips_recent"] = []
-            tip_ids = [r[0] for r in tips]
-            clusters_by_tip: dict[int, list[dict]] = {}
-            others_by_tip: dict[int, list[dict]] = {}
-            scoring_by_tip: dict[int, int] = {}
-
-            if tip_ids:
-                cur.execute(
-                    """
-                    SELECT tip_id, cluster_rank, pct
-                    FROM tip_bubbles
-                    WHERE tip_id = ANY(%s)
-                    ORDER BY tip_id ASC, cluster_rank ASC;
-                    """,
-                    (tip_ids,),
-                )
-                for tip_id, rank, pct in cur.fetchall():
-                    clusters_by_tip.setdefault(tip_id, []).append(
-                        {"rank": rank, "pct": float(pct)}
-                    )
-
-                cur.execute(
-                    """
-                    SELECT tip_id, other_rank, pct
-                    FROM tip_bubbles_others
-                    WHERE tip_id = ANY(%s)
-                    ORDER BY tip_id ASC, other_rank ASC;
-                    """,
-                    (tip_ids,),
-                )
-                for tip_id, rank, pct in cur.fetchall():
-                    others_by_tip.setdefault(tip_id, []).append(
-                        {"rank": rank, "pct": float(pct)}
-                    )
-
-                cur.execute(
-                    """
-                    SELECT DISTINCT ON (tip_id) tip_id, intuition_score
-                    FROM tip_scoring
-                    WHERE tip_id = ANY(%s)
-                    ORDER BY tip_id ASC, scored_ts DESC;
-                    """,
-                    (tip_ids,),
-                )
-                for tip_id, score in cur.fetchall():
-                    scoring_by_tip[tip_id] = score
-
-            for r in tips:
-                tip_id = r[0]
-                clusters = clusters_by_tip.get(tip_id, [])
-                others = others_by_tip.get(tip_id, [])
-                intuition_score = scoring_by_tip.get(tip_id)
-
-                snap["tips_recent"].append({
-                    "tip_id": r[0],
-                    "ca": r[1],
-                    "chain": r[2],
-                    "coin_name": r[3],
-                    "account_id": r[4],
-                    "platform": r[5],
-                    "handle": r[6],
-                    "post_ts": r[7].isoformat() if r[7] else None,
-                    "post_mcap_usd": float(r[8]) if r[8] is not None else None,
-                    "peak_mcap_usd": float(r[9]) if r[9] is not None else None,
-                    "trough_mcap_usd": float(r[10]) if r[10] is not None else None,
-                    "rug_flag": r[11],
-                    "gain_pct": float(r[12]) if r[12] is not None else None,
-                    "drop_pct": float(r[13]) if r[13] is not None else None,
-                    "effect_pct": float(r[14]) if r[14] is not None else None,
-                    "bubbles": {"clusters": clusters, "others": others},
-                    "scoring": {"intuition_score": intuition_score},
-                })
-
-    return snap
+    if chain:
+        chain = chain.lower()
+    if ca:
+        ca = ca.lower()
+
+    version = data_version.current()
+    etag = data_version.etag(version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if since is not None:
+        if ca or chain:
+            raise HTTPException(status_code=422, detail="since is only supported for the global view")
+        async with _snapshot_slot(), pool.connection() as conn:
+            delta = await _delta_snapshot(conn, since)
+        return Response(content=_json_bytes(delta), media_type="application/json")
+
+    budget = None
+    if max_bytes is not None or max_tokens is not None:
+        if format != "json" or engine != "python":
+            raise HTTPException(
+                status_code=422, detail="max_bytes/max_tokens need format=json and engine=python"
+            )
+        limits = [max_bytes, max_tokens * BYTES_PER_TOKEN if max_tokens else None]
+        budget = min(b for b in limits if b is not None)
+
+    if format == "ndjson":
+        # errors, a busy 503 included, must be raised before the first byte goes out
+        lease = await _lease_slot()
+        try:
+            if ca and not chain:
+                async with pool.connection() as conn:
+                    async with conn.cursor() as cur:
+                        chain = await _resolve_chain(cur, ca)
+        except BaseException:
+            lease.release()
+            raise
+        # the stream releases the slot when it ends; the background task covers a
+        # client that disconnects before the body is ever started
+        return StreamingResponse(
+            _stream_snapshot(lease, ca, chain, limit),
+            media_type="application/x-ndjson",
+            headers=headers,
+            background=BackgroundTask(lease.release),
+        )
+
+    cache_key = (ca, chain, limit, engine, budget, version)
+    cached = _snapshot_cache.get(cache_key)
+    if cached is not None:
+        body, token = cached
+        headers["X-Snapshot-Token"] = token
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async with _snapshot_slot(), pool.connection() as conn:
+        if ca and not chain:
+            async with conn.cursor() as cur:
+                chain = await _resolve_chain(cur, ca)
+
+        if engine == "sql":
+            async with conn.cursor() as cur:
+                token = await _snapshot_token(cur)
+            body = (await _sql_snapshot(conn, ca, chain, limit)).encode("utf-8")
+        elif budget:
+            async with conn.cursor() as cur:
+                token = await _snapshot_token(cur)
+            body = await _budgeted_snapshot(conn, ca, chain, limit, budget)
+        else:
+            # ca -> coin_detail only; no ca -> global view
+            snap, token = await _pipelined_snapshot(conn, ca, chain, limit)
+            body = _json_bytes(snap)
+
+    _snapshot_cache.set(cache_key, (body, token))
+    headers["X-Snapshot-Token"] = token
+    return Response(content=body, media_type="application/json", headers=headers)
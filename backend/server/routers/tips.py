@@ -1,6 +1,9 @@
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query
+from ..cache import data_version
+from ..counts import entity_counts
 from ..db import pool
+from ..enrichment import EnrichmentLoader, parse_include
 from ..schemas.tips import (
     AccountCreate,
     AccountOut,
@@ -30,22 +33,22 @@ def _parse_cursor(cursor: str) -> tuple[datetime, int]:
     return ts, tip_id
 
 
-def _accounts_table(cur) -> str:
-    cur.execute(
+async def _accounts_table(cur) -> str:
+    await cur.execute(
         "SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'accounts';"
     )
-    return "accounts" if cur.fetchone() else "social_accounts"
+    return "accounts" if await cur.fetchone() else "social_accounts"
 
 
 # -------- Accounts --------
 @router.post("/accounts", response_model=AccountOut, dependencies=[Depends(require_admin)])
-def add_account(payload: AccountCreate):
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
-            accounts_table = _accounts_table(cur)
+async def add_account(payload: AccountCreate):
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            accounts_table = await _accounts_table(cur)
             try:
                 # UPSERT: Mevcut account varsa ID'sini döndür, yoksa yeni oluştur
-                cur.execute(
+                await cur.execute(
                     f"""
                     INSERT INTO {accounts_table} (platform, handle)
                     VALUES (%s, %s)
@@ -54,21 +57,22 @@ def add_account(payload: AccountCreate):
                     """,
                     (payload.platform, payload.handle),
                 )
-                row = cur.fetchone()
-                conn.commit()
+                row = await cur.fetchone()
+                await conn.commit()
+                data_version.bump()
             except Exception:
-                conn.rollback()
+                await conn.rollback()
                 raise
 
     return {"account_id": row[0], "platform": row[1], "handle": row[2], "created_ts": row[3]}
 
 
 @router.get("/accounts", response_model=list[AccountOut])
-def list_accounts(limit: int = Query(default=200, ge=1, le=1000)):
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
-            accounts_table = _accounts_table(cur)
-            cur.execute(
+async def list_accounts(limit: int = Query(default=200, ge=1, le=1000)):
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            accounts_table = await _accounts_table(cur)
+            await cur.execute(
                 f"""
                 SELECT account_id, platform, handle, created_ts
                 FROM {accounts_table}
@@ -77,27 +81,27 @@ def list_accounts(limit: int = Query(default=200, ge=1, le=1000)):
                 """,
                 (limit,),
             )
-            rows = cur.fetchall()
+            rows = await cur.fetchall()
 
     return [{"account_id": r[0], "platform": r[1], "handle": r[2], "created_ts": r[3]} for r in rows]
 
 
 # -------- Tips --------
 @router.post("/tips", response_model=dict, dependencies=[Depends(require_admin)])
-def add_tip(payload: TipCreate):
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+async def add_tip(payload: TipCreate):
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             ca = payload.ca.lower()
             chain = payload.chain.lower() if payload.chain else None
 
             # ensure coin exists
             if chain:
-                cur.execute("SELECT 1 FROM coins WHERE ca = %s AND chain = %s;", (ca, chain))
-                if cur.fetchone() is None:
+                await cur.execute("SELECT 1 FROM coins WHERE ca = %s AND chain = %s;", (ca, chain))
+                if await cur.fetchone() is None:
                     raise HTTPException(status_code=404, detail="Coin not found")
             else:
-                cur.execute("SELECT chain FROM coins WHERE ca = %s LIMIT 2;", (ca,))
-                rows = cur.fetchall()
+                await cur.execute("SELECT chain FROM coins WHERE ca = %s LIMIT 2;", (ca,))
+                rows = await cur.fetchall()
                 if not rows:
                     raise HTTPException(status_code=404, detail="Coin not found")
                 if len(rows) > 1:
@@ -105,12 +109,12 @@ def add_tip(payload: TipCreate):
                 chain = rows[0][0]
 
             # ensure account exists
-            accounts_table = _accounts_table(cur)
-            cur.execute(f"SELECT 1 FROM {accounts_table} WHERE account_id = %s;", (payload.account_id,))
-            if cur.fetchone() is None:
+            accounts_table = await _accounts_table(cur)
+            await cur.execute(f"SELECT 1 FROM {accounts_table} WHERE account_id = %s;", (payload.account_id,))
+            if await cur.fetchone() is None:
                 raise HTTPException(status_code=404, detail="Account not found")
 
-            cur.execute(
+            await cur.execute(
                 """
                 INSERT INTO tips (account_id, ca, chain, post_ts, post_mcap_usd)
                 VALUES (%s, %s, %s, %s, %s)
@@ -118,37 +122,39 @@ def add_tip(payload: TipCreate):
                 """,
                 (payload.account_id, ca, chain, payload.post_ts, payload.post_mcap_usd),
             )
-            row = cur.fetchone()
+            row = await cur.fetchone()
             tip_id = row[0]
             
             # Save tip-specific bubbles if provided
             if payload.bubbles:
                 for cluster in payload.bubbles.clusters:
-                    cur.execute(
+                    await cur.execute(
                         "INSERT INTO tip_bubbles (tip_id, cluster_rank, pct) VALUES (%s, %s, %s);",
                         (tip_id, cluster.rank, cluster.pct),
                     )
                 
                 for other in payload.bubbles.others:
-                    cur.execute(
+                    await cur.execute(
                         "INSERT INTO tip_bubbles_others (tip_id, other_rank, pct) VALUES (%s, %s, %s);",
                         (tip_id, other.rank, other.pct),
                     )
             
             # Save tip-specific scoring if provided
             if payload.scoring:
-                cur.execute(
+                await cur.execute(
                     "INSERT INTO tip_scoring (tip_id, intuition_score) VALUES (%s, %s);",
                     (tip_id, payload.scoring.intuition_score),
                 )
             
-            conn.commit()
+            await conn.commit()
+            
+            data_version.bump()
 
     return {"ok": True, "tip_id": tip_id, "chain": chain}
 
 
 @router.patch("/tips/{tip_id}", response_model=dict, dependencies=[Depends(require_admin)])
-def update_tip(tip_id: int, payload: TipUpdate):
+async def update_tip(tip_id: int, payload: TipUpdate):
     # allow nulls: if field is omitted, do not touch it
     fields = []
     values = []
@@ -170,10 +176,10 @@ def update_tip(tip_id: int, payload: TipUpdate):
     if not fields:
         raise HTTPException(status_code=422, detail="No fields to update")
 
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             values.append(tip_id)
-            cur.execute(
+            await cur.execute(
                 f"""
                 UPDATE tips
                 SET {", ".join(fields)}
@@ -182,27 +188,30 @@ def update_tip(tip_id: int, payload: TipUpdate):
                 """,
                 tuple(values),
             )
-            row = cur.fetchone()
+            row = await cur.fetchone()
             if row is None:
-                conn.rollback()
+                await conn.rollback()
                 raise HTTPException(status_code=404, detail="Tip not found")
-            conn.commit()
+            await conn.commit()
+            data_version.bump()
 
     return {"ok": True, "tip_id": row[0]}
 
 
 @router.get("/tips", response_model=list[TipOut])
-def list_tips(
+async def list_tips(
     limit: int = Query(default=200, ge=1, le=1000),
     ca: str | None = None,
     chain: str | None = None,
+    include: str | None = None,
 ):
+    include_set = parse_include(include)
     if ca:
         ca = ca.lower()
     if chain:
         chain = chain.lower()
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             params = []
             sql = """
                 SELECT
@@ -222,62 +231,15 @@ def list_tips(
                 sql += " WHERE " + " AND ".join(where)
             sql += " ORDER BY post_ts DESC LIMIT %s;"
             params.append(limit)
-            cur.execute(sql, tuple(params))
-            rows = cur.fetchall()
-
-            tip_ids = [r[0] for r in rows]
-            clusters_by_tip: dict[int, list[dict]] = {}
-            others_by_tip: dict[int, list[dict]] = {}
-            scoring_by_tip: dict[int, dict] = {}
-
-            if tip_ids:
-                cur.execute(
-                    """
-                    SELECT tip_id, cluster_rank, pct
-                    FROM tip_bubbles
-                    WHERE tip_id = ANY(%s)
-                    ORDER BY tip_id ASC, cluster_rank ASC;
-                    """,
-                    (tip_ids,),
-                )
-                for tip_id, rank, pct in cur.fetchall():
-                    clusters_by_tip.setdefault(tip_id, []).append(
-                        {"rank": rank, "pct": float(pct)}
-                    )
-
-                cur.execute(
-                    """
-                    SELECT tip_id, other_rank, pct
-                    FROM tip_bubbles_others
-                    WHERE tip_id = ANY(%s)
-                    ORDER BY tip_id ASC, other_rank ASC;
-                    """,
-                    (tip_ids,),
-                )
-                for tip_id, rank, pct in cur.fetchall():
-                    others_by_tip.setdefault(tip_id, []).append(
-                        {"rank": rank, "pct": float(pct)}
-                    )
+            await cur.execute(sql, tuple(params))
+            rows = await cur.fetchall()
 
-                cur.execute(
-                    """
-                    SELECT DISTINCT ON (tip_id) tip_id, intuition_score
-                    FROM tip_scoring
-                    WHERE tip_id = ANY(%s)
-                    ORDER BY tip_id ASC, scored_ts DESC;
-                    """,
-                    (tip_ids,),
-                )
-                for tip_id, score in cur.fetchall():
-                    scoring_by_tip[tip_id] = {"intuition_score": score}
+            extras_by_tip = await EnrichmentLoader(cur, include_set).load("tip", [r[0] for r in rows])
 
     out = []
     for r in rows:
         tip_id = r[0]
-        clusters = clusters_by_tip.get(tip_id, [])
-        others = others_by_tip.get(tip_id, [])
-        scoring = scoring_by_tip.get(tip_id)
-        bubbles = {"clusters": clusters, "others": others} if (clusters or others) else None
+        extras = extras_by_tip[tip_id]
 
         out.append(
             {
@@ -296,21 +258,24 @@ def list_tips(
                 "gain_pct": float(r[12]) if r[12] is not None else None,
                 "drop_pct": float(r[13]) if r[13] is not None else None,
                 "effect_pct": float(r[14]) if r[14] is not None else None,
-                "bubbles": bubbles,
-                "scoring": scoring,
+                "bubbles": extras.bubbles(),
+                "scoring": extras.scoring(),
             }
         )
     return out
 
 
 @router.get("/tips/paged", response_model=TipsPageOut)
-def list_tips_paged(
+async def list_tips_paged(
     limit: int = Query(default=100, ge=1, le=500),
     ca: str | None = None,
     chain: str | None = None,
     q: str | None = None,
     cursor: str | None = None,
+    include: str | None = None,
+    count: bool = False,
 ):
+    include_set = parse_include(include)
     if ca:
         ca = ca.lower()
     if chain:
@@ -324,8 +289,8 @@ def list_tips_paged(
     if q:
         q_like = f"%{q.strip()}%"
 
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             params = []
             where = []
             sql = """
@@ -334,7 +299,6 @@ def list_tips_paged(
                   v.post_ts, v.post_mcap_usd, v.peak_mcap_usd, v.trough_mcap_usd, v.rug_flag,
                   v.gain_pct, v.drop_pct, v.effect_pct
                 FROM v_tip_gain_loss v
-                LEFT JOIN coins c ON v.ca = c.ca AND v.chain = c.chain
             """
             if ca:
                 where.append("v.ca = %s")
@@ -346,91 +310,44 @@ def list_tips_paged(
                 where.append("(v.post_ts, v.tip_id) < (%s, %s)")
                 params.extend([cursor_ts, cursor_id])
             if q_like:
-                where.append(
-                    "(v.coin_name ILIKE %s OR v.handle ILIKE %s OR v.platform ILIKE %s "
-                    "OR v.ca ILIKE %s OR v.tip_id::text ILIKE %s OR c.symbol ILIKE %s)"
-                )
-                params.extend([q_like, q_like, q_like, q_like, q_like, q_like])
+                # search_text (coin name, symbol, handle, platform, ca, tip_id) is trigram-indexed
+                where.append("v.tip_id IN (SELECT tip_id FROM tips WHERE search_text ILIKE %s)")
+                params.append(q_like)
             if where:
                 sql += " WHERE " + " AND ".join(where)
             sql += " ORDER BY v.post_ts DESC, v.tip_id DESC LIMIT %s;"
             params.append(limit)
-            cur.execute(sql, tuple(params))
-            rows = cur.fetchall()
-
-            count_params = []
-            count_where = []
-            count_sql = "SELECT COUNT(*) FROM v_tip_gain_loss v LEFT JOIN coins c ON v.ca = c.ca AND v.chain = c.chain"
-            if ca:
-                count_where.append("v.ca = %s")
-                count_params.append(ca)
-            if chain:
-                count_where.append("v.chain = %s")
-                count_params.append(chain)
-            if q_like:
-                count_where.append(
-                    "(v.coin_name ILIKE %s OR v.handle ILIKE %s OR v.platform ILIKE %s "
-                    "OR v.ca ILIKE %s OR v.tip_id::text ILIKE %s OR c.symbol ILIKE %s)"
-                )
-                count_params.extend([q_like, q_like, q_like, q_like, q_like, q_like])
-            if count_where:
-                count_sql += " WHERE " + " AND ".join(count_where)
-            cur.execute(count_sql, tuple(count_params))
-            total_count = cur.fetchone()[0]
-
-            tip_ids = [r[0] for r in rows]
-            clusters_by_tip: dict[int, list[dict]] = {}
-            others_by_tip: dict[int, list[dict]] = {}
-            scoring_by_tip: dict[int, dict] = {}
-
-            if tip_ids:
-                cur.execute(
-                    """
-                    SELECT tip_id, cluster_rank, pct
-                    FROM tip_bubbles
-                    WHERE tip_id = ANY(%s)
-                    ORDER BY tip_id ASC, cluster_rank ASC;
-                    """,
-                    (tip_ids,),
-                )
-                for tip_id, rank, pct in cur.fetchall():
-                    clusters_by_tip.setdefault(tip_id, []).append(
-                        {"rank": rank, "pct": float(pct)}
-                    )
-
-                cur.execute(
-                    """
-                    SELECT tip_id, other_rank, pct
-                    FROM tip_bubbles_others
-                    WHERE tip_id = ANY(%s)
-                    ORDER BY tip_id ASC, other_rank ASC;
-                    """,
-                    (tip_ids,),
-                )
-                for tip_id, rank, pct in cur.fetchall():
-                    others_by_tip.setdefault(tip_id, []).append(
-                        {"rank": rank, "pct": float(pct)}
-                    )
-
-                cur.execute(
-                    """
-                    SELECT DISTINCT ON (tip_id) tip_id, intuition_score
-                    FROM tip_scoring
-                    WHERE tip_id = ANY(%s)
-                    ORDER BY tip_id ASC, scored_ts DESC;
-                    """,
-                    (tip_ids,),
-                )
-                for tip_id, score in cur.fetchall():
-                    scoring_by_tip[tip_id] = {"intuition_score": score}
+            await cur.execute(sql, tuple(params))
+            rows = await cur.fetchall()
+
+            # Counts come with the first page (or on request). Without a search
+            # term they are read from the trigger-maintained counters.
+            total_count = None
+            if cursor is None or count:
+                if not q_like:
+                    total_count, _ = await entity_counts(cur, "tip", ca, chain)
+                else:
+                    count_params = []
+                    count_where = []
+                    count_sql = "SELECT COUNT(*) FROM tips t"
+                    if ca:
+                        count_where.append("t.ca = %s")
+                        count_params.append(ca)
+                    if chain:
+                        count_where.append("t.chain = %s")
+                        count_params.append(chain)
+                    count_where.append("t.search_text ILIKE %s")
+                    count_params.append(q_like)
+                    count_sql += " WHERE " + " AND ".join(count_where)
+                    await cur.execute(count_sql, tuple(count_params))
+                    total_count = (await cur.fetchone())[0]
+
+            extras_by_tip = await EnrichmentLoader(cur, include_set).load("tip", [r[0] for r in rows])
 
     items = []
     for r in rows:
         tip_id = r[0]
-        clusters = clusters_by_tip.get(tip_id, [])
-        others = others_by_tip.get(tip_id, [])
-        scoring = scoring_by_tip.get(tip_id)
-        bubbles = {"clusters": clusters, "others": others} if (clusters or others) else None
+        extras = extras_by_tip[tip_id]
 
         items.append(
             {
@@ -449,8 +366,8 @@ def list_tips_paged(
                 "gain_pct": float(r[12]) if r[12] is not None else None,
                 "drop_pct": float(r[13]) if r[13] is not None else None,
                 "effect_pct": float(r[14]) if r[14] is not None else None,
-                "bubbles": bubbles,
-                "scoring": scoring,
+                "bubbles": extras.bubbles(),
+                "scoring": extras.scoring(),
             }
         )
 
@@ -464,24 +381,26 @@ def list_tips_paged(
 
 
 @router.delete("/tips/{tip_id}", dependencies=[Depends(require_admin)])
-def delete_tip(tip_id: int):
+async def delete_tip(tip_id: int):
     """Delete a single tip and its associated bubbles/scoring (does NOT affect the coin)."""
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT 1 FROM tips WHERE tip_id = %s;", (tip_id,))
-            if cur.fetchone() is None:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT 1 FROM tips WHERE tip_id = %s;", (tip_id,))
+            if await cur.fetchone() is None:
                 raise HTTPException(status_code=404, detail="Tip not found")
             
             # Delete tip-specific bubbles (cascade will handle this via FK, but explicit for clarity)
-            cur.execute("DELETE FROM tip_bubbles WHERE tip_id = %s;", (tip_id,))
-            cur.execute("DELETE FROM tip_bubbles_others WHERE tip_id = %s;", (tip_id,))
+            await cur.execute("DELETE FROM tip_bubbles WHERE tip_id = %s;", (tip_id,))
+            await cur.execute("DELETE FROM tip_bubbles_others WHERE tip_id = %s;", (tip_id,))
             
             # Delete tip-specific scoring
-            cur.execute("DELETE FROM tip_scoring WHERE tip_id = %s;", (tip_id,))
+            await cur.execute("DELETE FROM tip_scoring WHERE tip_id = %s;", (tip_id,))
             
             # Delete the tip
-            cur.execute("DELETE FROM tips WHERE tip_id = %s;", (tip_id,))
+            await cur.execute("DELETE FROM tips WHERE tip_id = %s;", (tip_id,))
+            
+            await conn.commit()
             
-            conn.commit()
+            data_version.bump()
     
     return {"ok": True, "message": f"Tip {tip_id} and all associated data deleted"}
@@ -1,7 +1,11 @@
 from datetime import datetime
 import uuid
 from fastapi import APIRouter, Depends, HTTPException, Query
+from .. import market
+from ..cache import data_version
+from ..counts import entity_counts
 from ..db import pool
+from ..enrichment import EnrichmentLoader, parse_include
 from ..schemas.trades import (
     TradeOpen,
     TradeClose,
@@ -31,31 +35,31 @@ def _parse_cursor(cursor: str) -> tuple[datetime, int]:
 
 
 @router.post("/open", dependencies=[Depends(require_admin)])
-def open_trade(payload: TradeOpen):
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+async def open_trade(payload: TradeOpen):
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             ca = payload.ca.lower()
             chain = payload.chain.lower() if payload.chain else None
             trade_id_str = f"trade_{uuid.uuid4().hex[:8]}"
 
             # coin name for response clarity
             if chain:
-                cur.execute("SELECT name, chain FROM coins WHERE ca = %s AND chain = %s;", (ca, chain))
-                coin_row = cur.fetchone()
+                await cur.execute("SELECT name, chain FROM coins WHERE ca = %s AND chain = %s;", (ca, chain))
+                coin_row = await cur.fetchone()
                 if coin_row is None:
                     raise HTTPException(status_code=404, detail="Coin not found")
                 coin_name = coin_row[0]
                 chain = coin_row[1]
             else:
-                cur.execute("SELECT name, chain FROM coins WHERE ca = %s LIMIT 2;", (ca,))
-                rows = cur.fetchall()
+                await cur.execute("SELECT name, chain FROM coins WHERE ca = %s LIMIT 2;", (ca,))
+                rows = await cur.fetchall()
                 if not rows:
                     raise HTTPException(status_code=404, detail="Coin not found")
                 if len(rows) > 1:
                     raise HTTPException(status_code=409, detail="Multiple chains found for this CA")
                 coin_name, chain = rows[0]
 
-            cur.execute(
+            await cur.execute(
                 """
                 INSERT INTO trades (ca, chain, entry_mcap_usd, size_usd, trade_id)
                 VALUES (%s, %s, %s, %s, %s)
@@ -63,7 +67,7 @@ def open_trade(payload: TradeOpen):
                 """,
                 (ca, chain, payload.entry_mcap_usd, payload.size_usd, trade_id_str),
             )
-            row = cur.fetchone()
+            row = await cur.fetchone()
             # row[0] -> integer ID (Primary Key)
             # row[1] -> string Trade ID ("trade_xyz...")
             trade_id_str = row[1] 
@@ -73,25 +77,27 @@ def open_trade(payload: TradeOpen):
             # Save trade-specific bubbles if provided
             if payload.bubbles:
                 for cluster in payload.bubbles.clusters:
-                    cur.execute(
+                    await cur.execute(
                         "INSERT INTO trade_bubbles (trade_id, cluster_rank, pct) VALUES (%s, %s, %s);",
                         (trade_id_str, cluster.rank, cluster.pct), # <-- trade_id_str kullanıldı
                     )
                 
                 for other in payload.bubbles.others:
-                    cur.execute(
+                    await cur.execute(
                         "INSERT INTO trade_bubbles_others (trade_id, other_rank, pct) VALUES (%s, %s, %s);",
                         (trade_id_str, other.rank, other.pct), # <-- trade_id_str kullanıldı
                     )
             
             # Save trade-specific scoring if provided
             if payload.scoring:
-                cur.execute(
+                await cur.execute(
                     "INSERT INTO trade_scoring (trade_id, intuition_score) VALUES (%s, %s);",
                     (trade_id_str, payload.scoring.intuition_score), # <-- trade_id_str kullanıldı
                 )
             
-            conn.commit()
+            await conn.commit()
+            
+            data_version.bump()
 
     return {
         "ok": True,
@@ -105,15 +111,15 @@ def open_trade(payload: TradeOpen):
 
 
 @router.post("/{trade_id}/close", dependencies=[Depends(require_admin)])
-def close_trade(trade_id: str, payload: TradeClose):
+async def close_trade(trade_id: str, payload: TradeClose):
     """Close a trade by its trade_id (string format like 'trade_8cd09a1a')."""
     if payload.trade_id and payload.trade_id != trade_id:
         raise HTTPException(status_code=422, detail="Trade ID mismatch")
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             # Close only if still open
             # Burada WHERE koşulunda zaten trade_id (string) kullanıyorsun, bu doğruydu.
-            cur.execute(
+            await cur.execute(
                 """
                 UPDATE trades
                 SET exit_ts = now(),
@@ -125,28 +131,31 @@ def close_trade(trade_id: str, payload: TradeClose):
                 """,
                 (payload.exit_mcap_usd, payload.exit_reason, trade_id),
             )
-            row = cur.fetchone()
+            row = await cur.fetchone()
             if row is None:
-                conn.rollback()
+                await conn.rollback()
                 raise HTTPException(status_code=404, detail="Open trade not found")
-            conn.commit()
+            await conn.commit()
+            data_version.bump()
 
     return {"ok": True, "id": row[0], "trade_id": row[1], "exit_ts": row[2]}
 
 
 @router.get("", response_model=list[TradeOut])
-def list_trades(
+async def list_trades(
     limit: int = Query(default=100, ge=1, le=1000),
     ca: str | None = None,
     chain: str | None = None,
     only_open: bool = False,
+    include: str | None = None,
 ):
+    include_set = parse_include(include)
     if ca:
         ca = ca.lower()
     if chain:
         chain = chain.lower()
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             where = []
             params = []
             if ca:
@@ -170,62 +179,15 @@ def list_trades(
                 sql += " WHERE " + " AND ".join(where)
             sql += " ORDER BY entry_ts DESC LIMIT %s;"
             params.append(limit)
-            cur.execute(sql, tuple(params))
-            rows = cur.fetchall()
-
-            trade_ids = [r[1] for r in rows]
-            clusters_by_trade: dict[str, list[dict]] = {}
-            others_by_trade: dict[str, list[dict]] = {}
-            scoring_by_trade: dict[str, dict] = {}
+            await cur.execute(sql, tuple(params))
+            rows = await cur.fetchall()
 
-            if trade_ids:
-                cur.execute(
-                    """
-                    SELECT trade_id, cluster_rank, pct
-                    FROM trade_bubbles
-                    WHERE trade_id = ANY(%s)
-                    ORDER BY trade_id ASC, cluster_rank ASC;
-                    """,
-                    (trade_ids,),
-                )
-                for trade_id, rank, pct in cur.fetchall():
-                    clusters_by_trade.setdefault(trade_id, []).append(
-                        {"rank": rank, "pct": float(pct)}
-                    )
-
-                cur.execute(
-                    """
-                    SELECT trade_id, other_rank, pct
-                    FROM trade_bubbles_others
-                    WHERE trade_id = ANY(%s)
-                    ORDER BY trade_id ASC, other_rank ASC;
-                    """,
-                    (trade_ids,),
-                )
-                for trade_id, rank, pct in cur.fetchall():
-                    others_by_trade.setdefault(trade_id, []).append(
-                        {"rank": rank, "pct": float(pct)}
-                    )
-
-                cur.execute(
-                    """
-                    SELECT DISTINCT ON (trade_id) trade_id, intuition_score
-                    FROM trade_scoring
-                    WHERE trade_id = ANY(%s)
-                    ORDER BY trade_id ASC, scored_ts DESC;
-                    """,
-                    (trade_ids,),
-                )
-                for trade_id, score in cur.fetchall():
-                    scoring_by_trade[trade_id] = {"intuition_score": score}
+            extras_by_trade = await EnrichmentLoader(cur, include_set).load("trade", [r[1] for r in rows])
 
             trades_list = []
             for r in rows:
                 trade_id_str = r[1]
-                clusters = clusters_by_trade.get(trade_id_str, [])
-                others = others_by_trade.get(trade_id_str, [])
-                scoring = scoring_by_trade.get(trade_id_str)
-                bubbles = {"clusters": clusters, "others": others} if (clusters or others) else None
+                extras = extras_by_trade[trade_id_str]
 
                 trades_list.append(
                     {
@@ -242,8 +204,9 @@ def list_trades(
                         "exit_reason": r[10],
                         "pnl_pct": float(r[11]) if r[11] is not None else None,
                         "pnl_usd": float(r[12]) if r[12] is not None else None,
-                        "bubbles": bubbles,
-                        "scoring": scoring,
+                        "bubbles": extras.bubbles(),
+                        "scoring": extras.scoring(),
+                        **(market.unrealized(r[3], r[2], float(r[6]), r[7]) if r[8] is None else {}),
                     }
                 )
 
@@ -251,14 +214,17 @@ def list_trades(
 
 
 @router.get("/paged", response_model=TradesPageOut)
-def list_trades_paged(
+async def list_trades_paged(
     limit: int = Query(default=100, ge=1, le=500),
     ca: str | None = None,
     chain: str | None = None,
     scope: str = "all",
     q: str | None = None,
     cursor: str | None = None,
+    include: str | None = None,
+    count: bool = False,
 ):
+    include_set = parse_include(include)
     if ca:
         ca = ca.lower()
     if chain:
@@ -272,8 +238,8 @@ def list_trades_paged(
     if q:
         q_like = f"%{q.strip()}%"
 
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             where = []
             params = []
             if ca:
@@ -292,10 +258,9 @@ def list_trades_paged(
                 where.append("(v.entry_ts, v.id) < (%s, %s)")
                 params.extend([cursor_ts, cursor_id])
             if q_like:
-                where.append(
-                    "(v.coin_name ILIKE %s OR v.ca ILIKE %s OR v.trade_id::text ILIKE %s OR c.symbol ILIKE %s)"
-                )
-                params.extend([q_like, q_like, q_like, q_like])
+                # search_text (coin name, symbol, ca, trade_id) is trigram-indexed
+                where.append("v.id IN (SELECT id FROM trades WHERE search_text ILIKE %s)")
+                params.append(q_like)
 
             sql = """
                 SELECT
@@ -304,94 +269,49 @@ def list_trades_paged(
                   v.exit_ts, v.exit_mcap_usd, v.exit_reason,
                   v.pnl_pct, v.pnl_usd
                 FROM v_trades_pnl v
-                LEFT JOIN coins c ON v.ca = c.ca AND v.chain = c.chain
             """
             if where:
                 sql += " WHERE " + " AND ".join(where)
             sql += " ORDER BY v.entry_ts DESC, v.id DESC LIMIT %s;"
             params.append(limit)
-            cur.execute(sql, tuple(params))
-            rows = cur.fetchall()
-
-            count_params = []
-            count_where = []
-            count_sql = """
-                SELECT
-                  COUNT(*) AS total_count,
-                  COUNT(*) FILTER (WHERE t.exit_ts IS NULL) AS open_count,
-                  COUNT(*) FILTER (WHERE t.exit_ts IS NOT NULL) AS closed_count
-                FROM trades t
-                JOIN coins c ON t.ca = c.ca AND t.chain = c.chain
-            """
-            if ca:
-                count_where.append("t.ca = %s")
-                count_params.append(ca)
-            if chain:
-                count_where.append("t.chain = %s")
-                count_params.append(chain)
-            if q_like:
-                count_where.append(
-                    "(c.name ILIKE %s OR t.ca ILIKE %s OR t.trade_id::text ILIKE %s OR c.symbol ILIKE %s)"
-                )
-                count_params.extend([q_like, q_like, q_like, q_like])
-            if count_where:
-                count_sql += " WHERE " + " AND ".join(count_where)
-            cur.execute(count_sql, tuple(count_params))
-            total_count, open_count, closed_count = cur.fetchone()
-
-            trade_ids = [r[1] for r in rows]
-            clusters_by_trade: dict[str, list[dict]] = {}
-            others_by_trade: dict[str, list[dict]] = {}
-            scoring_by_trade: dict[str, dict] = {}
-
-            if trade_ids:
-                cur.execute(
+            await cur.execute(sql, tuple(params))
+            rows = await cur.fetchall()
+
+            # Counts come with the first page (or on request). Without a search
+            # term they are read from the trigger-maintained counters.
+            total_count = open_count = closed_count = None
+            if cursor is None or count:
+                if not q_like:
+                    total_count, open_count = await entity_counts(cur, "trade", ca, chain)
+                    closed_count = total_count - open_count
+                else:
+                    count_params = []
+                    count_where = []
+                    count_sql = """
+                        SELECT
+                          COUNT(*) AS total_count,
+                          COUNT(*) FILTER (WHERE t.exit_ts IS NULL) AS open_count,
+                          COUNT(*) FILTER (WHERE t.exit_ts IS NOT NULL) AS closed_count
+                        FROM trades t
                     """
-                    SELECT trade_id, cluster_rank, pct
-                    FROM trade_bubbles
-                    WHERE trade_id = ANY(%s)
-                    ORDER BY trade_id ASC, cluster_rank ASC;
-                    """,
-                    (trade_ids,),
-                )
-                for trade_id, rank, pct in cur.fetchall():
-                    clusters_by_trade.setdefault(trade_id, []).append(
-                        {"rank": rank, "pct": float(pct)}
-                    )
-
-                cur.execute(
-                    """
-                    SELECT trade_id, other_rank, pct
-                    FROM trade_bubbles_others
-                    WHERE trade_id = ANY(%s)
-                    ORDER BY trade_id ASC, other_rank ASC;
-                    """,
-                    (trade_ids,),
-                )
-                for trade_id, rank, pct in cur.fetchall():
-                    others_by_trade.setdefault(trade_id, []).append(
-                        {"rank": rank, "pct": float(pct)}
-                    )
-
-                cur.execute(
-                    """
-                    SELECT DISTINCT ON (trade_id) trade_id, intuition_score
-                    FROM trade_scoring
-                    WHERE trade_id = ANY(%s)
-                    ORDER BY trade_id ASC, scored_ts DESC;
-                    """,
-                    (trade_ids,),
-                )
-                for trade_id, score in cur.fetchall():
-                    scoring_by_trade[trade_id] = {"intuition_score": score}
+                    if ca:
+                        count_where.append("t.ca = %s")
+                        count_params.append(ca)
+                    if chain:
+                        count_where.append("t.chain = %s")
+                        count_params.append(chain)
+                    count_where.append("t.search_text ILIKE %s")
+                    count_params.append(q_like)
+                    count_sql += " WHERE " + " AND ".join(count_where)
+                    await cur.execute(count_sql, tuple(count_params))
+                    total_count, open_count, closed_count = await cur.fetchone()
+
+            extras_by_trade = await EnrichmentLoader(cur, include_set).load("trade", [r[1] for r in rows])
 
     items = []
     for r in rows:
         trade_id_str = r[1]
-        clusters = clusters_by_trade.get(trade_id_str, [])
-        others = others_by_trade.get(trade_id_str, [])
-        scoring = scoring_by_trade.get(trade_id_str)
-        bubbles = {"clusters": clusters, "others": others} if (clusters or others) else None
+        extras = extras_by_trade[trade_id_str]
 
         items.append(
             {
@@ -408,8 +328,9 @@ def list_trades_paged(
                 "exit_reason": r[10],
                 "pnl_pct": float(r[11]) if r[11] is not None else None,
                 "pnl_usd": float(r[12]) if r[12] is not None else None,
-                "bubbles": bubbles,
-                "scoring": scoring,
+                "bubbles": extras.bubbles(),
+                "scoring": extras.scoring(),
+                **(market.unrealized(r[3], r[2], float(r[6]), r[7]) if r[8] is None else {}),
             }
         )
 
@@ -429,31 +350,33 @@ def list_trades_paged(
 
 
 @router.delete("/{trade_id}", dependencies=[Depends(require_admin)])
-def delete_trade(trade_id: str):
+async def delete_trade(trade_id: str):
     """Delete a single trade and its associated bubbles/scoring (does NOT affect the coin)."""
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             # String ID ile kontrol ediyoruz
-            cur.execute("SELECT id FROM trades WHERE trade_id = %s;", (trade_id,))
-            trade_row = cur.fetchone()
+            await cur.execute("SELECT id FROM trades WHERE trade_id = %s;", (trade_id,))
+            trade_row = await cur.fetchone()
             if trade_row is None:
                 raise HTTPException(status_code=404, detail="Trade not found")
             
             # Yan tabloları temizle (String ID kullanarak)
-            cur.execute("DELETE FROM trade_bubbles WHERE trade_id = %s;", (trade_id,))
-            cur.execute("DELETE FROM trade_bubbles_others WHERE trade_id = %s;", (trade_id,))
-            cur.execute("DELETE FROM trade_scoring WHERE trade_id = %s;", (trade_id,))
+            await cur.execute("DELETE FROM trade_bubbles WHERE trade_id = %s;", (trade_id,))
+            await cur.execute("DELETE FROM trade_bubbles_others WHERE trade_id = %s;", (trade_id,))
+            await cur.execute("DELETE FROM trade_scoring WHERE trade_id = %s;", (trade_id,))
             
             # Ana tabloyu temizle (String ID kullanarak)
-            cur.execute("DELETE FROM trades WHERE trade_id = %s;", (trade_id,))
+            await cur.execute("DELETE FROM trades WHERE trade_id = %s;", (trade_id,))
+            
+            await conn.commit()
             
-            conn.commit()
+            data_version.bump()
     
     return {"ok": True, "message": f"Trade {trade_id} and all associated data deleted"}
 
 # routes_trades.py dosyasının sonuna eklendi
 @router.patch("/{trade_id}", dependencies=[Depends(require_admin)])
-def update_trade(trade_id: str, payload: TradeUpdate):
+async def update_trade(trade_id: str, payload: TradeUpdate):
     fields = []
     values = []
 
@@ -476,16 +399,17 @@ def update_trade(trade_id: str, payload: TradeUpdate):
     if not fields:
         raise HTTPException(status_code=422, detail="No fields to update")
 
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
             values.append(trade_id)
-            cur.execute(
+            await cur.execute(
                 f"UPDATE trades SET {', '.join(fields)} WHERE trade_id = %s RETURNING trade_id;",
                 tuple(values),
             )
-            row = cur.fetchone()
+            row = await cur.fetchone()
             if row is None:
-                conn.rollback()
+                await conn.rollback()
                 raise HTTPException(status_code=404, detail="Trade not found")
-            conn.commit()
+            await conn.commit()
+            data_version.bump()
     return {"ok": True}
@@ -5,6 +5,7 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
 
+from ..cache import data_version
 from ..db import pool
 from ..auth import require_admin
 
@@ -65,14 +66,14 @@ def _merge_source_type(old: str | None, add: str) -> str:
     return "both"
 
 
-def _accounts_table(cur) -> str:
-    cur.execute(
+async def _accounts_table(cur) -> str:
+    await cur.execute(
         "SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'accounts';"
     )
-    return "accounts" if cur.fetchone() else "social_accounts"
+    return "accounts" if await cur.fetchone() else "social_accounts"
 
 
-def _upsert_coin(
+async def _upsert_coin(
     cur,
     ca: str,
     name: Optional[str],
@@ -88,8 +89,8 @@ def _upsert_coin(
     if chain_norm in ("", "unknown"):
         chain_norm = "solana"
 
-    cur.execute("SELECT source_type, chain FROM coins WHERE ca = %s AND chain = %s;", (ca_l, chain_norm))
-    row = cur.fetchone()
+    await cur.execute("SELECT source_type, chain FROM coins WHERE ca = %s AND chain = %s;", (ca_l, chain_norm))
+    row = await cur.fetchone()
 
     if row:
         old_source, old_chain = row
@@ -113,12 +114,12 @@ def _upsert_coin(
         if updates:
             sql = f"UPDATE coins SET {', '.join(updates)} WHERE ca = %s AND chain = %s RETURNING ca, name, symbol, launch_ts, chain, source_type;"
             params.extend([ca_l, chain_norm])
-            cur.execute(sql, tuple(params))
-            return cur.fetchone()
+            await cur.execute(sql, tuple(params))
+            return await cur.fetchone()
         return (ca_l, name, symbol, launch_ts, old_chain, old_source)
     else:
         # insert
-        cur.execute(
+        await cur.execute(
             """
             INSERT INTO coins (ca, name, symbol, launch_ts, chain, source_type)
             VALUES (%s, %s, %s, %s, %s, %s)
@@ -126,33 +127,33 @@ def _upsert_coin(
             """,
             (ca_l, name or "Unknown", symbol, launch_ts, chain_norm, add_source),
         )
-        return cur.fetchone()
+        return await cur.fetchone()
 
 
-def _set_trade_bubbles(cur, trade_id: str, bubbles: WizardBubbles):
+async def _set_trade_bubbles(cur, trade_id: str, bubbles: WizardBubbles):
     """Set bubbles for a specific trade (trade-based, not coin-based)"""
     # delete old
-    cur.execute("DELETE FROM trade_bubbles WHERE trade_id = %s;", (trade_id,))
-    cur.execute("DELETE FROM trade_bubbles_others WHERE trade_id = %s;", (trade_id,))
+    await cur.execute("DELETE FROM trade_bubbles WHERE trade_id = %s;", (trade_id,))
+    await cur.execute("DELETE FROM trade_bubbles_others WHERE trade_id = %s;", (trade_id,))
 
     # insert new
     for row in bubbles.clusters:
-        cur.execute(
+        await cur.execute(
             "INSERT INTO trade_bubbles (trade_id, cluster_rank, pct) VALUES (%s, %s, %s);",
             (trade_id, row.rank, row.pct),
         )
     for row in bubbles.others:
-        cur.execute(
+        await cur.execute(
             "INSERT INTO trade_bubbles_others (trade_id, other_rank, pct) VALUES (%s, %s, %s);",
             (trade_id, row.rank, row.pct),
         )
 
 
-def _insert_trade_score(cur, trade_id: str, intuition_score: Optional[int]):
+async def _insert_trade_score(cur, trade_id: str, intuition_score: Optional[int]):
     """Insert scoring for a specific trade (trade-based, not coin-based)"""
     if intuition_score is None:
         return None
-    cur.execute(
+    await cur.execute(
         """
         INSERT INTO trade_scoring (trade_id, intuition_score)
         VALUES (%s, %s)
@@ -160,33 +161,33 @@ def _insert_trade_score(cur, trade_id: str, intuition_score: Optional[int]):
         """,
         (trade_id, intuition_score),
     )
-    return cur.fetchone()
+    return await cur.fetchone()
 
 
-def _set_tip_bubbles(cur, tip_id: int, bubbles: WizardBubbles):
+async def _set_tip_bubbles(cur, tip_id: int, bubbles: WizardBubbles):
     """Set bubbles for a specific tip (tip-based, not coin-based)"""
     # delete old
-    cur.execute("DELETE FROM tip_bubbles WHERE tip_id = %s;", (tip_id,))
-    cur.execute("DELETE FROM tip_bubbles_others WHERE tip_id = %s;", (tip_id,))
+    await cur.execute("DELETE FROM tip_bubbles WHERE tip_id = %s;", (tip_id,))
+    await cur.execute("DELETE FROM tip_bubbles_others WHERE tip_id = %s;", (tip_id,))
 
     # insert new
     for row in bubbles.clusters:
-        cur.execute(
+        await cur.execute(
             "INSERT INTO tip_bubbles (tip_id, cluster_rank, pct) VALUES (%s, %s, %s);",
             (tip_id, row.rank, row.pct),
         )
     for row in bubbles.others:
-        cur.execute(
+        await cur.execute(
             "INSERT INTO tip_bubbles_others (tip_id, other_rank, pct) VALUES (%s, %s, %s);",
             (tip_id, row.rank, row.pct),
         )
 
 
-def _insert_tip_score(cur, tip_id: int, intuition_score: Optional[int]):
+async def _insert_tip_score(cur, tip_id: int, intuition_score: Optional[int]):
     """Insert scoring for a specific tip (tip-based, not coin-based)"""
     if intuition_score is None:
         return None
-    cur.execute(
+    await cur.execute(
         """
         INSERT INTO tip_scoring (tip_id, intuition_score)
         VALUES (%s, %s)
@@ -194,17 +195,17 @@ def _insert_tip_score(cur, tip_id: int, intuition_score: Optional[int]):
         """,
         (tip_id, intuition_score),
     )
-    return cur.fetchone()
+    return await cur.fetchone()
 
 
 @router.post("/dex_add", dependencies=[Depends(require_admin)])
-def dex_add(payload: DexAdd):
+async def dex_add(payload: DexAdd):
     ca = payload.ca.lower()
     trade_id_str = f"trade_{uuid.uuid4().hex[:8]}" # Generate trade_id
 
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
-            coin = _upsert_coin(
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            coin = await _upsert_coin(
                 cur,
                 ca,
                 payload.name,
@@ -214,7 +215,7 @@ def dex_add(payload: DexAdd):
                 "dex",
             )
 
-            cur.execute(
+            await cur.execute(
                 """
                 INSERT INTO trades (ca, chain, entry_mcap_usd, size_usd, trade_id)
                 VALUES (%s, %s, %s, %s, %s)
@@ -222,15 +223,16 @@ def dex_add(payload: DexAdd):
                 """,
                 (ca, coin[4], payload.entry_mcap_usd, payload.size_usd, trade_id_str),
             )
-            trade = cur.fetchone()
+            trade = await cur.fetchone()
             trade_id_int = trade[0]  # Get the database ID (INTEGER)
             trade_id_str = trade[1]  # Get the STRING trade_id
 
             # Set bubbles and scoring for THIS TRADE (not coin)
             # Use STRING trade_id, not INTEGER id!
-            _set_trade_bubbles(cur, trade_id_str, payload.bubbles)
-            score = _insert_trade_score(cur, trade_id_str, payload.intuition_score)
-            conn.commit()
+            await _set_trade_bubbles(cur, trade_id_str, payload.bubbles)
+            score = await _insert_trade_score(cur, trade_id_str, payload.intuition_score)
+            await conn.commit()
+            data_version.bump()
 
     return {
         "ok": True,
@@ -252,12 +254,12 @@ def dex_add(payload: DexAdd):
 
 
 @router.post("/influencer_add", dependencies=[Depends(require_admin)])
-def influencer_add(payload: InfluencerAdd):
+async def influencer_add(payload: InfluencerAdd):
     ca = payload.ca.lower()
     
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
-            coin = _upsert_coin(
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            coin = await _upsert_coin(
                 cur,
                 ca,
                 payload.name,
@@ -267,8 +269,8 @@ def influencer_add(payload: InfluencerAdd):
                 "influencer",
             )
 
-            accounts_table = _accounts_table(cur)
-            cur.execute(
+            accounts_table = await _accounts_table(cur)
+            await cur.execute(
                 f"""
                 INSERT INTO {accounts_table} (platform, handle)
                 VALUES (%s, %s)
@@ -277,9 +279,9 @@ def influencer_add(payload: InfluencerAdd):
                 """,
                 (payload.platform, payload.handle),
             )
-            acc_id = cur.fetchone()[0]
+            acc_id = (await cur.fetchone())[0]
 
-            cur.execute(
+            await cur.execute(
                 """
                 INSERT INTO tips (account_id, ca, chain, post_ts, post_mcap_usd)
                 VALUES (%s, %s, %s, %s, %s)
@@ -287,13 +289,14 @@ def influencer_add(payload: InfluencerAdd):
                 """,
                 (acc_id, ca, coin[4], payload.post_ts, payload.post_mcap_usd),
             )
-            tip_id = cur.fetchone()[0]  # Get the INTEGER id
+            tip_id = (await cur.fetchone())[0]  # Get the INTEGER id
 
             # Set bubbles and scoring for THIS TIP (not coin)
             # For tips, we need to check the schema - use INTEGER id if tip_id is INTEGER
-            _set_tip_bubbles(cur, tip_id, payload.bubbles)
-            score = _insert_tip_score(cur, tip_id, payload.intuition_score)
-            conn.commit()
+            await _set_tip_bubbles(cur, tip_id, payload.bubbles)
+            score = await _insert_tip_score(cur, tip_id, payload.intuition_score)
+            await conn.commit()
+            data_version.bump()
 
     return {
         "ok": True,
@@ -69,5 +69,5 @@ class TipOut(BaseModel):
 
 class TipsPageOut(BaseModel):
     items: List[TipOut]
-    total_count: int
+    total_count: Optional[int] = None
     next_cursor: Optional[str] = None
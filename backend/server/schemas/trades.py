@@ -49,6 +49,12 @@ class TradeOut(BaseModel):
 
     pnl_pct: Optional[float] = None
     pnl_usd: Optional[float] = None
+
+    # Open trades only: from the background market-cap poller, None without a recent quote
+    current_mcap_usd: Optional[float] = None
+    current_mcap_ts: Optional[datetime] = None
+    unrealized_pnl_pct: Optional[float] = None
+    unrealized_pnl_usd: Optional[float] = None
     
     # Trade-specific bubbles and scoring
     bubbles: Optional[BubblesData] = None
@@ -64,7 +70,7 @@ class TradeUpdate(BaseModel):
 
 class TradesPageOut(BaseModel):
     items: List[TradeOut]
-    total_count: int
-    open_count: int
-    closed_count: int
+    total_count: Optional[int] = None
+    open_count: Optional[int] = None
+    closed_count: Optional[int] = None
     next_cursor: Optional[str] = None
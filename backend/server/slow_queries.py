@@ -0,0 +1,184 @@
+"""Opt-in slow query log.
+
+A statement on a pooled connection that runs for SLOW_QUERY_MS or longer is
+recorded in a ring buffer with its SQL, the shapes of its parameters (types and
+sizes, never values) and the request it ran for. With SLOW_QUERY_EXPLAIN the
+plan is captured afterwards, off the request path, on a dedicated connection
+that never takes a pool slot. Read-only statements get
+EXPLAIN (ANALYZE, BUFFERS); anything that writes, or could have side effects
+that outlive a rollback, only gets a plain EXPLAIN. Every EXPLAIN runs in a
+transaction that is rolled back, under its own statement_timeout.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import re
+from collections import deque
+from datetime import datetime, timezone
+from time import monotonic
+from typing import Any
+
+import psycopg
+
+logger = logging.getLogger("app")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))  # 0 disables the log
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "0") != "0"
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "5000"))
+# the same statement text is explained at most once per this many seconds
+SLOW_QUERY_EXPLAIN_COOLDOWN_SEC = float(os.getenv("SLOW_QUERY_EXPLAIN_COOLDOWN_SEC", "300"))
+SQL_MAX_CHARS = 4000
+
+_EXPLAINABLE_RE = re.compile(r"^\s*(SELECT|WITH|VALUES|TABLE|INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+_READ_ONLY_RE = re.compile(r"^\s*(SELECT|WITH|VALUES|TABLE)\b", re.IGNORECASE)
+# writes (also inside CTEs) and effects a rollback does not undo
+_SIDE_EFFECT_RE = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|nextval|setval|pg_advisory\w*|pg_try_advisory\w*|pg_notify|dblink\w*)\b",
+    re.IGNORECASE,
+)
+
+_log: deque[dict[str, Any]] = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_ids = itertools.count(1)
+_last_explained: dict[str, float] = {}
+_tasks: set[asyncio.Task] = set()
+_explain_conn: psycopg.AsyncConnection | None = None
+_stats = {"recorded": 0, "explained": 0, "explain_failures": 0, "explain_skipped": 0}
+
+
+def enabled() -> bool:
+    return SLOW_QUERY_MS > 0
+
+
+def param_shape(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (list, tuple, set, frozenset)):
+        inner = sorted({param_shape(v) for v in value})
+        return f"{type(value).__name__}[{'|'.join(inner)}]({len(value)})"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    if isinstance(value, dict):
+        return f"dict({len(value)})"
+    return type(value).__name__
+
+
+def params_shape(params: Any) -> Any:
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: param_shape(value) for key, value in params.items()}
+    return [param_shape(value) for value in params]
+
+
+def is_read_only(sql: str) -> bool:
+    return _READ_ONLY_RE.match(sql) is not None and _SIDE_EFFECT_RE.search(sql) is None
+
+
+def record(query: Any, params: Any, duration_ms: float, request_id: str | None, path: str | None) -> None:
+    """Log one slow statement; schedules its EXPLAIN when enabled."""
+    sql = query if isinstance(query, str) else None
+    entry = {
+        "id": next(_ids),
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": round(duration_ms, 2),
+        "sql": (sql or repr(query))[:SQL_MAX_CHARS],
+        "params": params_shape(params),
+        "request_id": request_id,
+        "path": path,
+        "explain": "off",
+        "plan": None,
+    }
+    _log.append(entry)
+    _stats["recorded"] += 1
+    logger.warning(
+        "slow query duration_ms=%.2f path=%s request_id=%s sql=%s",
+        duration_ms,
+        path,
+        request_id,
+        " ".join(entry["sql"].split())[:200],
+    )
+    if SLOW_QUERY_EXPLAIN:
+        _schedule_explain(entry, sql, params)
+
+
+def _schedule_explain(entry: dict[str, Any], sql: str | None, params: Any) -> None:
+    if sql is None or not _EXPLAINABLE_RE.match(sql):
+        entry["explain"] = "not_explainable"
+        return
+    now = monotonic()
+    if now - _last_explained.get(sql, float("-inf")) < SLOW_QUERY_EXPLAIN_COOLDOWN_SEC:
+        entry["explain"] = "skipped_recent"
+        _stats["explain_skipped"] += 1
+        return
+    if _tasks:
+        # one EXPLAIN at a time; a burst of slow queries must not queue more load
+        entry["explain"] = "skipped_busy"
+        _stats["explain_skipped"] += 1
+        return
+    _last_explained[sql] = now
+    entry["explain"] = "pending"
+    task = asyncio.get_running_loop().create_task(_explain(entry, sql, params))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _connection() -> psycopg.AsyncConnection:
+    global _explain_conn
+    if _explain_conn is None or _explain_conn.closed:
+        from .db import settings  # lazily: importing db needs DATABASE_URL
+
+        _explain_conn = await psycopg.AsyncConnection.connect(settings.database_url)
+    return _explain_conn
+
+
+async def _explain(entry: dict[str, Any], sql: str, params: Any) -> None:
+    analyze = is_read_only(sql)
+    options = "ANALYZE, BUFFERS" if analyze else "COSTS"
+    try:
+        conn = await _connection()
+        async with conn.transaction(force_rollback=True):
+            async with conn.cursor() as cur:
+                await cur.execute(f"SET LOCAL statement_timeout = {SLOW_QUERY_EXPLAIN_TIMEOUT_MS}")
+                await cur.execute(f"EXPLAIN ({options}) {sql}", params)
+                rows = await cur.fetchall()
+    except Exception as exc:
+        entry["explain"] = "failed"
+        entry["explain_error"] = str(exc).strip()[:500]
+        _stats["explain_failures"] += 1
+        return
+    entry["plan"] = "\n".join(row[0] for row in rows)
+    entry["explain"] = "analyzed" if analyze else "planned"
+    _stats["explained"] += 1
+
+
+def entries(limit: int | None = None) -> list[dict[str, Any]]:
+    """Newest first."""
+    items = list(reversed(_log))
+    return items[:limit] if limit else items
+
+
+def clear() -> None:
+    _log.clear()
+    _last_explained.clear()
+
+
+async def close() -> None:
+    global _explain_conn
+    for task in list(_tasks):
+        task.cancel()
+    if _explain_conn is not None:
+        await _explain_conn.close()
+        _explain_conn = None
+
+
+def stats() -> dict[str, Any]:
+    return {
+        **_stats,
+        "entries": len(_log),
+        "threshold_ms": SLOW_QUERY_MS,
+        "explain": SLOW_QUERY_EXPLAIN,
+        "log_size": SLOW_QUERY_LOG_SIZE,
+    }
@@ -0,0 +1,273 @@
+"""SQL-side snapshot engine.
+
+Each snapshot section is a single statement that returns the finished JSON
+array as text (json_agg + LATERAL subqueries for bubbles/scoring), so the
+endpoint can splice sections together without decoding or rebuilding rows.
+
+The output decodes to the same document as the Python engine: timestamps are
+formatted like `datetime.isoformat()` and float columns always carry a
+fraction or exponent (`21.0`, not `21`). Only the whitespace Postgres puts
+inside objects differs.
+"""
+
+
+def _ts(expr: str) -> str:
+    """timestamptz -> the text `datetime.isoformat()` gives (no fraction when it is zero)."""
+    return (
+        f"""(to_char({expr}, 'YYYY-MM-DD"T"HH24:MI:SS')"""
+        f" || CASE WHEN to_char({expr}, 'US') = '000000' THEN '' ELSE to_char({expr}, '.US') END"
+        f" || to_char({expr}, 'TZH:TZM'))"
+    )
+
+
+def _float(expr: str) -> str:
+    """Number -> JSON that decodes to a Python float, as json.dumps writes it."""
+    text = f"({expr})::float8::text"
+    return f"(CASE WHEN {text} ~ '^-?[0-9]+$' THEN {text} || '.0' ELSE {text} END)::json"
+
+
+_TRADE_EXTRAS_JOINS = f"""
+    LEFT JOIN LATERAL (
+      SELECT COALESCE(
+        json_agg(json_build_object('rank', b.cluster_rank, 'pct', {_float('b.pct')}) ORDER BY b.cluster_rank),
+        '[]'::json
+      ) AS clusters
+      FROM trade_bubbles b
+      WHERE b.trade_id = v.trade_id
+    ) bc ON true
+    LEFT JOIN LATERAL (
+      SELECT COALESCE(
+        json_agg(json_build_object('rank', o.other_rank, 'pct', {_float('o.pct')}) ORDER BY o.other_rank),
+        '[]'::json
+      ) AS others
+      FROM trade_bubbles_others o
+      WHERE o.trade_id = v.trade_id
+    ) bo ON true
+    LEFT JOIN LATERAL (
+      SELECT s.intuition_score
+      FROM trade_scoring s
+      WHERE s.trade_id = v.trade_id
+      ORDER BY s.scored_ts DESC
+      LIMIT 1
+    ) sc ON true
+"""
+
+_TIP_EXTRAS_JOINS = f"""
+    LEFT JOIN LATERAL (
+      SELECT COALESCE(
+        json_agg(json_build_object('rank', b.cluster_rank, 'pct', {_float('b.pct')}) ORDER BY b.cluster_rank),
+        '[]'::json
+      ) AS clusters
+      FROM tip_bubbles b
+      WHERE b.tip_id = v.tip_id
+    ) bc ON true
+    LEFT JOIN LATERAL (
+      SELECT COALESCE(
+        json_agg(json_build_object('rank', o.other_rank, 'pct', {_float('o.pct')}) ORDER BY o.other_rank),
+        '[]'::json
+      ) AS others
+      FROM tip_bubbles_others o
+      WHERE o.tip_id = v.tip_id
+    ) bo ON true
+    LEFT JOIN LATERAL (
+      SELECT s.intuition_score
+      FROM tip_scoring s
+      WHERE s.tip_id = v.tip_id
+      ORDER BY s.scored_ts DESC
+      LIMIT 1
+    ) sc ON true
+"""
+
+_EXTRAS_FIELDS = """
+    'bubbles', json_build_object('clusters', bc.clusters, 'others', bo.others),
+    'scoring', json_build_object('intuition_score', sc.intuition_score)
+"""
+
+
+def _agg(row_object: str, order_by: str) -> str:
+    return f"COALESCE(json_agg({row_object} ORDER BY {order_by}), '[]'::json)::text"
+
+
+def coins_query(chain: str | None) -> tuple[str, tuple]:
+    where = ""
+    params = []
+    if chain:
+        where = "WHERE c.chain = %s"
+        params.append(chain)
+    row = f"""json_build_object(
+        'ca', c.ca, 'name', c.name, 'symbol', c.symbol, 'launch_ts', {_ts("c.launch_ts")},
+        'chain', c.chain, 'source_type', c.source_type, 'created_ts', {_ts("c.created_ts")},
+        'trades_total', COALESCE(t.trades_total, 0),
+        'trades_open', COALESCE(t.trades_open, 0),
+        'tips_total', COALESCE(x.tips_total, 0)
+    )"""
+    sql = f"""
+        SELECT {_agg(row, "c.created_ts DESC")}
+        FROM coins c
+        LEFT JOIN LATERAL (
+          SELECT
+            COUNT(*) AS trades_total,
+            COUNT(*) FILTER (WHERE exit_ts IS NULL) AS trades_open
+          FROM trades
+          WHERE trades.ca = c.ca AND trades.chain = c.chain
+        ) t ON true
+        LEFT JOIN LATERAL (
+          SELECT COUNT(*) AS tips_total
+          FROM tips
+          WHERE tips.ca = c.ca AND tips.chain = c.chain
+        ) x ON true
+        {where};
+    """
+    return sql, tuple(params)
+
+
+def trades_recent_query(chain: str | None, limit: int) -> tuple[str, tuple]:
+    where = ""
+    params = []
+    if chain:
+        where = "WHERE chain = %s"
+        params.append(chain)
+    params.append(limit)
+    row = f"""json_build_object(
+        'id', v.id, 'trade_id', v.trade_id, 'ca', v.ca, 'chain', v.chain,
+        'coin_name', v.coin_name, 'entry_ts', {_ts("v.entry_ts")},
+        'entry_mcap_usd', {_float("v.entry_mcap_usd")}, 'size_usd', {_float("v.size_usd")},
+        'exit_ts', {_ts("v.exit_ts")}, 'exit_mcap_usd', {_float("v.exit_mcap_usd")},
+        'exit_reason', v.exit_reason, 'pnl_pct', {_float("v.pnl_pct")}, 'pnl_usd', {_float("v.pnl_usd")},
+        {_EXTRAS_FIELDS}
+    )"""
+    sql = f"""
+        SELECT {_agg(row, "v.entry_ts DESC")}
+        FROM (
+          SELECT *
+          FROM v_trades_pnl
+          {where}
+          ORDER BY entry_ts DESC
+          LIMIT %s
+        ) v
+        {_TRADE_EXTRAS_JOINS};
+    """
+    return sql, tuple(params)
+
+
+def tips_recent_query(chain: str | None, limit: int) -> tuple[str, tuple]:
+    where = ""
+    params = []
+    if chain:
+        where = "WHERE chain = %s"
+        params.append(chain)
+    params.append(limit)
+    row = f"""json_build_object(
+        'tip_id', v.tip_id, 'ca', v.ca, 'chain', v.chain, 'coin_name', v.coin_name,
+        'account_id', v.account_id, 'platform', v.platform, 'handle', v.handle,
+        'post_ts', {_ts("v.post_ts")}, 'post_mcap_usd', {_float("v.post_mcap_usd")},
+        'peak_mcap_usd', {_float("v.peak_mcap_usd")}, 'trough_mcap_usd', {_float("v.trough_mcap_usd")},
+        'rug_flag', v.rug_flag, 'gain_pct', {_float("v.gain_pct")}, 'drop_pct', {_float("v.drop_pct")},
+        'effect_pct', {_float("v.effect_pct")},
+        {_EXTRAS_FIELDS}
+    )"""
+    sql = f"""
+        SELECT {_agg(row, "v.post_ts DESC")}
+        FROM (
+          SELECT *
+          FROM v_tip_gain_loss
+          {where}
+          ORDER BY post_ts DESC
+          LIMIT %s
+        ) v
+        {_TIP_EXTRAS_JOINS};
+    """
+    return sql, tuple(params)
+
+
+def accounts_query(chain: str | None, use_matview: bool, accounts_table: str) -> tuple[str, tuple]:
+    row = f"""json_build_object(
+        'account_id', s.account_id, 'platform', s.platform, 'handle', s.handle,
+        'tips_total', COALESCE(s.tips_total, 0), 'win_rate_50p', {_float("s.win_rate_50p")},
+        'rug_rate', {_float("s.rug_rate")}, 'avg_effect_pct', {_float("s.avg_effect_pct")}
+    )"""
+    order_by = "s.tips_total DESC, s.avg_effect_pct DESC NULLS LAST"
+    if not chain and use_matview:
+        sql = f"SELECT {_agg(row, order_by)} FROM mv_accounts_summary s;"
+        return sql, ()
+
+    where = ""
+    params = []
+    if chain:
+        where = "WHERE t.chain = %s"
+        params.append(chain)
+    sql = f"""
+        SELECT {_agg(row, order_by)}
+        FROM (
+          SELECT
+            a.account_id,
+            a.platform,
+            a.handle,
+            COUNT(t.tip_id) AS tips_total,
+            CASE
+              WHEN COUNT(t.tip_id) > 0
+              THEN SUM(CASE WHEN v.effect_pct >= 50 THEN 1 ELSE 0 END)::FLOAT / COUNT(t.tip_id)
+              ELSE NULL
+            END AS win_rate_50p,
+            CASE
+              WHEN COUNT(t.tip_id) > 0
+              THEN SUM(CASE WHEN v.rug_flag = 1 THEN 1 ELSE 0 END)::FLOAT / COUNT(t.tip_id)
+              ELSE NULL
+            END AS rug_rate,
+            AVG(v.effect_pct) AS avg_effect_pct
+          FROM {accounts_table} a
+          LEFT JOIN tips t ON a.account_id = t.account_id
+          LEFT JOIN v_tip_gain_loss v ON t.tip_id = v.tip_id
+          {where}
+          GROUP BY a.account_id, a.platform, a.handle
+        ) s;
+    """
+    return sql, tuple(params)
+
+
+def coin_trades_query(ca: str, chain: str) -> tuple[str, tuple]:
+    row = f"""json_build_object(
+        'id', v.id, 'trade_id', v.trade_id, 'chain', v.chain,
+        'entry_ts', {_ts("v.entry_ts")},
+        'entry_mcap_usd', {_float("v.entry_mcap_usd")}, 'size_usd', {_float("v.size_usd")},
+        'exit_ts', {_ts("v.exit_ts")}, 'exit_mcap_usd', {_float("v.exit_mcap_usd")},
+        'exit_reason', v.exit_reason, 'pnl_pct', {_float("v.pnl_pct")}, 'pnl_usd', {_float("v.pnl_usd")},
+        {_EXTRAS_FIELDS}
+    )"""
+    sql = f"""
+        SELECT {_agg(row, "v.entry_ts DESC")}
+        FROM v_trades_pnl v
+        {_TRADE_EXTRAS_JOINS}
+        WHERE v.ca = %s AND v.chain = %s;
+    """
+    return sql, (ca, chain)
+
+
+def coin_tips_query(ca: str, chain: str) -> tuple[str, tuple]:
+    row = f"""json_build_object(
+        'tip_id', v.tip_id, 'chain', v.chain, 'account_id', v.account_id,
+        'platform', v.platform, 'handle', v.handle,
+        'post_ts', {_ts("v.post_ts")}, 'post_mcap_usd', {_float("v.post_mcap_usd")},
+        'peak_mcap_usd', {_float("v.peak_mcap_usd")}, 'trough_mcap_usd', {_float("v.trough_mcap_usd")},
+        'rug_flag', v.rug_flag, 'gain_pct', {_float("v.gain_pct")}, 'drop_pct', {_float("v.drop_pct")},
+        'effect_pct', {_float("v.effect_pct")},
+        {_EXTRAS_FIELDS}
+    )"""
+    sql = f"""
+        SELECT {_agg(row, "v.post_ts DESC")}
+        FROM v_tip_gain_loss v
+        {_TIP_EXTRAS_JOINS}
+        WHERE v.ca = %s AND v.chain = %s;
+    """
+    return sql, (ca, chain)
+
+
+async def fetch_section(cur, query: tuple[str, tuple]) -> str:
+    sql, params = query
+    await cur.execute(sql, params)
+    return (await cur.fetchone())[0]
+
+
+def join_object(parts: list[tuple[str, str]]) -> str:
+    """Splice pre-rendered JSON values into one object without re-encoding them."""
+    return "{" + ",".join(f'"{key}":{value}' for key, value in parts) + "}"
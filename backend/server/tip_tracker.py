@@ -0,0 +1,115 @@
+"""Scheduled peak/trough tracking for tips.
+
+Every TIP_TRACK_SEC the coins of all tips posted within the observation window
+are sampled (one tokens/v1 call per chain and 30 addresses, see market.py) and
+`tips.peak_mcap_usd` / `trough_mcap_usd` are widened with one
+`UPDATE ... FROM (VALUES ...)` per UPDATE_BATCH_SIZE coins. A missing peak or
+trough starts from the tip's post mcap.
+"""
+
+import asyncio
+import logging
+import os
+from time import monotonic
+from typing import Any
+
+from . import market
+from .cache import data_version
+from .routers import dexscreener as dex
+
+logger = logging.getLogger("app")
+
+TIP_TRACK_SEC = float(os.getenv("TIP_TRACK_SEC", "300"))  # 0 disables the tracker
+TIP_TRACK_WINDOW_HOURS = float(os.getenv("TIP_TRACK_WINDOW_HOURS", "72"))
+UPDATE_BATCH_SIZE = 500
+
+_task: asyncio.Task | None = None
+_stats = {"runs": 0, "failures": 0, "coins": 0, "sampled": 0, "tips_updated": 0, "last_run_ms": 0.0}
+
+
+async def tips_in_window(cur, window_hours: float) -> list[tuple[str, str]]:
+    await cur.execute(
+        """
+        SELECT DISTINCT chain, ca
+        FROM tips
+        WHERE post_ts > NOW() - make_interval(secs => %s);
+        """,
+        (window_hours * 3600,),
+    )
+    return await cur.fetchall()
+
+
+async def apply_samples(cur, samples: dict[tuple[str, str], float], window_hours: float) -> int:
+    """Widen peak/trough of in-window tips with the sampled mcaps; returns rows changed."""
+    items = list(samples.items())
+    updated = 0
+    for i in range(0, len(items), UPDATE_BATCH_SIZE):
+        batch = items[i:i + UPDATE_BATCH_SIZE]
+        values = ", ".join(["(%s, %s, %s::float8)"] * len(batch))
+        params: list[Any] = [v for (chain, ca), mcap in batch for v in (chain, ca, mcap)]
+        params.append(window_hours * 3600)
+        await cur.execute(
+            f"""
+            UPDATE tips t
+            SET peak_mcap_usd = GREATEST(COALESCE(t.peak_mcap_usd, t.post_mcap_usd), s.mcap),
+                trough_mcap_usd = LEAST(COALESCE(t.trough_mcap_usd, t.post_mcap_usd), s.mcap)
+            FROM (VALUES {values}) AS s(chain, ca, mcap)
+            WHERE t.chain = s.chain
+              AND t.ca = s.ca
+              AND t.post_ts > NOW() - make_interval(secs => %s)
+              AND (
+                t.peak_mcap_usd IS NULL OR t.trough_mcap_usd IS NULL
+                OR s.mcap > t.peak_mcap_usd OR s.mcap < t.trough_mcap_usd
+              );
+            """,
+            params,
+        )
+        updated += cur.rowcount
+    return updated
+
+
+async def track_once() -> int:
+    """Sample every coin in the window and update its tips; returns tips changed."""
+    positions = await dex.run_db(lambda cur: tips_in_window(cur, TIP_TRACK_WINDOW_HOURS))
+    _stats["coins"] = len(positions)
+    if not positions:
+        return 0
+    quotes = await market.fetch_quotes(positions)
+    _stats["sampled"] = len(quotes)
+    if not quotes:
+        return 0
+    samples = {key: mcap for key, (mcap, _price) in quotes.items()}
+    updated = await dex.run_db(lambda cur: apply_samples(cur, samples, TIP_TRACK_WINDOW_HOURS))
+    if updated:
+        data_version.bump()
+    return updated
+
+
+async def _track_loop() -> None:
+    while True:
+        started = monotonic()
+        try:
+            _stats["tips_updated"] += await track_once()
+        except Exception:
+            _stats["failures"] += 1
+            logger.warning("tip tracking failed", exc_info=True)
+        _stats["runs"] += 1
+        _stats["last_run_ms"] = round((monotonic() - started) * 1000, 2)
+        await asyncio.sleep(TIP_TRACK_SEC)
+
+
+def start() -> None:
+    global _task
+    if TIP_TRACK_SEC > 0 and _task is None:
+        _task = asyncio.create_task(_track_loop())
+
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
+
+
+def stats() -> dict[str, Any]:
+    return {**_stats, "track_sec": TIP_TRACK_SEC, "window_hours": TIP_TRACK_WINDOW_HOURS}
@@ -0,0 +1,68 @@
+"""Postgres tier (`token_meta_cache`, migration 012) behind the in-memory
+Dexscreener metadata cache. Async helpers that take a cursor; callers await
+them on the event loop with a pooled connection.
+"""
+
+from datetime import datetime
+
+from psycopg.types.json import Jsonb
+
+# (ca, meta or None for "not found", fresh_until, stale_until)
+StoredMeta = tuple[str, dict | None, datetime, datetime]
+
+
+async def load(cur, cas: list[str]) -> list[StoredMeta]:
+    """Rows for `cas` that are still servable (fresh or stale)."""
+    await cur.execute(
+        """
+        SELECT ca, meta, fresh_until, stale_until
+        FROM token_meta_cache
+        WHERE ca = ANY(%s) AND stale_until > NOW();
+        """,
+        (cas,),
+    )
+    return await cur.fetchall()
+
+
+async def save(cur, rows: list[StoredMeta]) -> None:
+    await cur.executemany(
+        """
+        INSERT INTO token_meta_cache AS m (ca, meta, fetched_at, fresh_until, stale_until)
+        VALUES (%s, %s, NOW(), %s, %s)
+        ON CONFLICT (ca) DO UPDATE
+          SET meta = EXCLUDED.meta,
+              fetched_at = EXCLUDED.fetched_at,
+              fresh_until = EXCLUDED.fresh_until,
+              stale_until = EXCLUDED.stale_until;
+        """,
+        [(ca, Jsonb(meta) if meta is not None else None, fresh, stale) for ca, meta, fresh, stale in rows],
+    )
+
+
+async def load_tracked(cur, limit: int) -> tuple[list[StoredMeta], list[str]]:
+    """Prewarm set: servable rows for coins we track, and tracked CAs with none."""
+    await cur.execute("DELETE FROM token_meta_cache WHERE stale_until < NOW() - INTERVAL '1 day';")
+    await cur.execute(
+        """
+        SELECT m.ca, m.meta, m.fresh_until, m.stale_until
+        FROM token_meta_cache m
+        WHERE m.stale_until > NOW() AND EXISTS (SELECT 1 FROM coins c WHERE c.ca = m.ca)
+        ORDER BY m.fresh_until DESC
+        LIMIT %s;
+        """,
+        (limit,),
+    )
+    stored = await cur.fetchall()
+    await cur.execute(
+        """
+        SELECT DISTINCT c.ca
+        FROM coins c
+        WHERE NOT EXISTS (
+          SELECT 1 FROM token_meta_cache m WHERE m.ca = c.ca AND m.stale_until > NOW()
+        )
+        LIMIT %s;
+        """,
+        (limit,),
+    )
+    missing = [row[0] for row in await cur.fetchall()]
+    return stored, missing
@@ -0,0 +1,47 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from server.cache import DataVersion, LRUCache, etag_matches
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_counts_hits_and_misses(self):
+        cache = LRUCache(maxsize=4)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("missing")
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+
+class TestDataVersion(unittest.TestCase):
+    def test_bump_changes_etag(self):
+        version = DataVersion()
+        before = version.etag()
+        version.bump()
+        self.assertNotEqual(before, version.etag())
+        self.assertEqual(version.current(), 1)
+
+    def test_etag_matches(self):
+        etag = 'W/"abc-3"'
+        self.assertTrue(etag_matches('W/"abc-3"', etag))
+        self.assertTrue(etag_matches('"abc-3"', etag))
+        self.assertTrue(etag_matches('"x-1", W/"abc-3"', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('W/"abc-2"', etag))
+        self.assertFalse(etag_matches(None, etag))
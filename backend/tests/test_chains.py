@@ -0,0 +1,29 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from server.chains import EVM_CHAINS, chain_candidates, is_solana_address
+
+CHAINS = ["solana", "ethereum", "bsc", "base", "arbitrum", "polygon", "avalanche", "fantom", "optimism"]
+USDC_SOL = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
+USDC_ETH = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+
+
+class TestChainCandidates(unittest.TestCase):
+    def test_evm_address(self):
+        self.assertEqual(set(chain_candidates(USDC_ETH, CHAINS)), EVM_CHAINS)
+        self.assertEqual(chain_candidates(USDC_ETH.lower(), CHAINS)[0], "ethereum")
+
+    def test_solana_address(self):
+        self.assertEqual(chain_candidates(USDC_SOL, CHAINS), ["solana"])
+        self.assertEqual(chain_candidates(USDC_SOL.lower(), CHAINS), ["solana"])
+
+    def test_bad_base58_length(self):
+        # valid alphabet, but decodes to 33 bytes
+        self.assertFalse(is_solana_address("Z" * 44))
+
+    def test_unknown_format_keeps_all_chains(self):
+        self.assertEqual(chain_candidates("0xABC", CHAINS), CHAINS)
+        self.assertEqual(chain_candidates("not an address", CHAINS), CHAINS)
@@ -1,10 +1,14 @@
+import asyncio
 import sys
 import unittest
 from pathlib import Path
 from unittest.mock import patch
 
+import httpx
+
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
+from scripts.fake_dexscreener import FakeDexscreener
 from server.routers import dexscreener as dex
 
 
@@ -29,6 +33,201 @@ class TestDexscreenerCache(unittest.IsolatedAsyncioTestCase):
             cached = await dex._cache_get_async("token")
         self.assertIsNone(cached)
 
+    async def test_cache_is_bounded(self):
+        cache = dex.TTLCache(maxsize=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key, 0.0, 10)
+        self.assertIsNone(cache.get("a", 1.0))
+        self.assertEqual(cache.get("c", 1.0), ("c", dex.TTLCache.FRESH))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
     def test_ms_to_dt_utc(self):
         dt = dex._ms_to_dt_utc(0)
         self.assertEqual(dt.isoformat(), "1970-01-01T00:00:00+00:00")
+
+
+class TestDexscreenerClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        dex._cache.clear()
+        self.paths = []
+        self.ca = "0x" + "ab" * 20
+        self.known = []
+        for patcher in (
+            patch("server.routers.dexscreener._known_chains", side_effect=self._known),
+            patch("server.routers.dexscreener.DEX_RATE_PER_SEC", 1000.0),
+            patch("server.routers.dexscreener.DEX_RATE_BURST", 1000),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        dex._limiters.clear()
+        dex._breakers.clear()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.paths.append(request.url.path)
+            if "/ethereum/0xee" in request.url.path:
+                return httpx.Response(503, headers={"Retry-After": "0"})
+            if request.url.path.startswith("/tokens/v1/base/"):
+                return httpx.Response(200, json=[
+                    {"baseToken": {"address": ca, "name": ca[-4:], "symbol": "B"}, "pairCreatedAt": 0}
+                    for ca in request.url.path.rsplit("/", 1)[1].split(",")
+                    if ca.startswith("0xba")
+                ])
+            if request.url.path == f"/token-pairs/v1/base/{self.ca}":
+                pair = {"baseToken": {"address": self.ca, "name": "Abc", "symbol": "ABC"}, "pairCreatedAt": 0}
+                return httpx.Response(200, json=[pair])
+            return httpx.Response(404)
+
+        dex._client = httpx.AsyncClient(base_url="https://dex.test", transport=httpx.MockTransport(handler))
+
+    async def _known(self, cas):
+        return {ca: self.known for ca in cas} if self.known else {}
+
+    async def asyncTearDown(self):
+        await dex.close_client()
+
+    async def test_token_meta_uses_shared_client(self):
+        client = dex.get_client()
+        result = await dex.token_meta(self.ca)
+        self.assertEqual(result["chain"], "base")
+        # EVM address: everything but solana
+        self.assertEqual(len(self.paths), len(dex.SUPPORTED_CHAINS) - 1)
+        self.assertIs(dex.get_client(), client)
+        self.assertFalse(client.is_closed)
+
+    async def test_known_chain_is_asked_first(self):
+        self.known = ["base"]
+        result = await dex.token_meta(self.ca)
+        self.assertEqual(result["chain"], "base")
+        self.assertEqual(self.paths, [f"/token-pairs/v1/base/{self.ca}"])
+
+    async def test_stale_known_chain_falls_back(self):
+        self.known = ["ethereum", "solana"]
+        result = await dex.token_meta(self.ca)
+        self.assertEqual(result["chain"], "base")
+        self.assertEqual(self.paths[0], f"/token-pairs/v1/ethereum/{self.ca}")
+        self.assertEqual(len(self.paths), len(dex.SUPPORTED_CHAINS) - 1)
+
+    async def test_not_found_is_cached(self):
+        ca = "0x" + "cd" * 20
+        for _ in range(2):
+            with self.assertRaises(dex.HTTPException) as ctx:
+                await dex.token_meta(ca)
+            self.assertEqual(ctx.exception.status_code, 404)
+        self.assertEqual(len(self.paths), len(dex.SUPPORTED_CHAINS) - 1)
+        self.assertGreaterEqual(dex._stats["negative_hits"], 1)
+
+    async def test_stale_entry_served_while_refreshing(self):
+        with patch("server.routers.dexscreener.monotonic", return_value=100.0):
+            await dex._cache_set_async(self.ca, {"name": "Old"})
+        with patch(
+            "server.routers.dexscreener.monotonic",
+            return_value=100.0 + dex.CACHE_TTL_SEC + 1,
+        ):
+            result = await dex.token_meta(self.ca)
+            self.assertEqual(result, {"name": "Old"})
+            await asyncio.gather(*dex._background)
+            result = await dex.token_meta(self.ca)
+        self.assertEqual(result["name"], "Abc")
+
+    async def test_concurrent_lookups_share_one_fan_out(self):
+        before = dex._stats["coalesced"]
+        results = await asyncio.gather(*(dex.token_meta(self.ca) for _ in range(5)))
+        self.assertEqual(dex._stats["coalesced"] - before, 4)
+        self.assertTrue(all(r["chain"] == "base" for r in results))
+        self.assertEqual(len(self.paths), len(dex.SUPPORTED_CHAINS) - 1)
+        self.assertEqual(dex._inflight, {})
+
+    async def test_batch_chunks_per_chain(self):
+        cas = [f"0xba{i:038x}" for i in range(40)] + ["0x" + "cd" * 20, "0x" + "cd" * 20]
+        result = await dex.token_meta_batch(dex.TokenMetaBatchIn(cas=cas))
+        self.assertEqual(len(result["results"]), 40)
+        self.assertEqual(result["not_found"], ["0x" + "cd" * 20])
+        # 41 unique EVM addresses -> 2 calls on each of the 8 EVM chains
+        self.assertEqual(len(self.paths), 2 * (len(dex.SUPPORTED_CHAINS) - 1))
+        again = await dex.token_meta_batch(dex.TokenMetaBatchIn(cas=cas[:3]))
+        self.assertEqual(len(again["results"]), 3)
+        self.assertEqual(len(self.paths), 2 * (len(dex.SUPPORTED_CHAINS) - 1))
+
+    async def test_breaker_fails_fast(self):
+        ca = "0x" + "ee" * 20
+        client = dex.get_client()
+        first = await dex.check_chain(client, "ethereum", ca)
+        second = await dex.check_chain(client, "ethereum", ca)
+        sent = len(self.paths)
+        third = await dex.check_chain(client, "ethereum", ca)
+        self.assertEqual(first["error"], "http_503")
+        self.assertEqual(second["error"], "http_503")
+        self.assertEqual(third["error"], "circuit_open")
+        self.assertEqual(sent, dex.BREAKER_FAILURES)
+        self.assertEqual(len(self.paths), sent)
+        self.assertEqual(dex._breakers["token-pairs/ethereum"].state, "open")
+
+    async def test_cancelled_half_open_probe_reopens_the_breaker(self):
+        ca = "0x" + "cc" * 20
+        released = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await released.wait()
+            return httpx.Response(404)
+
+        client = httpx.AsyncClient(base_url="https://dex.test", transport=httpx.MockTransport(handler))
+        self.addAsyncCleanup(client.aclose)
+        breaker = dex._breaker("token-pairs/ethereum")
+        for _ in range(dex.BREAKER_FAILURES):
+            breaker.record_failure()
+        breaker.reset_after = 0
+
+        probe = asyncio.create_task(dex.check_chain(client, "ethereum", ca))
+        await asyncio.sleep(0.01)
+        self.assertEqual(breaker.state, "half_open")
+        probe.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await probe
+        self.assertEqual(breaker.state, "open")
+
+        released.set()
+        result = await dex.check_chain(client, "ethereum", ca)
+        self.assertEqual(result["status"], "not_found")
+        self.assertEqual(breaker.state, "closed")
+
+    async def test_close_client(self):
+        client = dex.get_client()
+        await dex.close_client()
+        self.assertTrue(client.is_closed)
+        self.assertIsNone(dex._client)
+
+
+class TestAgainstFakeDexscreener(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        dex._cache.clear()
+        dex._limiters.clear()
+        dex._breakers.clear()
+        self.fake = FakeDexscreener(retry_after=0).start()
+        self.addCleanup(self.fake.stop)
+        self.ca = "0x" + "12" * 20
+        self.fake.add_token("base", self.ca, mcap=5000, name="Fake")
+        for patcher in (
+            patch("server.routers.dexscreener._known_chains", return_value={}),
+            patch("server.routers.dexscreener.CACHE_STORE", False),
+            patch("server.routers.dexscreener.RETRY_BACKOFF_SEC", 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        dex._client = httpx.AsyncClient(base_url=self.fake.url)
+
+    async def asyncTearDown(self):
+        await dex.close_client()
+
+    async def test_token_meta_over_http(self):
+        result = await dex.token_meta(self.ca)
+        self.assertEqual((result["name"], result["chain"]), ("Fake", "base"))
+        self.assertEqual(len(self.fake.requests), len(dex.SUPPORTED_CHAINS) - 1)
+
+    async def test_rate_limited_upstream_blocks_limiter(self):
+        self.fake.rate_limit_rate = 1.0
+        with self.assertRaises(dex.HTTPException) as ctx:
+            await dex.token_meta(self.ca)
+        self.assertEqual(ctx.exception.status_code, 502)
+        self.assertEqual(self.fake.responses, {429: len(self.fake.requests)})
+        self.assertGreater((await dex.upstream_stats())["limiters"]["127.0.0.1"]["blocks"], 0)
+        self.assertIsNone(await dex._cache_get_async(self.ca))
@@ -0,0 +1,78 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi import HTTPException
+
+from server.enrichment import EMPTY_EXTRAS, INCLUDE_ALL, EnrichmentLoader, collect_extras, extras_query, parse_include
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    async def execute(self, sql, params):
+        self.executed.append(params["ids"])
+
+    async def fetchall(self):
+        return [r for r in self.rows if r[1] in self.executed[-1]]
+
+
+ROWS = [
+    (1, "t1", 1, 40.0),
+    (1, "t1", 2, 12.5),
+    (2, "t1", 1, 3.0),
+    (3, "t1", 0, 7.0),
+    (3, "t2", 0, 4.0),
+]
+
+
+class TestCollectExtras(unittest.TestCase):
+    def test_groups_rows_by_id(self):
+        extras = collect_extras(ROWS)
+        t1 = extras["t1"]
+        self.assertEqual(t1.clusters, [{"rank": 1, "pct": 40.0}, {"rank": 2, "pct": 12.5}])
+        self.assertEqual(t1.others, [{"rank": 1, "pct": 3.0}])
+        self.assertEqual(t1.intuition_score, 7)
+        self.assertIsNone(extras["t2"].bubbles())
+        self.assertEqual(extras["t2"].scoring(), {"intuition_score": 4})
+
+    def test_query_only_touches_included_tables(self):
+        sql, _ = extras_query("tip", [1], frozenset({"scoring"}))
+        self.assertIn("tip_scoring", sql)
+        self.assertNotIn("tip_bubbles", sql)
+
+    def test_rejects_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            extras_query("coin", ["x"])
+
+
+class TestEnrichmentLoader(unittest.IsolatedAsyncioTestCase):
+    async def test_fetches_each_id_once(self):
+        cur = FakeCursor(ROWS)
+        loader = EnrichmentLoader(cur)
+        first = await loader.load("trade", ["t1", "t3"])
+        self.assertEqual(first["t3"], EMPTY_EXTRAS)
+        second = await loader.load("trade", ["t1", "t2", "t2"])
+        self.assertEqual(second["t2"].intuition_score, 4)
+        self.assertEqual(cur.executed, [["t1", "t3"], ["t2"]])
+        await loader.load("trade", ["t3", "t2"])
+        self.assertEqual(loader.round_trips, 2)
+
+    async def test_empty_include_skips_queries(self):
+        cur = FakeCursor(ROWS)
+        extras = await EnrichmentLoader(cur, frozenset()).load("trade", ["t1"])
+        self.assertEqual(extras["t1"], EMPTY_EXTRAS)
+        self.assertEqual(cur.executed, [])
+
+
+class TestParseInclude(unittest.TestCase):
+    def test_values(self):
+        self.assertEqual(parse_include(None), INCLUDE_ALL)
+        self.assertEqual(parse_include(""), frozenset())
+        self.assertEqual(parse_include("Scoring, "), frozenset({"scoring"}))
+        with self.assertRaises(HTTPException):
+            parse_include("bubbles,pnl")
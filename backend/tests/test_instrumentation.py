@@ -0,0 +1,91 @@
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from server import instrumentation
+
+# main imports the (unopened) pool; no connection is ever made here
+with mock.patch.dict(os.environ, {"DATABASE_URL": os.getenv("DATABASE_URL", "postgresql:///unused")}):
+    from server import main
+
+
+class TestRequestStats(unittest.TestCase):
+    def test_records_only_inside_a_request(self):
+        instrumentation.record_pool_wait(5.0)
+        self.assertIsNone(instrumentation.current())
+
+        stats, token = instrumentation.begin()
+        try:
+            instrumentation.record_pool_wait(2.5)
+            instrumentation.record_pool_wait(1.5)
+            instrumentation.TimedJSONResponse({"a": list(range(10))})
+            self.assertIs(instrumentation.current(), stats)
+        finally:
+            instrumentation.end(token)
+        self.assertIsNone(instrumentation.current())
+        self.assertEqual(stats.pool_wait_ms, 4.0)
+        self.assertGreater(stats.render_ms, 0)
+
+    def test_server_timing_header(self):
+        stats = instrumentation.RequestStats()
+        stats.queries = 3
+        stats.sql_ms = 12.0
+        stats.pool_wait_ms = 1.0
+        self.assertEqual(
+            stats.server_timing(20.0),
+            'pool;dur=1.00, db;dur=12.00;desc="3 queries", app;dur=7.00, render;dur=0.00, total;dur=20.00',
+        )
+        self.assertEqual(stats.app_ms(5.0), 0.0)
+
+
+class TestRequestLogging(unittest.TestCase):
+    def setUp(self):
+        def query():
+            instrumentation.current().queries += 1
+
+        app = FastAPI()
+        app.middleware("http")(main.request_logging)
+
+        @app.get("/plain")
+        async def plain():
+            query()
+            return {"ok": True}
+
+        @app.get("/streamed")
+        async def streamed():
+            async def body():
+                for n in range(3):
+                    query()  # after call_next has returned
+                    yield f"{n}\n"
+
+            return StreamingResponse(body(), media_type="application/x-ndjson")
+
+        self.client = TestClient(app)
+
+    def test_plain_response_gets_server_timing(self):
+        with self.assertLogs("app", "INFO") as logs:
+            response = self.client.get("/plain")
+        self.assertIn('desc="1 queries"', response.headers["Server-Timing"])
+        self.assertIn("queries=1 ", logs.output[0])
+
+    def test_streamed_response_is_recorded_after_its_body(self):
+        with (
+            mock.patch.object(instrumentation, "REQUEST_QUERY_BUDGET", 2),
+            mock.patch.object(main.metrics, "observe_request") as observe,
+            self.assertLogs("app", "INFO") as logs,
+        ):
+            response = self.client.get("/streamed", headers={"x-request-id": "req-s"})
+        self.assertEqual(response.text, "0\n1\n2\n")
+        self.assertEqual(response.headers["x-request-id"], "req-s")
+        self.assertNotIn("Server-Timing", response.headers)
+        self.assertEqual(observe.call_args.args[4], 3)
+        self.assertIn("queries=3 ", logs.output[0])
+        self.assertIn("query budget exceeded", logs.output[1])
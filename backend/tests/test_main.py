@@ -0,0 +1,57 @@
+import asyncio
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# main imports the (unopened) pool; no connection is ever made here
+with mock.patch.dict(os.environ, {"DATABASE_URL": os.getenv("DATABASE_URL", "postgresql:///unused")}):
+    from server import main
+
+
+class TestChangeLogPruning(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.events = []
+        self.pruning = asyncio.Event()
+
+        async def prune():
+            self.events.append("prune")
+            self.pruning.set()
+            try:
+                await asyncio.Event().wait()  # a statement that is still running
+            except asyncio.CancelledError:
+                self.events.append("prune cancelled")
+                raise
+
+        async def close():
+            self.events.append("pool closed")
+
+        for target, value in (
+            ("ACCOUNTS_MV_REFRESH_SECONDS", "0"),
+            ("CHANGE_LOG_PRUNE_SECONDS", 0),
+            ("_prune_change_log", prune),
+        ):
+            patcher = mock.patch.object(main, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for target, value in (("open", mock.AsyncMock()), ("close", close)):
+            patcher = mock.patch.object(main.pool, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(main.dexscreener, "open_client")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ("refresh_task", "prune_task"):
+            self.addCleanup(lambda name=name: main.app.state._state.pop(name, None))
+
+    async def test_prunes_without_the_mv_refresh_and_waits_for_it_on_shutdown(self):
+        await main.startup()
+        self.assertIsNone(getattr(main.app.state, "refresh_task", None))
+        await asyncio.wait_for(self.pruning.wait(), 1)
+
+        await main.shutdown()
+        self.assertEqual(self.events, ["prune", "prune cancelled", "pool closed"])
+        self.assertTrue(main.app.state.prune_task.done())
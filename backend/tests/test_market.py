@@ -0,0 +1,37 @@
+import sys
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from server import market
+
+
+def pair(address, mcap, liquidity, price="0.1"):
+    return {"baseToken": {"address": address}, "marketCap": mcap, "liquidity": {"usd": liquidity}, "priceUsd": price}
+
+
+class TestMarket(unittest.TestCase):
+    def tearDown(self):
+        market._quotes.clear()
+
+    def test_quote_from_most_liquid_base_pair(self):
+        pairs = [
+            pair("0xAA", 1000, 50),
+            pair("0xaa", 2000, 500, "0.2"),
+            pair("0xbb", 9000, 5000),
+            {"baseToken": {"address": "0xaa"}, "fdv": 3000, "liquidity": {"usd": 100}},
+        ]
+        self.assertEqual(market.quote_from_pairs("0xaa", pairs), (2000.0, 0.2))
+        self.assertIsNone(market.quote_from_pairs("0xcc", pairs))
+
+    def test_unrealized_uses_fresh_quotes_only(self):
+        market._quotes[("base", "0xaa")] = market.Quote(1500.0, None, datetime.now(timezone.utc), 100.0)
+        with patch("server.market.monotonic", return_value=110.0):
+            live = market.unrealized("base", "0xaa", 1000.0, 200.0)
+        self.assertEqual(live["unrealized_pnl_pct"], 50.0)
+        self.assertEqual(live["unrealized_pnl_usd"], 100.0)
+        with patch("server.market.monotonic", return_value=100.0 + market.MARKET_MAX_AGE_SEC + 1):
+            self.assertEqual(market.unrealized("base", "0xaa", 1000.0, 200.0), {})
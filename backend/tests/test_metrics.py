@@ -0,0 +1,87 @@
+import asyncio
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from server import metrics
+from server.metrics import Exposition, Histogram
+
+# the routers import the (unopened) pool; no connection is ever made here
+with mock.patch.dict(os.environ, {"DATABASE_URL": os.getenv("DATABASE_URL", "postgresql:///unused")}):
+    from server.routers import dexscreener as dex
+    from server.routers import metrics as metrics_router
+
+
+class TestHistogram(unittest.TestCase):
+    def test_cumulative_buckets(self):
+        h = Histogram((10, 100))
+        for value in (1, 10, 11, 500):
+            h.observe(value)
+        self.assertEqual(h.cumulative(), [(10, 2), (100, 3), (float("inf"), 4)])
+        snap = h.snapshot()
+        self.assertEqual(snap["buckets"], {"10": 2, "100": 3, "+Inf": 4})
+        self.assertEqual(snap["count"], 4)
+        self.assertEqual(snap["sum"], 522)
+
+    def test_empty(self):
+        self.assertEqual(Histogram((1,)).snapshot(), {"buckets": {"1": 0, "+Inf": 0}, "count": 0, "sum": 0.0})
+
+
+
+class TestExposition(unittest.TestCase):
+    def test_text_format(self):
+        out = Exposition()
+        out.add("jobs_total", "counter", "Jobs run.", [({"kind": 'a"b'}, 3), ({}, 1.5)])
+        h = Histogram((100,))
+        h.observe(50)
+        h.observe(250)
+        out.histogram("wait_seconds", "Waits.", [({"pool": "main"}, h)], scale=0.001)
+        self.assertEqual(
+            out.text().splitlines(),
+            [
+                "# HELP jobs_total Jobs run.",
+                "# TYPE jobs_total counter",
+                'jobs_total{kind="a\\"b"} 3',
+                "jobs_total 1.5",
+                "# HELP wait_seconds Waits.",
+                "# TYPE wait_seconds histogram",
+                'wait_seconds_bucket{pool="main",le="0.1"} 1',
+                'wait_seconds_bucket{pool="main",le="+Inf"} 2',
+                'wait_seconds_sum{pool="main"} 0.3',
+                'wait_seconds_count{pool="main"} 2',
+            ],
+        )
+
+    def test_request_metrics_are_keyed_by_route(self):
+        metrics.observe_request("GET", "/trades/{trade_id}", 200, 0.02, 3, 0.01)
+        metrics.observe_request("GET", "/trades/{trade_id}", 404, 0.5, 1, 0.001)
+        out = Exposition()
+        metrics.write_request_metrics(out)
+        text = out.text()
+        self.assertIn('http_requests_total{method="GET",route="/trades/{trade_id}",status="404"} 1', text)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/trades/{trade_id}"} 2', text)
+        self.assertIn('http_request_db_queries_total{method="GET",route="/trades/{trade_id}"} 4', text)
+
+
+class TestMetricsRoute(unittest.TestCase):
+    def test_router_state_is_exported(self):
+        with (
+            mock.patch.object(dex, "_upstream_calls", {}),
+            mock.patch.object(dex, "_upstream_seconds", {}),
+            mock.patch.object(dex, "_breakers", {}),
+        ):
+            dex._record_upstream("tokens", "200", 0.2)
+            breaker = dex._breaker("dex")
+            for _ in range(dex.BREAKER_FAILURES):
+                breaker.record_failure()
+            text = asyncio.run(metrics_router.prometheus_metrics()).body.decode()
+        self.assertIn('dexscreener_upstream_requests_total{endpoint="tokens",status="200"} 1', text)
+        self.assertIn('dexscreener_upstream_duration_seconds_count{endpoint="tokens"} 1', text)
+        self.assertIn('dexscreener_breaker_open{key="dex"} 1', text)
+        self.assertIn('dexscreener_breaker_opened_total{key="dex"} 1', text)
+        self.assertIn("dexscreener_cache_hits_total ", text)
+        self.assertIn("snapshot_cache_misses_total ", text)
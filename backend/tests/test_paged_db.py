@@ -0,0 +1,173 @@
+"""Paged listing tests against a real database (skipped without DATABASE_URL).
+
+Every test runs in one transaction on its own connection and rolls it back.
+"""
+
+import os
+import sys
+import unittest
+from contextlib import asynccontextmanager
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+if DATABASE_URL:
+    import psycopg
+
+    from server.counts import entity_counts
+    from server.routers import tips, trades
+
+CHAIN = "testnet"
+OTHER_CHAIN = "testnet2"
+CA = "test_paged_ca"
+
+
+@unittest.skipUnless(DATABASE_URL, "needs DATABASE_URL with the migrations applied")
+class DbTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.conn = await psycopg.AsyncConnection.connect(DATABASE_URL)
+        self.addAsyncCleanup(self.conn.close)
+        self.addAsyncCleanup(self.conn.rollback)
+        self.cur = self.conn.cursor()
+        await self.cur.execute(
+            "SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'accounts';"
+        )
+        self.accounts_table = "accounts" if await self.cur.fetchone() else "social_accounts"
+
+        @asynccontextmanager
+        async def connection():
+            yield self.conn
+
+        for module in (trades, tips):
+            patcher = mock.patch.object(module.pool, "connection", connection)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def add_coin(self, chain: str = CHAIN, name: str = "Paged Coin", symbol: str = "PGD") -> None:
+        await self.cur.execute(
+            "INSERT INTO coins (ca, name, symbol, chain) VALUES (%s, %s, %s, %s);", (CA, name, symbol, chain)
+        )
+
+    async def add_trade(self, trade_id: str, closed: bool = False) -> None:
+        await self.cur.execute(
+            "INSERT INTO trades (trade_id, ca, chain, entry_mcap_usd, exit_ts)"
+            " VALUES (%s, %s, %s, 1000, CASE WHEN %s THEN now() END);",
+            (trade_id, CA, CHAIN, closed),
+        )
+
+    async def add_tip(self, handle: str = "paged_tester") -> int:
+        await self.cur.execute(
+            f"INSERT INTO {self.accounts_table} (platform, handle) VALUES ('x', %s) RETURNING account_id;", (handle,)
+        )
+        account_id = (await self.cur.fetchone())[0]
+        await self.cur.execute(
+            "INSERT INTO tips (account_id, ca, chain, post_ts, post_mcap_usd)"
+            " VALUES (%s, %s, %s, now(), 500) RETURNING tip_id;",
+            (account_id, CA, CHAIN),
+        )
+        return (await self.cur.fetchone())[0]
+
+    def trades_page(self, **params):
+        args = dict(limit=100, ca=None, chain=None, scope="all", q=None, cursor=None, include="", count=False)
+        args.update(params)
+        return trades.list_trades_paged(**args)
+
+    def tips_page(self, **params):
+        args = dict(limit=100, ca=None, chain=None, q=None, cursor=None, include="", count=False)
+        args.update(params)
+        return tips.list_tips_paged(**args)
+
+
+class TestEntityCounts(DbTestCase):
+    async def test_counts_follow_insert_close_delete_and_chain_change(self):
+        await self.add_coin()
+        await self.add_trade("paged-t1")
+        await self.add_trade("paged-t2", closed=True)
+        tip_id = await self.add_tip()
+        self.assertEqual(await entity_counts(self.cur, "trade", CA, CHAIN), (2, 1))
+        self.assertEqual(await entity_counts(self.cur, "tip", CA, CHAIN), (1, 0))
+
+        await self.cur.execute("UPDATE trades SET exit_ts = now() WHERE trade_id = 'paged-t1';")
+        self.assertEqual(await entity_counts(self.cur, "trade", CA, CHAIN), (2, 0))
+
+        await self.cur.execute("DELETE FROM trades WHERE trade_id = 'paged-t2';")
+        self.assertEqual(await entity_counts(self.cur, "trade", CA, CHAIN), (1, 0))
+
+        await self.add_coin(OTHER_CHAIN)
+        await self.cur.execute("UPDATE trades SET chain = %s WHERE trade_id = 'paged-t1';", (OTHER_CHAIN,))
+        await self.cur.execute("UPDATE tips SET chain = %s WHERE tip_id = %s;", (OTHER_CHAIN, tip_id))
+        self.assertEqual(await entity_counts(self.cur, "trade", CA, CHAIN), (0, 0))
+        self.assertEqual(await entity_counts(self.cur, "trade", CA, OTHER_CHAIN), (1, 0))
+        self.assertEqual(await entity_counts(self.cur, "tip", CA, CHAIN), (0, 0))
+        self.assertEqual(await entity_counts(self.cur, "tip", CA, OTHER_CHAIN), (1, 0))
+
+        # deleting the coin cascades to its trades and tips, and their counters follow
+        await self.cur.execute("DELETE FROM coins WHERE chain = %s AND ca = %s;", (OTHER_CHAIN, CA))
+        self.assertEqual(await entity_counts(self.cur, "trade", CA, OTHER_CHAIN), (0, 0))
+        self.assertEqual(await entity_counts(self.cur, "tip", CA, OTHER_CHAIN), (0, 0))
+
+    async def test_paged_totals_match_a_live_count(self):
+        await self.add_coin()
+        await self.add_trade("paged-t1")
+        await self.add_trade("paged-t2", closed=True)
+        await self.add_tip()
+
+        page = await self.trades_page(chain=CHAIN)
+        self.assertEqual((page["total_count"], page["open_count"], page["closed_count"]), (2, 1, 1))
+        self.assertEqual(len(page["items"]), 2)
+        self.assertEqual((await self.tips_page(chain=CHAIN))["total_count"], 1)
+
+        await self.cur.execute("SELECT COUNT(*), COUNT(*) FILTER (WHERE exit_ts IS NULL) FROM trades;")
+        total, open_ = await self.cur.fetchone()
+        page = await self.trades_page()
+        self.assertEqual((page["total_count"], page["open_count"]), (total, open_))
+
+
+class TestSearchText(DbTestCase):
+    async def search_text(self, table: str, key: str, value) -> str:
+        await self.cur.execute(f"SELECT search_text FROM {table} WHERE {key} = %s;", (value,))
+        return (await self.cur.fetchone())[0]
+
+    async def test_search_text_follows_coin_and_account_changes(self):
+        await self.add_coin()
+        await self.add_trade("paged-t1")
+        tip_id = await self.add_tip()
+        trade_text = await self.search_text("trades", "trade_id", "paged-t1")
+        self.assertEqual(trade_text, f"Paged Coin\nPGD\n{CA}\npaged-t1")
+        tip_text = await self.search_text("tips", "tip_id", tip_id)
+        self.assertEqual(tip_text, f"Paged Coin\nPGD\npaged_tester\nx\n{CA}\n{tip_id}")
+
+        await self.cur.execute("UPDATE coins SET name = 'Renamed', symbol = 'RNM' WHERE ca = %s;", (CA,))
+        await self.cur.execute(
+            f"UPDATE {self.accounts_table} SET handle = 'new_handle' WHERE handle = 'paged_tester';"
+        )
+        trade_text = await self.search_text("trades", "trade_id", "paged-t1")
+        self.assertEqual(trade_text, f"Renamed\nRNM\n{CA}\npaged-t1")
+        tip_text = await self.search_text("tips", "tip_id", tip_id)
+        self.assertEqual(tip_text, f"Renamed\nRNM\nnew_handle\nx\n{CA}\n{tip_id}")
+
+    async def test_q_matches_every_searchable_field(self):
+        await self.add_coin()
+        await self.add_trade("paged-t1")
+        await self.add_trade("paged-t2", closed=True)
+        tip_id = await self.add_tip()
+
+        cases = (("paged coin", 2), ("pgd", 2), (CA.upper(), 2), ("paged-t2", 1), ("no such thing", 0))
+        for q, expected in cases:
+            with self.subTest(q=q):
+                page = await self.trades_page(chain=CHAIN, q=q)
+                self.assertEqual(len(page["items"]), expected)
+                self.assertEqual(page["total_count"], expected)
+
+        page = await self.trades_page(chain=CHAIN, q="paged coin", scope="open")
+        self.assertEqual([t["trade_id"] for t in page["items"]], ["paged-t1"])
+        self.assertEqual((page["open_count"], page["closed_count"]), (1, 1))
+
+        for q in ("paged_tester", "Paged Coin", str(tip_id)):
+            with self.subTest(q=q):
+                page = await self.tips_page(chain=CHAIN, q=q)
+                self.assertEqual([t["tip_id"] for t in page["items"]], [tip_id])
+        # fields are newline-separated, so a match never spans two of them
+        self.assertEqual((await self.tips_page(chain=CHAIN, q="Coin PGD"))["items"], [])
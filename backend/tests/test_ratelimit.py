@@ -0,0 +1,51 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from server.ratelimit import CircuitBreaker, TokenBucket, retry_after_seconds
+
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_then_queue(self):
+        bucket = TokenBucket(rate=50, burst=3)
+        waits = await asyncio.gather(*(bucket.acquire() for _ in range(5)))
+        self.assertEqual(sum(1 for w in waits if w > 0.001), 2)
+        self.assertGreaterEqual(max(waits), 0.03)
+        self.assertEqual(bucket.stats()["queued"], 2)
+
+    async def test_block_for_pauses_waiters(self):
+        bucket = TokenBucket(rate=1000, burst=10)
+        bucket.block_for(0.05)
+        self.assertGreaterEqual(await bucket.acquire(), 0.04)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_and_half_opens(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_after=10)
+        with patch("server.ratelimit.monotonic", return_value=100.0):
+            breaker.record_failure()
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+            self.assertFalse(breaker.allow())
+        with patch("server.ratelimit.monotonic", return_value=111.0):
+            self.assertTrue(breaker.allow())  # the probe
+            self.assertFalse(breaker.allow())
+            breaker.record_failure()
+            self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with patch("server.ratelimit.monotonic", return_value=122.0):
+            self.assertTrue(breaker.allow())
+            breaker.record_success()
+            self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.stats()["opened"], 2)
+
+
+class TestRetryAfter(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(retry_after_seconds("7"), 7.0)
+        self.assertEqual(retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(retry_after_seconds("soon"))
+        self.assertIsNone(retry_after_seconds(None))
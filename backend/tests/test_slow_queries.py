@@ -0,0 +1,71 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from server import instrumentation, slow_queries
+
+
+class TestShapes(unittest.TestCase):
+    def test_param_shapes_hide_values(self):
+        self.assertEqual(
+            slow_queries.params_shape(("So1111", 5, None, ["a", "bb"], 1.5)),
+            ["str(6)", "int", "null", "list[str(1)|str(2)](2)", "float"],
+        )
+        self.assertEqual(slow_queries.params_shape({"ca": "abc"}), {"ca": "str(3)"})
+        self.assertIsNone(slow_queries.params_shape(None))
+
+    def test_read_only_detection(self):
+        self.assertTrue(slow_queries.is_read_only("  select * from trades where id = %s"))
+        self.assertTrue(slow_queries.is_read_only("WITH t AS (SELECT 1) SELECT * FROM t"))
+        self.assertFalse(slow_queries.is_read_only("WITH d AS (DELETE FROM tips RETURNING id) SELECT * FROM d"))
+        self.assertFalse(slow_queries.is_read_only("SELECT nextval('trades_id_seq')"))
+        self.assertFalse(slow_queries.is_read_only("UPDATE trades SET note = %s"))
+
+
+class TestRecord(unittest.TestCase):
+    def setUp(self):
+        slow_queries.clear()
+
+    def tearDown(self):
+        slow_queries.clear()
+
+    def test_ring_buffer_newest_first(self):
+        with mock.patch.object(slow_queries, "_log", slow_queries.deque(maxlen=2)):
+            with self.assertLogs("app", "WARNING"):
+                for n in range(3):
+                    slow_queries.record(f"SELECT {n}", (n,), 10.0 + n, f"req{n}", "/trades")
+            items = slow_queries.entries()
+            self.assertEqual(len(slow_queries.entries(1)), 1)
+        self.assertEqual([item["sql"] for item in items], ["SELECT 2", "SELECT 1"])
+        self.assertEqual(items[0]["params"], ["int"])
+        self.assertEqual(items[0]["request_id"], "req2")
+        self.assertEqual(items[0]["explain"], "off")
+
+    def test_timed_cursor_hook_records_over_threshold(self):
+        async def statement():
+            return "done"
+
+        async def run():
+            stats, token = instrumentation.begin("req-x", "/coins")
+            try:
+                return await instrumentation._timed(statement(), True, "SELECT 1", None)
+            finally:
+                instrumentation.end(token)
+
+        with mock.patch.object(slow_queries, "SLOW_QUERY_MS", 0.000001):
+            with self.assertLogs("app", "WARNING"):
+                self.assertEqual(asyncio.run(run()), "done")
+        [item] = slow_queries.entries()
+        self.assertEqual((item["request_id"], item["path"]), ("req-x", "/coins"))
+
+    def test_disabled_by_default(self):
+        async def statement():
+            return None
+
+        asyncio.run(instrumentation._timed(statement(), True, "SELECT 1", None))
+        self.assertFalse(slow_queries.enabled())
+        self.assertEqual(slow_queries.entries(), [])
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import sys
+import unittest
+from contextlib import asynccontextmanager
+from pathlib import Path
+from unittest import mock
+
+from fastapi import HTTPException
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# the router imports the (unopened) pool; no connection is ever made here
+with mock.patch.dict(os.environ, {"DATABASE_URL": os.getenv("DATABASE_URL", "postgresql:///unused")}):
+    from server.routers import snapshot
+
+
+class FakeConn:
+    @asynccontextmanager
+    async def cursor(self, *args, **kwargs):
+        yield object()
+
+
+class FakePool:
+    @asynccontextmanager
+    async def connection(self):
+        yield FakeConn()
+
+
+def call(**overrides):
+    params = dict(
+        ca=None,
+        chain=None,
+        limit=200,
+        format="json",
+        engine="python",
+        since=None,
+        max_bytes=None,
+        max_tokens=None,
+        if_none_match=None,
+    )
+    params.update(overrides)
+    return snapshot.assistant_snapshot(**params)
+
+
+class TestSnapshotCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        snapshot._snapshot_cache.clear()
+        self.addCleanup(snapshot._snapshot_cache.clear)
+        for target, value in (
+            ("pool", FakePool()),
+            ("_snapshot_token", mock.AsyncMock(return_value="7")),
+            ("_pipelined_snapshot", mock.AsyncMock(return_value=({"coins": [1.0]}, "7"))),
+            ("_sql_snapshot", mock.AsyncMock(return_value='{"coins" : [1]}')),
+        ):
+            patcher = mock.patch.object(snapshot, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_each_engine_has_its_own_entry(self):
+        python_body = (await call()).body
+        sql_body = (await call(engine="sql")).body
+        self.assertEqual(python_body, b'{"coins":[1.0]}')
+        self.assertEqual(sql_body, b'{"coins" : [1]}')
+
+        # same data version: both are now served from the cache, each its own body
+        self.assertEqual((await call(engine="sql")).body, sql_body)
+        self.assertEqual((await call()).body, python_body)
+        self.assertEqual(snapshot._pipelined_snapshot.await_count, 1)
+        self.assertEqual(snapshot._sql_snapshot.await_count, 1)
+        self.assertEqual(len(snapshot._snapshot_cache), 2)
+
+
+class TestSnapshotSlots(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.slots = asyncio.BoundedSemaphore(1)
+        for target, value in (
+            ("pool", FakePool()),
+            ("_snapshot_slots", self.slots),
+            ("SNAPSHOT_SLOT_TIMEOUT_SEC", 0.01),
+        ):
+            patcher = mock.patch.object(snapshot, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_busy_is_a_503_for_json_and_ndjson(self):
+        await self.slots.acquire()
+        for fmt in ("json", "ndjson"):
+            with self.subTest(format=fmt):
+                with self.assertRaises(HTTPException) as ctx:
+                    await call(format=fmt)
+                self.assertEqual(ctx.exception.status_code, 503)
+                self.assertIn("Retry-After", ctx.exception.headers)
+
+    async def test_ndjson_slot_is_released_when_the_body_never_starts(self):
+        response = await call(format="ndjson")
+        self.assertTrue(self.slots.locked())
+        # what Starlette runs after a client disconnects before the first chunk
+        await response.background()
+        await response.body_iterator.aclose()
+        self.assertFalse(self.slots.locked())
+        await response.background()
+        with self.assertRaises(ValueError):
+            self.slots.release()  # released exactly once
+
+
+class TestBudget(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.opened = []
+        self.closed = []
+
+        async def rows(name, n):
+            self.opened.append(name)
+            try:
+                for i in range(n):
+                    yield {"section": name, "i": i, "pad": "x" * 80}
+            finally:
+                self.closed.append(name)
+
+        async def global_sections(conn, chain, limit, stream=False, order=snapshot.SNAPSHOT_SECTIONS, batch_size=0):
+            for name in order:
+                yield name, rows(name, 20)
+
+        async def coin_detail_sections(conn, ca, chain, stream=False, batch_size=0):
+            for name in ("trades", "tips"):
+                yield name, rows(name, 20)
+
+        for target, value in (
+            ("_global_sections", global_sections),
+            ("_coin_detail_sections", coin_detail_sections),
+        ):
+            patcher = mock.patch.object(snapshot, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_everything_fits_a_generous_budget(self):
+        body = await snapshot._budgeted_snapshot(None, None, None, 200, 100_000)
+        doc = json.loads(body)
+        self.assertEqual(doc["budget"]["truncated"], None)
+        self.assertEqual(doc["budget"]["omitted"], [])
+        self.assertEqual(list(doc)[:-1], list(snapshot.SNAPSHOT_BUDGET_PRIORITY))
+        self.assertTrue(all(len(doc[name]) == 20 for name in snapshot.SNAPSHOT_SECTIONS))
+
+    async def test_truncates_in_priority_order_and_stays_under_max_bytes(self):
+        body = await snapshot._budgeted_snapshot(None, None, None, 200, 2048)
+        self.assertLessEqual(len(body), 2048)
+        doc = json.loads(body)
+        kept = doc["budget"]["rows"]["trades_recent"]
+        self.assertGreater(kept, 0)
+        self.assertEqual(len(doc["trades_recent"]), kept)
+        self.assertEqual(doc["budget"]["truncated"], "trades_recent")
+        self.assertEqual(doc["budget"]["omitted"], ["tips_recent", "accounts", "coins"])
+        # the cut section's cursor is closed and later sections are never queried
+        self.assertEqual(self.opened, ["trades_recent"])
+        self.assertEqual(self.closed, ["trades_recent"])
+
+    async def test_any_budget_is_respected(self):
+        for max_bytes in range(1024, 12_000, 397):
+            with self.subTest(max_bytes=max_bytes):
+                for ca in (None, "abc"):
+                    body = await snapshot._budgeted_snapshot(None, ca, "base", 200, max_bytes)
+                    self.assertLessEqual(len(body), max_bytes)
+                    doc = json.loads(body)
+                    if ca:
+                        self.assertEqual(doc["coin_detail"]["ca"], "abc")
+                    self.assertEqual(sorted(self.opened), sorted(self.closed))
+
+    async def test_max_tokens_is_converted_to_bytes(self):
+        self.addCleanup(snapshot._snapshot_cache.clear)
+        with (
+            mock.patch.object(snapshot, "pool", FakePool()),
+            mock.patch.object(snapshot, "_snapshot_token", mock.AsyncMock(return_value="7")),
+            mock.patch.object(snapshot, "_budgeted_snapshot", mock.AsyncMock(return_value=b"{}")) as budgeted,
+        ):
+            await call(max_tokens=500, max_bytes=100_000)
+        self.assertEqual(budgeted.await_args.args[-1], 500 * snapshot.BYTES_PER_TOKEN)
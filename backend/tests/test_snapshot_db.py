@@ -0,0 +1,215 @@
+"""Snapshot tests against a real database (skipped without DATABASE_URL).
+
+Every test runs in one transaction on its own connection and rolls it back,
+so the fixture rows never reach other sessions.
+"""
+
+import json
+import os
+import sys
+import unittest
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+if DATABASE_URL:
+    import psycopg
+    from fastapi import HTTPException
+
+    from server.routers import snapshot
+
+CHAIN = "testnet"
+CA = "test_snapshot_ca"
+
+
+@unittest.skipUnless(DATABASE_URL, "needs DATABASE_URL with the migrations applied")
+class DbTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.conn = await psycopg.AsyncConnection.connect(DATABASE_URL)
+        self.addAsyncCleanup(self.conn.close)
+        self.addAsyncCleanup(self.conn.rollback)
+        self.cur = self.conn.cursor()
+        self.accounts_table = await snapshot._accounts_table(self.cur)
+
+    def use_test_connection(self) -> None:
+        """Point the router's pool at this test's connection (and its open transaction)."""
+
+        @asynccontextmanager
+        async def connection():
+            yield self.conn
+
+        patcher = mock.patch.object(snapshot.pool, "connection", connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def seed(self, ca: str = CA, chain: str = CHAIN) -> dict:
+        """One coin with two trades (one closed) and a tip, values that JSON encoders disagree on."""
+        cur = self.cur
+        await cur.execute(
+            "INSERT INTO coins (ca, name, symbol, chain, launch_ts, created_ts)"
+            " VALUES (%s, 'Test Coin', 'TST', %s, '2026-01-02 03:04:05.5+00', '2026-01-02 03:04:21.54177+00');",
+            (ca, chain),
+        )
+        await cur.execute(
+            f"INSERT INTO {self.accounts_table} (platform, handle) VALUES ('x', 'tester') RETURNING account_id;"
+        )
+        account_id = (await cur.fetchone())[0]
+        trade_ids = [f"{ca}-t1", f"{ca}-t2"]
+        await cur.execute(
+            "INSERT INTO trades (trade_id, ca, chain, entry_ts, entry_mcap_usd, size_usd, exit_ts, exit_mcap_usd)"
+            " VALUES (%s, %s, %s, '2026-01-02 04:00:21.54177+00', 21, 100, '2026-01-02 05:00:00+00', 42),"
+            " (%s, %s, %s, '2026-01-02 06:00:00+00', 1000.25, NULL, NULL, NULL);",
+            (trade_ids[0], ca, chain, trade_ids[1], ca, chain),
+        )
+        await cur.execute(
+            "INSERT INTO trade_bubbles (trade_id, cluster_rank, pct) VALUES (%s, 1, 12), (%s, 2, 3.5);",
+            (trade_ids[0], trade_ids[0]),
+        )
+        await cur.execute("INSERT INTO trade_scoring (trade_id, intuition_score) VALUES (%s, 7);", (trade_ids[0],))
+        await cur.execute(
+            "INSERT INTO tips (account_id, ca, chain, post_ts, post_mcap_usd, peak_mcap_usd, trough_mcap_usd, rug_flag)"
+            " VALUES (%s, %s, %s, '2026-01-02 03:30:00.1+00', 10, 30, 5, 0) RETURNING tip_id;",
+            (account_id, ca, chain),
+        )
+        tip_id = (await cur.fetchone())[0]
+        await cur.execute("INSERT INTO tip_bubbles (tip_id, cluster_rank, pct) VALUES (%s, 1, 50);", (tip_id,))
+        return {"account_id": account_id, "trade_ids": trade_ids, "tip_id": tip_id}
+
+
+def canonical(body) -> str:
+    """Re-encoded compactly: whitespace is ignored, key order, strings and 21 vs 21.0 are not."""
+    return json.dumps(json.loads(body), ensure_ascii=False, separators=(",", ":"))
+
+
+class TestEngines(DbTestCase):
+    async def test_sql_engine_matches_python_engine(self):
+        await self.seed()
+        for ca, chain in ((CA, CHAIN), (None, CHAIN)):
+            with self.subTest(ca=ca):
+                snap, _ = await snapshot._pipelined_snapshot(self.conn, ca, chain, 200)
+                python_body = snapshot._json_bytes(snap)
+                sql_body = await snapshot._sql_snapshot(self.conn, ca, chain, 200)
+                self.assertEqual(canonical(sql_body), canonical(python_body))
+
+        trade = snap["trades_recent"][-1]
+        self.assertEqual(
+            datetime.fromisoformat(trade["entry_ts"]), datetime(2026, 1, 2, 4, 0, 21, 541770, timezone.utc)
+        )
+        self.assertIn(".541770", trade["entry_ts"])
+        self.assertEqual(trade["entry_mcap_usd"], 21.0)
+        self.assertEqual(trade["bubbles"]["clusters"][0], {"rank": 1, "pct": 12.0})
+
+
+class TestChangeLogRetention(DbTestCase):
+    async def test_token_older_than_pruned_rows_gets_410(self):
+        token = await snapshot._snapshot_token(self.cur)
+        await self.seed()
+        await self.cur.execute(
+            "UPDATE change_log SET changed_ts = now() - interval '2 hours' WHERE txid = pg_current_xact_id();"
+        )
+        await self.cur.execute("SELECT prune_change_log(interval '1 hour');")
+        self.assertGreater((await self.cur.fetchone())[0], 0)
+
+        with self.assertRaises(HTTPException) as ctx:
+            await snapshot._delta_snapshot(self.conn, token)
+        self.assertEqual(ctx.exception.status_code, 410)
+
+        await self.cur.execute("SELECT pruned_txid::text FROM change_log_horizon;")
+        newer = str(int((await self.cur.fetchone())[0]) + 1)
+        delta = await snapshot._delta_snapshot(self.conn, newer)
+        self.assertEqual(delta["since"], newer)
+
+
+class TestNdjson(DbTestCase):
+    async def lines(self, ca, chain) -> list[dict]:
+        self.use_test_connection()
+        lease = await snapshot._lease_slot()
+        return [json.loads(line) async for line in snapshot._stream_snapshot(lease, ca, chain, 200)]
+
+    async def test_token_first_then_coin_detail_rows(self):
+        seeded = await self.seed()
+        lines = await self.lines(CA, CHAIN)
+        self.assertEqual(lines[0]["section"], "token")
+        self.assertRegex(lines[0]["data"]["token"], r"^\d+$")
+        self.assertEqual(lines[1], {"section": "coin_detail", "data": {"ca": CA, "chain": CHAIN}})
+        self.assertEqual([line["section"] for line in lines[2:]], ["trades", "trades", "tips"])
+        self.assertEqual([line["data"]["trade_id"] for line in lines[2:4]], seeded["trade_ids"][::-1])
+
+        # the same rows the JSON body carries
+        snap, _ = await snapshot._pipelined_snapshot(self.conn, CA, CHAIN, 200)
+        detail = snap["coin_detail"]
+        self.assertEqual([line["data"] for line in lines[2:]], detail["trades"] + detail["tips"])
+        self.assertFalse(snapshot._snapshot_slots.locked())
+
+    async def test_global_view_sections_in_document_order(self):
+        await self.seed()
+        lines = await self.lines(None, CHAIN)
+        self.assertEqual(lines[0]["section"], "token")
+        sections = [line["section"] for line in lines[1:]]
+        self.assertEqual(sections, ["coins", "trades_recent", "trades_recent", "accounts", "tips_recent"])
+        self.assertEqual(lines[1]["data"]["trades_total"], 2)
+
+
+class TestDelta(DbTestCase):
+    async def test_reports_inserted_then_deleted_rows(self):
+        token = await snapshot._snapshot_token(self.cur)
+        seeded = await self.seed()
+
+        delta = await snapshot._delta_snapshot(self.conn, token)
+        self.assertEqual(delta["since"], token)
+        self.assertRegex(delta["token"], r"^\d+$")
+        self.assertEqual([(c["chain"], c["ca"], c["trades_total"]) for c in delta["coins"]], [(CHAIN, CA, 2)])
+        self.assertEqual({t["trade_id"] for t in delta["trades"]}, set(seeded["trade_ids"]))
+        self.assertEqual([t["tip_id"] for t in delta["tips"]], [seeded["tip_id"]])
+        self.assertEqual([a["account_id"] for a in delta["accounts"]], [seeded["account_id"]])
+        self.assertEqual(delta["deleted"], {"coins": [], "trades": [], "tips": [], "accounts": []})
+
+        gone = seeded["trade_ids"][0]
+        await self.cur.execute("DELETE FROM trades WHERE trade_id = %s;", (gone,))
+        await self.cur.execute("DELETE FROM tips WHERE tip_id = %s;", (seeded["tip_id"],))
+        delta = await snapshot._delta_snapshot(self.conn, token)
+        self.assertEqual([t["trade_id"] for t in delta["trades"]], [seeded["trade_ids"][1]])
+        self.assertEqual(delta["deleted"]["trades"], [gone])
+        self.assertEqual(delta["deleted"]["tips"], [seeded["tip_id"]])
+        self.assertEqual(delta["coins"][0]["trades_total"], 1)
+
+        await self.cur.execute("DELETE FROM coins WHERE chain = %s AND ca = %s;", (CHAIN, CA))
+        delta = await snapshot._delta_snapshot(self.conn, token)
+        self.assertEqual(delta["deleted"]["coins"], [{"ca": CA, "chain": CHAIN}])
+        self.assertEqual(delta["deleted"]["trades"], sorted(seeded["trade_ids"]))
+
+
+class TestPipelined(DbTestCase):
+    async def sequential(self, ca, chain) -> dict:
+        if ca:
+            detail = {"ca": ca, "chain": chain}
+            async for name, rows in snapshot._coin_detail_sections(self.conn, ca, chain):
+                detail[name] = [row async for row in rows]
+            return {"coin_detail": detail}
+        snap = {}
+        async for name, rows in snapshot._global_sections(self.conn, chain, 200):
+            snap[name] = [row async for row in rows]
+        return snap
+
+    async def test_matches_sequential_sections_in_two_pipelines(self):
+        await self.seed()
+        pipelines = []
+        pipeline = self.conn.pipeline
+
+        def counting_pipeline():
+            pipelines.append(1)
+            return pipeline()
+
+        for ca in (CA, None):
+            with self.subTest(ca=ca):
+                pipelines.clear()
+                with mock.patch.object(self.conn, "pipeline", counting_pipeline):
+                    snap, token = await snapshot._pipelined_snapshot(self.conn, ca, CHAIN, 200)
+                if psycopg.AsyncPipeline.is_supported():  # otherwise it falls back to one statement at a time
+                    self.assertEqual(len(pipelines), 2)
+                self.assertRegex(token, r"^\d+$")
+                self.assertEqual(snapshot._json_bytes(snap), snapshot._json_bytes(await self.sequential(ca, CHAIN)))
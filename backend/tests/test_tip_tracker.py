@@ -0,0 +1,70 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.fake_dexscreener import FakeDexscreener
+from server import tip_tracker
+from server.cache import data_version
+from server.routers import dexscreener as dex
+
+
+class FakeCursor:
+    def __init__(self, positions):
+        self.positions = positions
+        self.updates = []
+        self.rowcount = 0
+
+    async def execute(self, sql, params):
+        if sql.lstrip().startswith("UPDATE"):
+            self.updates.append((sql, params))
+            self.rowcount = len(params) // 3
+        self.last = sql
+
+    async def fetchall(self):
+        return self.positions
+
+
+class TestTipTracker(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeDexscreener().start()
+        self.addCleanup(self.fake.stop)
+        dex._client = httpx.AsyncClient(base_url=self.fake.url)
+        dex._limiters.clear()
+        dex._breakers.clear()
+        self.cur = FakeCursor([("base", f"0x{i:040x}") for i in range(45)] + [("solana", "gone")])
+        for chain, ca in self.cur.positions[:45]:
+            self.fake.add_token(chain, ca, mcap=1000 + int(ca, 16))
+
+        async def run_db(work):
+            return await work(self.cur)
+
+        patcher = patch("server.routers.dexscreener.run_db", side_effect=run_db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await dex.close_client()
+
+    async def test_samples_in_batches_and_bulk_updates(self):
+        version = data_version.current()
+        updated = await tip_tracker.track_once()
+        self.assertEqual(updated, 45)
+        self.assertGreater(data_version.current(), version)
+        # 45 base coins -> 2 calls, 1 solana coin -> 1 call
+        self.assertEqual(len(self.fake.requests), 3)
+        self.assertTrue(all(path.startswith("/tokens/v1/") for path in self.fake.requests))
+        sql, params = self.cur.updates[0]
+        self.assertEqual(len(self.cur.updates), 1)
+        self.assertIn("FROM (VALUES", sql)
+        self.assertEqual(params[:3], ["base", "0x" + "0" * 40, 1000.0])
+        self.assertEqual(params[-1], tip_tracker.TIP_TRACK_WINDOW_HOURS * 3600)
+
+    async def test_apply_samples_chunks_statements(self):
+        samples = {("base", f"ca{i}"): float(i) for i in range(tip_tracker.UPDATE_BATCH_SIZE + 1)}
+        self.assertEqual(await tip_tracker.apply_samples(self.cur, samples, 24), tip_tracker.UPDATE_BATCH_SIZE + 1)
+        self.assertEqual(len(self.cur.updates), 2)
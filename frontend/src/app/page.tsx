@@ -420,7 +420,7 @@ export default function WorkspaceDashboard() {
     try {
       const [c, t, p] = await Promise.all([
         apiJson<CoinSummary[]>("/coins/summary"),
-        apiJson<Trade[]>("/trades?only_open=true&limit=500"),
+        apiJson<Trade[]>("/trades?only_open=true&limit=500&include="),
         apiJson<Tip[]>("/tips?limit=500"),
       ]);
       setCoins(c);
@@ -47,7 +47,7 @@ type CoinSummaryRow = {
 
 type TipsPageResponse = {
   items: TipRow[];
-  total_count: number;
+  total_count: number | null;
   next_cursor: string | null;
 };
 
@@ -246,7 +246,7 @@ export default function TipsPage() {
     try {
       const qParam = qDebounced.trim() ? `&q=${encodeURIComponent(qDebounced.trim())}` : "";
       const [tipsRes, summaryRes] = await Promise.allSettled([
-        apiGet<TipsPageResponse>(`/tips/paged?limit=${PAGE_SIZE}${qParam}`),
+        apiGet<TipsPageResponse>(`/tips/paged?limit=${PAGE_SIZE}&include=${qParam}`),
         apiGet<CoinSummaryRow[]>("/coins/summary"),
       ]);
 
@@ -294,11 +294,10 @@ export default function TipsPage() {
     try {
       const qParam = qDebounced.trim() ? `&q=${encodeURIComponent(qDebounced.trim())}` : "";
       const res = await apiGet<TipsPageResponse>(
-        `/tips/paged?limit=${PAGE_SIZE}&cursor=${encodeURIComponent(nextCursor)}${qParam}`
+        `/tips/paged?limit=${PAGE_SIZE}&include=&cursor=${encodeURIComponent(nextCursor)}${qParam}`
       );
       setTips((prev) => [...prev, ...res.items]);
       setNextCursor(res.next_cursor || null);
-      setTotalCount(res.total_count);
     } catch (e: unknown) {
       setErr(errMsg(e));
     } finally {
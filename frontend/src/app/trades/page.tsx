@@ -31,6 +31,11 @@ type TradeRow = {
 
   pnl_pct: number | null;
   pnl_usd: number | null;
+
+  // open trades: live values from the backend market-cap poller
+  current_mcap_usd?: number | null;
+  unrealized_pnl_pct?: number | null;
+  unrealized_pnl_usd?: number | null;
 };
 
 type CoinSummaryRow = {
@@ -41,9 +46,9 @@ type CoinSummaryRow = {
 
 type TradesPageResponse = {
   items: TradeRow[];
-  total_count: number;
-  open_count: number;
-  closed_count: number;
+  total_count: number | null;
+  open_count: number | null;
+  closed_count: number | null;
   next_cursor: string | null;
 };
 
@@ -273,7 +278,7 @@ export default function TradesPage() {
       const qParam = qDebounced.trim() ? `&q=${encodeURIComponent(qDebounced.trim())}` : "";
       const [tradesRes, summaryRes] = await Promise.allSettled([
         apiGet<TradesPageResponse>(
-          `/trades/paged?limit=${PAGE_SIZE}&scope=${encodeURIComponent(scope)}${qParam}`
+          `/trades/paged?limit=${PAGE_SIZE}&include=&scope=${encodeURIComponent(scope)}${qParam}`
         ),
         apiGet<CoinSummaryRow[]>("/coins/summary"),
       ]);
@@ -324,13 +329,10 @@ export default function TradesPage() {
     try {
       const qParam = qDebounced.trim() ? `&q=${encodeURIComponent(qDebounced.trim())}` : "";
       const res = await apiGet<TradesPageResponse>(
-        `/trades/paged?limit=${PAGE_SIZE}&scope=${encodeURIComponent(scope)}&cursor=${encodeURIComponent(nextCursor)}${qParam}`
+        `/trades/paged?limit=${PAGE_SIZE}&include=&scope=${encodeURIComponent(scope)}&cursor=${encodeURIComponent(nextCursor)}${qParam}`
       );
       setTrades((prev) => [...prev, ...res.items]);
       setNextCursor(res.next_cursor || null);
-      setTotalCount(res.total_count);
-      setOpenCount(res.open_count);
-      setClosedCount(res.closed_count);
     } catch (e: unknown) {
       setErr(errMsg(e));
     } finally {
@@ -621,8 +623,10 @@ export default function TradesPage() {
             const chain = (t.chain ?? chainsByCa[caKey] ?? "").trim();
             const dexUrl = dexUrlFor(chain || null, t.ca);
 
-            const pnlPos = (t.pnl_pct ?? 0) > 0;
-            const pnlNeg = (t.pnl_pct ?? 0) < 0;
+            const pnlPct = isOpen ? t.unrealized_pnl_pct ?? null : t.pnl_pct;
+            const pnlUsd = isOpen ? t.unrealized_pnl_usd ?? null : t.pnl_usd;
+            const pnlPos = (pnlPct ?? 0) > 0;
+            const pnlNeg = (pnlPct ?? 0) < 0;
 
             const logo = logoByCa[caKey];
 
@@ -728,7 +732,7 @@ export default function TradesPage() {
                     </div>
 
                     <div className="rounded-xl border border-zinc-800/70 bg-zinc-950/50 px-3 py-2">
-                      <div className="text-[11px] text-zinc-500">Kar</div>
+                      <div className="text-[11px] text-zinc-500">{isOpen ? "Kar (canlı)" : "Kar"}</div>
                       <div
                         className={[
                           "mt-0.5 text-sm font-semibold tabular-nums",
@@ -737,7 +741,7 @@ export default function TradesPage() {
                           !pnlPos && !pnlNeg ? "text-zinc-100" : "",
                         ].join(" ")}
                       >
-                        {fmtPctSigned(t.pnl_pct)}
+                        {fmtPctSigned(pnlPct)}
                       </div>
                       {!isOpen && t.size_usd != null && t.pnl_usd != null ? (
                         <div className="mt-0.5 text-sm font-semibold text-zinc-100 tabular-nums">
@@ -745,7 +749,7 @@ export default function TradesPage() {
                         </div>
                       ) : null}
                       <div className="mt-0.5 text-xs text-zinc-400 tabular-nums">
-                        Kar/Zarar: {t.pnl_usd == null ? "-" : fmtUsdFull(t.pnl_usd)}
+                        Kar/Zarar: {pnlUsd == null ? "-" : fmtUsdFull(pnlUsd)}
                       </div>
                       <div className="mt-0.5 text-xs text-zinc-400">
                         Neden: {t.exit_reason?.trim() ? t.exit_reason : "-"}
@@ -33,6 +33,11 @@ export type Trade = {
   exit_reason: string | null;
   pnl_pct: number | null;
   pnl_usd: number | null;
+
+  // open trades: live values from the backend market-cap poller
+  current_mcap_usd?: number | null;
+  unrealized_pnl_pct?: number | null;
+  unrealized_pnl_usd?: number | null;
 };
 
 export type Tip = {